@@ -7,14 +7,16 @@ from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.services.ExcelReaderService import ExcelReaderService
 from src.services.DashboardService import DashboardService
-from src.services.FuzzyColumnMapper import FuzzyColumnMapper
-from src.services.CacheService import SQLiteCacheService
+from src.services.IngestionPipeline import IngestionPipeline, content_hash
+from src.services.TieredCacheService import TieredCacheService
 from src.services.ReportExporterService import ReportExporterService
 from src.services.EmbeddingService import EmbeddingService
 from src.services.AssuntoClassifierService import AssuntoClassifierService
 from src.services.SubAssuntoClassifierService import SubAssuntoClassifierService
+from src.infrastructure.ml.ClassificationStore import ClassificationStore
+from src.infrastructure.ml.ClassificationWorker import ClassificationWorker, JobCancelledError
+from src.shared.utils.ClassificationMasks import compute_classification_masks, empty_mask
 import plotly.io as pio
 import io
 
@@ -33,65 +35,195 @@ def apply_filters(df, filters):
     return filtered_df
 
 
-def auto_classify_data(df):
-    """Classifica automaticamente categorias e subcategorias após carregar arquivo"""
-    from src.services.TextBuilderService import TextBuilderService
+def compute_file_ids(files_to_process):
+    """
+    SHA-256 de cada arquivo. O hash de um upload é calculado uma vez por
+    file_id e guardado na sessão, então os reruns não releem o conteúdo.
+    """
+    known = st.session_state.get('_upload_hashes', {})
+    upload_hashes = {}
+    file_ids = []
+    for _, file_data in files_to_process:
+        file_id = getattr(file_data, 'file_id', None)
+        if file_id is None:
+            # Arquivo em disco: content_hash já reaproveita o hash enquanto tamanho e mtime não mudam
+            file_ids.append(content_hash(file_data))
+            continue
+        upload_hashes[file_id] = known.get(file_id) or content_hash(file_data)
+        file_ids.append(upload_hashes[file_id])
+    st.session_state['_upload_hashes'] = upload_hashes  # Só os uploads atuais
+    return file_ids
+
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+EMBEDDING_CACHE_DIR = 'data/ml/embedding_cache'
+EMBEDDING_BACKEND = 'torch'  # 'torch', 'onnx' ou 'onnx_int8' (ver scripts/training/export_onnx_model.py)
+CLASSIFICATION_STORE_PATH = 'data/ml/classification_store.db'  # Classificações reaproveitadas entre uploads
+
+
+def auto_classify_data(df, progress=None):
+    """
+    Classifica automaticamente categorias e subcategorias após carregar arquivo.
+    Roda no ClassificationWorker (fora da thread do script): não usa chamadas st.*;
+    o andamento e as mensagens são reportados via progress(etapa, fração, mensagem).
+    """
+    if progress is None:
+        progress = lambda stage, fraction, message=None: None
 
     df_result = df.copy()
-    text_builder = TextBuilderService()
-
-    # Verificar se precisa classificar categorias
-    if 'DS_ASSUNTO' in df_result.columns:
-        num_categorias_nao_class = df_result['DS_ASSUNTO'].apply(text_builder.needs_classification).sum()
-
-        if num_categorias_nao_class > 0:
-            try:
-                with st.spinner(f"🤖 Classificando {num_categorias_nao_class} categorias automaticamente..."):
+    masks = compute_classification_masks(df_result)
+    embedding_service = None
+    classification_store = ClassificationStore(CLASSIFICATION_STORE_PATH)
+
+    # try/finally: um JobCancelledError (novo upload) também fecha a conexão do store
+    try:
+        # Verificar se precisa classificar categorias
+        if 'DS_ASSUNTO' in masks:
+            num_categorias_nao_class = masks['DS_ASSUNTO'].sum()
+
+            if num_categorias_nao_class > 0:
+                try:
+                    progress('categorias', 0.0)
                     embedding_service = EmbeddingService(
-                        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+                        model_name=EMBEDDING_MODEL_NAME,
+                        cache_dir=EMBEDDING_CACHE_DIR,
+                        backend=EMBEDDING_BACKEND,
+                        show_progress_bar=False
                     )
 
                     classifier = AssuntoClassifierService(
                         embedding_service=embedding_service,
                         threshold=0.45,
-                        k_neighbors=5
+                        k_neighbors=5,
+                        classification_store=classification_store
                     )
 
-                    df_result = classifier.classify_dataframe(df_result)
-                    st.success(f"✅ {num_categorias_nao_class} categorias classificadas!")
-            except Exception as e:
-                st.warning(f"⚠️ Não foi possível classificar categorias: {str(e)}")
-
-    # Verificar se precisa classificar subcategorias
-    if 'SUB_ASSUNTO' in df_result.columns:
-        mask_needs_sub = (
-            df_result['SUB_ASSUNTO'].isna() |
-            (df_result['SUB_ASSUNTO'].str.strip() == '') |
-            df_result['SUB_ASSUNTO'].str.upper().str.contains('OUTRO', na=False)
-        )
-        num_subcategorias_nao_class = mask_needs_sub.sum()
-
-        if num_subcategorias_nao_class > 0:
-            try:
-                with st.spinner(f"🤖 Classificando {num_subcategorias_nao_class} subcategorias automaticamente..."):
-                    embedding_service_sub = EmbeddingService(
-                        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+                    df_result = classifier.classify_dataframe(
+                        df_result,
+                        progress_callback=lambda fraction: progress('categorias', fraction)
                     )
+                    progress('categorias', 1.0, f"✅ {num_categorias_nao_class} categorias classificadas!"
+                             f" ({classifier.reused_count} reaproveitadas de uploads anteriores)")
+                except JobCancelledError:
+                    raise
+                except Exception as e:
+                    progress('categorias', 1.0, f"⚠️ Não foi possível classificar categorias: {str(e)}")
+
+        # Verificar se precisa classificar subcategorias
+        if 'SUB_ASSUNTO' in masks:
+            num_subcategorias_nao_class = masks['SUB_ASSUNTO'].sum()
+
+            if num_subcategorias_nao_class > 0:
+                try:
+                    progress('subcategorias', 0.0)
+                    if embedding_service is None:
+                        embedding_service = EmbeddingService(
+                            model_name=EMBEDDING_MODEL_NAME,
+                            cache_dir=EMBEDDING_CACHE_DIR,
+                            backend=EMBEDDING_BACKEND,
+                            show_progress_bar=False
+                        )
 
                     sub_classifier = SubAssuntoClassifierService(
-                        embedding_service=embedding_service_sub,
+                        embedding_service=embedding_service,
                         threshold=0.45,
-                        k_neighbors=5
+                        k_neighbors=5,
+                        classification_store=classification_store
                     )
 
-                    df_result = sub_classifier.classify_dataframe(df_result)
-                    st.success(f"✅ {num_subcategorias_nao_class} subcategorias classificadas!")
-            except Exception as e:
-                st.warning(f"⚠️ Não foi possível classificar subcategorias: {str(e)}")
-
+                    df_result = sub_classifier.classify_dataframe(
+                        df_result,
+                        progress_callback=lambda fraction: progress('subcategorias', fraction)
+                    )
+                    progress('subcategorias', 1.0, f"✅ {num_subcategorias_nao_class} subcategorias classificadas!"
+                             f" ({sub_classifier.reused_count} reaproveitadas de uploads anteriores)")
+                except JobCancelledError:
+                    raise
+                except Exception as e:
+                    progress('subcategorias', 1.0, f"⚠️ Não foi possível classificar subcategorias: {str(e)}")
+    finally:
+        classification_store.close()
     return df_result
 
 
+def get_classification_status(df):
+    """
+    Contagens do "Status da Classificação" (registros a classificar e campos vazios).
+    Calculadas uma vez por DataFrame da sessão: os reruns reutilizam o resultado
+    até os dados serem substituídos (novo upload ou fim da classificação).
+    """
+    cached = st.session_state.get('_classification_status')
+    if cached is not None and cached[0] is df:
+        return cached[1]
+
+    masks = compute_classification_masks(df)
+    status = {
+        'categorias': int(masks['DS_ASSUNTO'].sum()) if 'DS_ASSUNTO' in masks else 0,
+        'subcategorias': int(masks['SUB_ASSUNTO'].sum()) if 'SUB_ASSUNTO' in masks else 0,
+        'vazios': sum(int(empty_mask(df[col]).sum()) for col in masks),
+    }
+    st.session_state['_classification_status'] = (df, status)
+    return status
+
+
+def apply_classification_result():
+    """
+    Verifica o job de classificação em segundo plano da sessão.
+    Quando terminou, troca os dados exibidos pelos classificados.
+
+    Returns:
+        ClassificationJob em andamento, ou None se não há job pendente
+    """
+    job_id = st.session_state.get('classification_job_id')
+    if job_id is None:
+        return None
+
+    worker = ClassificationWorker.shared()
+    job = worker.get(job_id)
+    if job is not None and not job.finished:
+        return job
+
+    worker.pop(job_id)
+    del st.session_state['classification_job_id']
+
+    if job is None or job.status == 'cancelled':
+        return None
+
+    if job.status == 'done':
+        st.session_state['df'] = job.result
+        st.session_state['classification_done'] = True
+        st.session_state['subclassification_done'] = True
+        st.session_state['classification_messages'] = job.messages
+    else:
+        st.session_state['classification_messages'] = [f"⚠️ Não foi possível classificar: {job.error}"]
+
+    return None
+
+
+def render_classification_progress(job):
+    """Barra de progresso do job na sidebar; recarrega o painel quando o job termina"""
+    def draw(current_job):
+        stage = current_job.stage or 'na fila'
+        st.progress(current_job.progress, text=f"🤖 Classificando {stage}: {int(current_job.progress * 100)}%")
+        st.caption("O painel abaixo usa os dados ainda não classificados e será atualizado ao final.")
+
+    if hasattr(st, 'fragment'):
+        @st.fragment(run_every=2)
+        def poll():
+            current_job = ClassificationWorker.shared().get(job.job_id)
+            if current_job is None or current_job.finished:
+                st.rerun()
+            draw(current_job)
+
+        with st.sidebar:
+            poll()
+    else:
+        with st.sidebar:
+            draw(job)
+            if st.button("🔄 Atualizar status", use_container_width=True):
+                st.rerun()
+
+
 def main():
     st.set_page_config(
         page_title="Monitoramento NIP",
@@ -309,6 +441,9 @@ def main():
 
         with st.expander("🗑️ Limpar Cache/Memória", expanded=False):
             if st.button("Limpar Dados", use_container_width=True, type="secondary"):
+                if 'classification_job_id' in st.session_state:
+                    ClassificationWorker.shared().cancel(st.session_state['classification_job_id'])
+
                 for key in list(st.session_state.keys()):
                     if key != 'cache_service':
                         del st.session_state[key]
@@ -321,7 +456,7 @@ def main():
                 st.rerun()
 
     if 'cache_service' not in st.session_state:
-        st.session_state.cache_service = SQLiteCacheService()
+        st.session_state.cache_service = TieredCacheService.shared()
 
     # Verificar e carregar planilha padrão
     default_file_path = Path("data/default/planilha_padrao.xlsx")
@@ -341,12 +476,8 @@ def main():
             file_sources.append(f"📤 {uploaded_file.name}")
 
     if len(files_to_process) > 0:
-        # Criar ID único baseado em todos os arquivos (padrão + uploads)
-        file_ids = []
-        if has_default_file:
-            file_ids.append(f"default_{default_file_path.stat().st_size}")
-        if uploaded_files is not None and len(uploaded_files) > 0:
-            file_ids.extend([f"{f.name}_{f.size}" for f in uploaded_files])
+        # Criar ID único baseado no conteúdo de todos os arquivos (padrão + uploads)
+        file_ids = compute_file_ids(files_to_process)
 
         current_files_id = "_".join(sorted(file_ids))
         last_files_id = st.session_state.get('_last_files_id', None)
@@ -354,45 +485,43 @@ def main():
         if current_files_id != last_files_id:
             try:
                 with st.spinner(f"📥 Carregando {len(files_to_process)} arquivo(s)..."):
-                    excel_reader = ExcelReaderService()
-                    mapper = FuzzyColumnMapper()
-
-                    all_dfs = []
-                    file_stats = []
-
-                    for idx, (source_type, file_data) in enumerate(files_to_process, 1):
-                        file_name = "Planilha Padrão" if source_type == "default" else file_data.name
-                        with st.spinner(f"📄 Processando arquivo {idx}/{len(files_to_process)}: {file_name}"):
-                            raw_df = excel_reader.read_excel(file_data)
-
-                            df_temp = mapper.map_columns(raw_df)
-
-                            date_columns = ['DT_REGISTRO_ATENDIMENTO', 'DT_ATRIBUICAO', 'DT_CONCLUSAO',
-                                           'DT_LIMITE', 'DT_LIMITE_CONCLUSAO', 'DT_SAC']
-                            for col in date_columns:
-                                if col in df_temp.columns:
-                                    df_temp[col] = pd.to_datetime(df_temp[col], errors='coerce')
-
-                            all_dfs.append(df_temp)
-                            file_stats.append({
-                                'nome': file_name,
-                                'registros': len(df_temp),
-                                'source': file_sources[idx - 1]
-                            })
-
-                    with st.spinner("🔗 Juntando arquivos e removendo duplicatas..."):
-                        df_combined = pd.concat(all_dfs, ignore_index=True)
-                        total_antes = len(df_combined)
-
-                        if 'NU_REGISTRO' in df_combined.columns:
-                            df_combined = df_combined.drop_duplicates(subset=['NU_REGISTRO'], keep='first')
-                            total_depois = len(df_combined)
-                            duplicatas_removidas = total_antes - total_depois
-                        else:
-                            total_depois = total_antes
-                            duplicatas_removidas = 0
+                    progress_bar = st.progress(0.0)
+                    progress_text = st.empty()
+
+                    def on_file_done(ingested, done, total):
+                        progress_bar.progress(done / total)
+                        origem = "cache" if ingested.cached else f"{ingested.seconds:.1f}s"
+                        progress_text.caption(
+                            f"📄 {done}/{total} arquivo(s): {ingested.name} "
+                            f"({ingested.records:,} registros, {origem})"
+                        )
 
-                        df = df_combined
+                    pipeline = IngestionPipeline(cache=st.session_state.cache_service)
+                    result = pipeline.run(
+                        [("Planilha Padrão" if source_type == "default" else file_data.name, file_data)
+                         for source_type, file_data in files_to_process],
+                        on_file_done=on_file_done,
+                        digests=file_ids
+                    )
+                    progress_bar.empty()
+                    progress_text.empty()
+
+                    file_stats = [
+                        {
+                            'nome': ingested.name,
+                            'registros': ingested.records,
+                            'source': file_sources[ingested.index],
+                            'formato': ingested.dialect,
+                            'leitor': ingested.engine,
+                            'cache': ingested.cached
+                        }
+                        for ingested in result.files
+                    ]
+
+                    df = result.df
+                    total_antes = result.total_before
+                    total_depois = len(df)
+                    duplicatas_removidas = result.duplicates_removed
 
                 # Log do upload
                 upload_description = []
@@ -412,7 +541,12 @@ def main():
                     with st.expander("📊 Detalhes do Processamento", expanded=False):
                         st.markdown("**Arquivos processados:**")
                         for stat in file_stats:
-                            st.write(f"{stat['source']}: {stat['registros']:,} registros")
+                            st.write(f"{stat['source']}: {stat['registros']:,} registros"
+                                     + (" (cache)" if stat['cache'] else ""))
+                            if stat['formato']:
+                                st.caption(f"CSV ({stat['leitor']}): {stat['formato']}")
+                            else:
+                                st.caption(f"Leitor: {stat['leitor']}")
 
                         st.markdown("---")
                         st.write(f"**Total antes:** {total_antes:,} registros")
@@ -420,13 +554,17 @@ def main():
                             st.write(f"**Duplicatas removidas:** {duplicatas_removidas:,}")
                         st.write(f"**Total final:** {total_depois:,} registros")
 
-                # Classificação automática
-                df = auto_classify_data(df)
+                # Classificação automática em segundo plano: o painel renderiza já com os dados carregados
+                worker = ClassificationWorker.shared()
+                if 'classification_job_id' in st.session_state:
+                    worker.cancel(st.session_state.pop('classification_job_id'))
+                st.session_state['classification_job_id'] = worker.submit(df, auto_classify_data)
 
                 st.session_state['df'] = df
                 st.session_state['_last_files_id'] = current_files_id
-                st.session_state['classification_done'] = True
-                st.session_state['subclassification_done'] = True
+                st.session_state['classification_done'] = False
+                st.session_state['subclassification_done'] = False
+                st.session_state.pop('classification_messages', None)
 
             except Exception as e:
                 st.error(f"❌ Erro ao processar arquivo(s): {str(e)}")
@@ -434,6 +572,10 @@ def main():
                 st.code(traceback.format_exc())
                 st.stop()
 
+    classification_job = apply_classification_result()
+    if classification_job is not None:
+        render_classification_progress(classification_job)
+
     if 'df' in st.session_state:
         df = st.session_state['df']
 
@@ -464,37 +606,18 @@ def main():
             st.markdown("---")
 
             with st.expander("🤖 Status da Classificação", expanded=False):
-                num_categorias_nao_class = 0
-                num_subcategorias_nao_class = 0
-                num_vazios_total = 0
-
-                if 'DS_ASSUNTO' in df.columns:
-                    from src.services.TextBuilderService import TextBuilderService
-                    text_builder = TextBuilderService()
-                    num_categorias_nao_class = df['DS_ASSUNTO'].apply(text_builder.needs_classification).sum()
-
-                    vazios_ds_assunto = (df['DS_ASSUNTO'].isna() | (df['DS_ASSUNTO'].str.strip() == '')).sum()
-                else:
-                    vazios_ds_assunto = 0
-
-                if 'SUB_ASSUNTO' in df.columns:
-                    mask_needs_sub = (
-                        df['SUB_ASSUNTO'].isna() |
-                        (df['SUB_ASSUNTO'].str.strip() == '') |
-                        df['SUB_ASSUNTO'].str.upper().str.contains('OUTRO', na=False)
-                    )
-                    num_subcategorias_nao_class = mask_needs_sub.sum()
-
-                    vazios_sub_assunto = (df['SUB_ASSUNTO'].isna() | (df['SUB_ASSUNTO'].str.strip() == '')).sum()
-                else:
-                    vazios_sub_assunto = 0
-
-                num_vazios_total = vazios_ds_assunto + vazios_sub_assunto
+                status = get_classification_status(df)
+                num_categorias_nao_class = status['categorias']
+                num_subcategorias_nao_class = status['subcategorias']
+                num_vazios_total = status['vazios']
 
                 st.markdown(f"📂 **Campos de Categorias não classificadas:** `{num_categorias_nao_class}`")
                 st.markdown(f"🔖 **Campos de SubCategorias não classificadas:** `{num_subcategorias_nao_class}`")
                 st.markdown(f"⚠️ **Campos Vazios:** `{num_vazios_total}`")
 
+                for message in st.session_state.get('classification_messages', []):
+                    st.markdown(message)
+
                 if num_categorias_nao_class == 0 and num_subcategorias_nao_class == 0:
                     st.success("✅ Todos os dados foram classificados automaticamente!")
 
@@ -1100,6 +1223,33 @@ def main():
                         for qtype, count in stats['query_types'].items():
                             st.write(f"- {qtype}: {count}")
 
+                st.markdown("#### ⚡ Cache em Camadas")
+                tier_stats = cache.get_tier_stats()
+                memory_stats = tier_stats['memoria']
+                sqlite_stats = tier_stats['sqlite']
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(
+                        "Acertos em Memória",
+                        f"{memory_stats['hit_ratio']:.1%}",
+                        help=f"{memory_stats['hits']:,} acertos / {memory_stats['misses']:,} faltas"
+                    )
+                with col2:
+                    st.metric(
+                        "Acertos no SQLite",
+                        f"{sqlite_stats['hit_ratio']:.1%}",
+                        help=f"Leituras que não estavam em memória: {sqlite_stats['hits']:,} acertos / "
+                             f"{sqlite_stats['misses']:,} faltas"
+                    )
+                with col3:
+                    st.metric(
+                        "Uso da Memória",
+                        f"{memory_stats['bytes'] / 1024 ** 2:,.1f} MB",
+                        help=f"{memory_stats['entries']:,} entradas, limite de "
+                             f"{memory_stats['max_bytes'] / 1024 ** 2:,.0f} MB, {memory_stats['evictions']:,} descartes"
+                    )
+
         with st.expander("📄 Ver Dados Brutos"):
             st.dataframe(filtered_df, use_container_width=True)
 
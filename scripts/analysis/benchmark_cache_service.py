@@ -0,0 +1,203 @@
+"""
+Benchmark do SQLiteCacheService sob acesso concorrente.
+
+Compara, para cada numero de threads, o servico atual (pool de conexoes
+compartilhado, WAL, transacoes curtas) com o padrao anterior de abrir,
+executar, commitar e fechar uma conexao por operacao (journal padrao).
+Cada thread executa uma mistura de operacoes parecida com a do painel:
+leituras do cache, gravacoes no cache e registros de auditoria.
+
+Com --dataframe-linhas, mede tambem set/get de um DataFrame classificado
+sinteticamente: pickle em BLOB (padrao anterior) contra Arrow IPC em
+arquivo sidecar com cada compressao.
+
+O banco e criado em um diretorio temporario; data/cache.db nao e tocado.
+
+Uso:
+    python scripts/analysis/benchmark_cache_service.py
+    python scripts/analysis/benchmark_cache_service.py --threads 1 4 8 16 --ops 2000
+    python scripts/analysis/benchmark_cache_service.py --threads 4 --dataframe-linhas 200000
+"""
+import argparse
+import pickle
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.services.CacheService import SQLiteCacheService
+
+# Proporcao das operacoes (leitura de cache / gravacao de cache / auditoria)
+MIX = (('get', 0.6), ('set', 0.2), ('log_query', 0.2))
+
+
+class ConexaoPorOperacao:
+    """Padrao anterior do SQLiteCacheService: uma conexao nova por chamada."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        SQLiteCacheService(db_path)._pool.close_all()  # Mesmo schema
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode = DELETE")  # Journal padrao, como antes do pool
+        conn.close()
+
+    def set(self, key, value, ttl_seconds=3600):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), (datetime.now() + timedelta(seconds=ttl_seconds)).isoformat(' '))
+        )
+        conn.commit()
+        conn.close()
+
+    def get(self, key):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return pickle.loads(row[0]) if row else None
+
+    def log_query(self, query_text, query_type, user="system", response_time_ms=0):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT INTO query_audit (query_text, query_type, user, response_time_ms) VALUES (?, ?, ?, ?)",
+            (query_text, query_type, user, response_time_ms)
+        )
+        conn.commit()
+        conn.close()
+
+
+def executar(servico, num_threads, ops_por_thread, num_chaves=200):
+    """Roda ops_por_thread operacoes em cada thread e retorna (ops/s, erros)."""
+    valor = {'grafico': list(range(200)), 'titulo': 'Distribuicao por assunto'}
+    for i in range(num_chaves):
+        servico.set(f"chave_{i}", valor)
+
+    erros = []
+    barreira = threading.Barrier(num_threads + 1)
+
+    def trabalhador(seed):
+        rng = random.Random(seed)
+        ops = [op for op, _ in MIX]
+        pesos = [peso for _, peso in MIX]
+        barreira.wait()
+        for _ in range(ops_por_thread):
+            op = rng.choices(ops, pesos)[0]
+            chave = f"chave_{rng.randrange(num_chaves)}"
+            try:
+                if op == 'get':
+                    servico.get(chave)
+                elif op == 'set':
+                    servico.set(chave, valor)
+                else:
+                    servico.log_query(f"filtro {chave}", 'filter', response_time_ms=rng.random() * 50)
+            except sqlite3.OperationalError as e:  # "database is locked" no padrao anterior
+                erros.append(str(e))
+
+    threads = [threading.Thread(target=trabalhador, args=(seed,)) for seed in range(num_threads)]
+    for t in threads:
+        t.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    return num_threads * ops_por_thread / duracao, len(erros)
+
+
+def dataframe_sintetico(linhas):
+    """DataFrame com as colunas tipicas de uma planilha classificada."""
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        'NU_REGISTRO': np.arange(linhas),
+        'DT_REGISTRO_ATENDIMENTO': pd.date_range('2024-01-01', periods=linhas, freq='min'),
+        'DS_ASSUNTO': rng.choice(['Atraso na entrega', 'Cobranca indevida', 'Produto com defeito'], linhas),
+        'SUB_ASSUNTO': rng.choice(['PRAZO', 'VALOR', 'TROCA', 'REEMBOLSO'], linhas),
+        'DS_OBSERVACAO': [f"Cliente relata problema no pedido {i} e solicita retorno" for i in range(linhas)],
+        'NR_DIAS': rng.integers(0, 60, linhas),
+    })
+
+
+def medir(funcao, repeticoes=3):
+    """Menor tempo (s) entre algumas execucoes."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def tamanho_em_disco(tmp, db_name):
+    arquivos = list(Path(tmp).glob(f"{db_name}*")) + list((Path(tmp) / 'cache_blobs').glob('*'))
+    return sum(path.stat().st_size for path in arquivos)
+
+
+def benchmark_dataframe(tmp, linhas):
+    """Compara pickle em BLOB com Arrow em sidecar para um DataFrame grande."""
+    df = dataframe_sintetico(linhas)
+    print(f"\nDataFrame de {linhas:,} linhas ({df.memory_usage(deep=True).sum() / 1e6:,.1f} MB em memoria)")
+    print(f"{'formato':>22} | {'set (ms)':>9} | {'get (ms)':>9} | {'disco (MB)':>10}")
+    print("-"*62)
+
+    base = ConexaoPorOperacao(str(Path(tmp) / "df_base.db"))
+    tempo_set = medir(lambda: base.set('df', df))
+    tempo_get = medir(lambda: base.get('df'))
+    print(f"{'pickle (anterior)':>22} | {tempo_set * 1000:>9,.0f} | {tempo_get * 1000:>9,.0f} | "
+          f"{tamanho_em_disco(tmp, 'df_base.db') / 1e6:>10,.1f}")
+
+    for compressao in (None, 'lz4', 'zstd'):
+        servico = SQLiteCacheService(str(Path(tmp) / f"df_{compressao}.db"), compression=compressao)
+        tempo_set = medir(lambda: servico.set('df', df))
+        tempo_get = medir(lambda: servico.get('df'))
+        disco = tamanho_em_disco(tmp, f"df_{compressao}.db")
+        servico.delete('df')
+        servico._pool.close_all()
+        nome = f"arrow ({compressao or 'sem compressao'})"
+        print(f"{nome:>22} | {tempo_set * 1000:>9,.0f} | "
+              f"{tempo_get * 1000:>9,.0f} | {disco / 1e6:>10,.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do SQLiteCacheService com threads concorrentes")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help="Numeros de threads testados")
+    parser.add_argument('--ops', type=int, default=1000, help="Operacoes por thread")
+    parser.add_argument('--dataframe-linhas', type=int, default=0,
+                        help="Linhas do DataFrame do benchmark de serializacao (0 = nao executar)")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("BENCHMARK SQLiteCacheService")
+    print("="*80)
+    print(f"Mistura: {', '.join(f'{op} {peso:.0%}' for op, peso in MIX)} | {args.ops:,} operacoes por thread\n")
+    print(f"{'threads':>8} | {'conexao/op (ops/s)':>20} | {'pool + WAL (ops/s)':>20} | {'ganho':>7} | erros")
+    print("-"*80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_threads in args.threads:
+            base = ConexaoPorOperacao(str(Path(tmp) / f"base_{num_threads}.db"))
+            tps_base, erros_base = executar(base, num_threads, args.ops)
+
+            pool = SQLiteCacheService(str(Path(tmp) / f"pool_{num_threads}.db"))
+            tps_pool, erros_pool = executar(pool, num_threads, args.ops)
+            pool._pool.close_all()
+
+            print(f"{num_threads:>8} | {tps_base:>20,.0f} | {tps_pool:>20,.0f} | "
+                  f"{tps_pool / tps_base:>6.1f}x | {erros_base} / {erros_pool}")
+
+        if args.dataframe_linhas:
+            benchmark_dataframe(tmp, args.dataframe_linhas)
+
+
+if __name__ == "__main__":
+    main()
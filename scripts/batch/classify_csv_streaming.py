@@ -0,0 +1,94 @@
+"""
+Classificacao em blocos de CSVs maiores que a memoria.
+
+Le o CSV em blocos de --linhas-por-bloco registros (todas as colunas como
+texto, mesmos tipos em todos os blocos), mapeia colunas, converte datas,
+remove NU_REGISTRO repetidos entre blocos, classifica DS_ASSUNTO e
+SUB_ASSUNTO e grava cada bloco no CSV de saida assim que fica pronto.
+Apenas alguns blocos ficam em memoria ao mesmo tempo.
+
+Classificacoes anteriores sao reaproveitadas pelo ClassificationStore, entao
+uma execucao interrompida pode ser repetida sem reclassificar o que ja foi feito.
+
+Uso:
+    python scripts/batch/classify_csv_streaming.py historico.csv
+    python scripts/batch/classify_csv_streaming.py historico.csv --linhas-por-bloco 50000 --saida saida.csv
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.services.EmbeddingService import EmbeddingService
+from src.services.AssuntoClassifierService import AssuntoClassifierService
+from src.services.SubAssuntoClassifierService import SubAssuntoClassifierService
+from src.services.StreamingIngestion import stream_csv, classify_stream, write_csv_stream
+from src.infrastructure.ml.ClassificationStore import ClassificationStore
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+CLASSIFICATION_STORE_PATH = 'data/ml/classification_store.db'
+ENCODE_WORKERS = 0  # Processos de encoding (0 = todos os nucleos, 1 = processo unico)
+THREADS_PER_WORKER = 2  # Threads do torch por processo (evita oversubscription)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificacao em blocos de CSVs grandes")
+    parser.add_argument('arquivo', help="CSV de entrada")
+    parser.add_argument('--saida', default=None,
+                        help="CSV de saida (padrao: planilhas_total_classificada/<nome>_CLASSIFICADO_<data>.csv)")
+    parser.add_argument('--linhas-por-bloco', type=int, default=100_000, help="Registros por bloco")
+    args = parser.parse_args()
+
+    saida = args.saida
+    if saida is None:
+        Path("planilhas_total_classificada").mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        saida = f"planilhas_total_classificada/{Path(args.arquivo).stem}_CLASSIFICADO_{timestamp}.csv"
+
+    print("="*80)
+    print("CLASSIFICACAO EM BLOCOS")
+    print("="*80)
+    print(f"-> Entrada: {args.arquivo}")
+    print(f"-> Saida: {saida}")
+    print(f"-> Registros por bloco: {args.linhas_por_bloco:,}")
+
+    embedding_service = EmbeddingService(
+        model_name=EMBEDDING_MODEL_NAME,
+        num_workers=ENCODE_WORKERS,
+        threads_per_worker=THREADS_PER_WORKER
+    )
+    classification_store = ClassificationStore(CLASSIFICATION_STORE_PATH)
+    assunto_classifier = AssuntoClassifierService(
+        embedding_service=embedding_service,
+        classification_store=classification_store
+    )
+    subassunto_classifier = SubAssuntoClassifierService(
+        embedding_service=embedding_service,
+        classification_store=classification_store
+    )
+
+    inicio = time.time()
+
+    def progresso(registros):
+        print(f"   {registros:,} registros classificados ({time.time() - inicio:.0f}s)")
+
+    try:
+        chunks = stream_csv(args.arquivo, chunk_rows=args.linhas_por_bloco)
+        chunks = classify_stream(chunks, assunto_classifier)
+        chunks = classify_stream(chunks, subassunto_classifier, progress_callback=progresso)
+        total = write_csv_stream(chunks, saida)
+    finally:
+        embedding_service.close()
+        classification_store.close()
+
+    print("\n" + "="*80)
+    print(f"CONCLUIDO: {total:,} registros em {time.time() - inicio:.0f}s")
+    print(f"-> Salvo: {saida}")
+    print("="*80)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ sys.path.append(str(Path(__file__).parent / 'src'))
 from src.services.EmbeddingService import EmbeddingService
 from src.services.SubAssuntoClassifierService import SubAssuntoClassifierService
 from src.services.FuzzyColumnMapper import FuzzyColumnMapper
+from src.shared.utils.ClassificationMasks import needs_subassunto_mask
+
+ENCODE_WORKERS = 0  # Processos de encoding (0 = todos os nucleos, 1 = processo unico)
+THREADS_PER_WORKER = 2  # Threads do torch por processo (evita oversubscription)
 
 def main():
     print("="*80)
@@ -52,17 +56,15 @@ def main():
         print(f"-> Colunas disponiveis: {list(df.columns)}")
         return
 
-    mask_needs_class = (
-        df['SUB_ASSUNTO'].isna() |
-        (df['SUB_ASSUNTO'].str.strip() == '') |
-        df['SUB_ASSUNTO'].str.upper().str.contains('OUTRO', na=False)
-    )
+    mask_needs_class = needs_subassunto_mask(df['SUB_ASSUNTO'])
     num_needs_class = mask_needs_class.sum()
     print(f"-> Registros que precisam classificacao: {num_needs_class:,}")
 
     print("\n[3/5] Inicializando classificador...")
     embedding_service = EmbeddingService(
-        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+        num_workers=ENCODE_WORKERS,
+        threads_per_worker=THREADS_PER_WORKER
     )
     classifier = SubAssuntoClassifierService(
         embedding_service=embedding_service,
@@ -112,6 +114,8 @@ def main():
     print(f"   - Classificados: ~{classificados_partial:,} de 8500 tentativas")
     print(f"   - Restantes 'outros': {num_needs_class - 8500:,}")
 
+    embedding_service.close()
+
     print("\n[6/6] Salvando resultados...")
     Path("planilhas_total_classificada").mkdir(exist_ok=True)
     Path("planilhas_parcialmente_classificada").mkdir(exist_ok=True)
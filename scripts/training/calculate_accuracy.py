@@ -11,11 +11,13 @@ Método:
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-import pickle
 from pathlib import Path
 
 from src.services.EmbeddingService import EmbeddingService
 from src.services.TextBuilderService import TextBuilderService
+from src.shared.utils.ClassificationMasks import needs_assunto_mask
+from src.infrastructure.ml.ReferenceBundle import ReferenceBundle
+from src.infrastructure.ml.ReferenceSet import ReferenceSet
 
 
 def normalizar_categoria(cat):
@@ -42,10 +44,13 @@ def main():
 
     print(f"Total de registros: {len(df):,}")
 
-    text_builder = TextBuilderService()
+    embedding_service = EmbeddingService(
+        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+    )
+    text_builder = TextBuilderService.for_model(embedding_service)  # Mesmos textos do treinamento
 
-    df_valid = df[~df['DS_ASSUNTO'].apply(text_builder.needs_classification)].copy()
-    df_valid['texto_referencia'] = df_valid.apply(text_builder.build_text_from_row, axis=1)
+    df_valid = df[~needs_assunto_mask(df['DS_ASSUNTO'])].copy()
+    df_valid['texto_referencia'] = text_builder.build_texts(df_valid)
     df_valid = df_valid[df_valid['texto_referencia'].apply(lambda x: text_builder.validate_text_length(x, 10))]
 
     print(f"Registros validos: {len(df_valid):,}")
@@ -64,10 +69,6 @@ def main():
 
     print("\nGerando embeddings do conjunto de TREINO...")
 
-    embedding_service = EmbeddingService(
-        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
-    )
-
     train_embeddings = embedding_service.generate_embeddings(train_df['texto_referencia'].tolist())
 
     print(f"Embeddings gerados: {train_embeddings.shape}")
@@ -75,10 +76,15 @@ def main():
     temp_dir = Path("data/ml/temp")
     temp_dir.mkdir(parents=True, exist_ok=True)
 
-    with open(temp_dir / 'train_reference.pkl', 'wb') as f:
-        pickle.dump(train_df[['DS_ASSUNTO', 'texto_referencia']], f)
-
-    np.save(temp_dir / 'train_embeddings.npy', train_embeddings)
+    train_reference = ReferenceSet.from_labels(
+        train_embeddings.astype(np.float32), train_df['DS_ASSUNTO'], train_df['texto_referencia'].tolist()
+    )
+    train_reference.text_config = text_builder.get_config()
+    ReferenceBundle(temp_dir / 'train').write(
+        train_reference,
+        model_name=embedding_service.model_name,
+        label_column='DS_ASSUNTO'
+    )
 
     print("\n" + "="*80)
     print("TESTANDO DIFERENTES THRESHOLDS")
@@ -94,8 +100,7 @@ def main():
 
         classifier = AssuntoClassifierService(
             embedding_service=embedding_service,
-            reference_data_path=str(temp_dir / 'train_reference.pkl'),
-            reference_embeddings_path=str(temp_dir / 'train_embeddings.npy'),
+            artifact_dir=str(temp_dir / 'train'),
             threshold=threshold,
             k_neighbors=5
         )
@@ -0,0 +1,165 @@
+"""
+Exporta o modelo de embeddings para ONNX (fp32 + int8 quantizado) e
+verifica a paridade com o PyTorch antes de liberar o backend.
+
+Exportacao:
+    data/ml/onnx/<modelo>/model.onnx          transformer em fp32
+    data/ml/onnx/<modelo>/model_int8.onnx     pesos int8 (quantizacao dinamica)
+
+Verificacao de paridade (amostra de uma planilha rotulada):
+    - mesmos textos codificados pelo PyTorch e pelo backend ONNX
+    - similaridade de cosseno entre os vetores de cada texto
+    - concordancia das classificacoes (DS_ASSUNTO / SUB_ASSUNTO) contra o
+      conjunto de referencia atual, incluindo registros que ficam abaixo do
+      threshold em um backend e nao no outro
+    - throughput (textos/s) de cada backend
+O relatorio e gravado em data/ml/onnx/<modelo>/parity_<backend>.json e o
+script termina com erro se a concordancia ficar abaixo de --min-concordancia.
+
+Uso:
+    python scripts/training/export_onnx_model.py planilha_rotulada.xlsx
+    python scripts/training/export_onnx_model.py planilha.csv --backend onnx --amostra 2000
+    python scripts/training/export_onnx_model.py planilha.csv --sem-exportar
+
+Depois, ajuste EMBEDDING_BACKEND em app.py ('onnx_int8' ou 'onnx').
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.services.ExcelReaderService import ExcelReaderService
+from src.services.FuzzyColumnMapper import FuzzyColumnMapper
+from src.services.EmbeddingService import EmbeddingService
+from src.services.AssuntoClassifierService import AssuntoClassifierService
+from src.services.SubAssuntoClassifierService import SubAssuntoClassifierService
+from src.services.TextBuilderService import TextBuilderService
+from src.infrastructure.ml.OnnxEncoder import DEFAULT_ONNX_DIR, export_onnx_model, onnx_model_dir
+
+MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+THRESHOLD = 0.45  # Mesmo threshold usado pelo app
+
+
+def medir_encoding(embedding_service, textos):
+    """Codifica os textos e retorna (embeddings, textos por segundo)."""
+    embedding_service.generate_embeddings(textos[:32])  # Aquecimento
+
+    inicio = time.perf_counter()
+    embeddings = embedding_service.generate_embeddings(textos)
+    duracao = time.perf_counter() - inicio
+    return embeddings, len(textos) / max(duracao, 1e-9)
+
+
+def classificar(classifier_cls, embedding_service, df, coluna):
+    """Classifica a amostra com os rotulos apagados e retorna a coluna prevista."""
+    df_teste = df.copy()
+    df_teste[coluna] = None
+    classifier = classifier_cls(embedding_service=embedding_service, threshold=THRESHOLD, k_neighbors=5)
+    return classifier.classify_dataframe(df_teste)[coluna].to_numpy(dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo para ONNX e verifica a paridade com o PyTorch")
+    parser.add_argument('arquivo', help="Planilha (xlsx/csv) com registros para a verificacao de paridade")
+    parser.add_argument('--modelo', default=MODEL_NAME, help=f"Modelo de embeddings (padrao: {MODEL_NAME})")
+    parser.add_argument('--backend', choices=['onnx', 'onnx_int8'], default='onnx_int8',
+                        help="Backend verificado (padrao: onnx_int8)")
+    parser.add_argument('--amostra', type=int, default=1000, help="Registros usados na verificacao")
+    parser.add_argument('--min-concordancia', type=float, default=0.98,
+                        help="Concordancia minima das classificacoes (0-1)")
+    parser.add_argument('--onnx-dir', default=DEFAULT_ONNX_DIR, help="Diretorio base das exportacoes")
+    parser.add_argument('--sem-exportar', action='store_true', help="Apenas verifica uma exportacao existente")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("EXPORTACAO ONNX E VERIFICACAO DE PARIDADE")
+    print("="*80)
+    print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    if not args.sem_exportar:
+        print(f"> Exportando {args.modelo}...")
+        output_dir = export_onnx_model(args.modelo, args.onnx_dir, quantize=(args.backend == 'onnx_int8'))
+        print(f"   OK exportado para {output_dir}")
+    output_dir = onnx_model_dir(args.modelo, args.onnx_dir)
+
+    with open(args.arquivo, 'rb') as f:
+        df = ExcelReaderService().read_excel(f)
+    df = FuzzyColumnMapper().map_columns(df)
+    if len(df) > args.amostra:
+        df = df.sample(args.amostra, random_state=42)
+    df = df.reset_index(drop=True)
+
+    text_builder = TextBuilderService()
+    textos = text_builder.build_texts(df)
+    print(f"\n-> {len(textos):,} registros na amostra de {args.arquivo}")
+
+    baseline = EmbeddingService(model_name=args.modelo)
+    candidato = EmbeddingService(model_name=args.modelo, backend=args.backend, onnx_dir=args.onnx_dir)
+
+    print("\n> Codificando com PyTorch...")
+    emb_base, tps_base = medir_encoding(baseline, textos)
+    print(f"> Codificando com {args.backend}...")
+    emb_cand, tps_cand = medir_encoding(candidato, textos)
+
+    cossenos = np.sum(emb_base * emb_cand, axis=1)
+    relatorio = {
+        'modelo': args.modelo,
+        'backend': args.backend,
+        'arquivo': str(args.arquivo),
+        'registros': len(textos),
+        'data': datetime.now().isoformat(),
+        'throughput_torch': tps_base,
+        'throughput_backend': tps_cand,
+        'speedup': tps_cand / tps_base,
+        'cosseno_medio': float(cossenos.mean()),
+        'cosseno_minimo': float(cossenos.min()),
+        'concordancia': {},
+    }
+
+    classificadores = [('DS_ASSUNTO', AssuntoClassifierService), ('SUB_ASSUNTO', SubAssuntoClassifierService)]
+    for coluna, classifier_cls in classificadores:
+        if coluna not in df.columns:
+            continue
+        try:
+            previsto_base = classificar(classifier_cls, baseline, df, coluna)
+        except FileNotFoundError as e:
+            print(f"   [AVISO] {coluna}: {e}")
+            continue
+        previsto_cand = classificar(classifier_cls, candidato, df, coluna)
+        iguais = [a == b for a, b in zip(previsto_base, previsto_cand)]  # None == None: ambos abaixo do threshold
+        relatorio['concordancia'][coluna] = float(np.mean(iguais))
+
+    print("\n" + "="*80)
+    print("RESULTADO")
+    print("="*80)
+    print(f"Throughput PyTorch:   {tps_base:,.1f} textos/s")
+    print(f"Throughput {args.backend}: {tps_cand:,.1f} textos/s ({relatorio['speedup']:.2f}x)")
+    print(f"Cosseno medio/minimo: {relatorio['cosseno_medio']:.4f} / {relatorio['cosseno_minimo']:.4f}")
+    for coluna, concordancia in relatorio['concordancia'].items():
+        print(f"Concordancia {coluna}: {concordancia:.2%}")
+
+    aprovado = bool(relatorio['concordancia']) and all(
+        concordancia >= args.min_concordancia for concordancia in relatorio['concordancia'].values()
+    )
+    relatorio['min_concordancia'] = args.min_concordancia
+    relatorio['aprovado'] = aprovado
+
+    report_path = output_dir / f"parity_{args.backend}.json"
+    report_path.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\nRelatorio salvo em {report_path}")
+
+    if not aprovado:
+        print(f"[ERRO] Concordancia abaixo de {args.min_concordancia:.0%}: mantenha EMBEDDING_BACKEND = 'torch'")
+        sys.exit(1)
+
+    print(f"OK backend {args.backend} aprovado (ajuste EMBEDDING_BACKEND em app.py)")
+
+
+if __name__ == "__main__":
+    main()
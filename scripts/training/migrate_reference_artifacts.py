@@ -0,0 +1,76 @@
+"""
+Converte os arquivos de referencia legados (pickle + .npy soltos) para o
+artefato versionado usado pelos classificadores:
+
+    data/ml/assunto_reference.pkl + assunto_embeddings.npy       -> data/ml/assunto/
+    data/ml/subassunto_reference.pkl + subassunto_embeddings.npy -> data/ml/subassunto/
+
+O modelo de embeddings registrado no manifest vem de assunto_metadata.pkl
+quando disponivel (ou de --modelo). Execute uma unica vez, em um ambiente
+confiavel: e o ultimo ponto em que os pickles sao lidos.
+
+Uso:
+    python scripts/training/migrate_reference_artifacts.py
+    python scripts/training/migrate_reference_artifacts.py --modelo neuralmind/bert-base-portuguese-cased
+"""
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.infrastructure.ml.ReferenceBundle import ReferenceBundle
+from src.infrastructure.ml.ReferenceSet import ReferenceSet
+
+DATA_DIR = Path('data/ml')
+MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+LEGACY_SETS = [
+    ('assunto', 'DS_ASSUNTO', 'assunto_metadata.pkl'),
+    ('subassunto', 'SUB_ASSUNTO', None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra referencias em pickle para o artefato versionado")
+    parser.add_argument('--modelo', default=None,
+                        help=f"Modelo de embeddings usado no treino (padrao: metadata legado ou {MODEL_NAME})")
+    args = parser.parse_args()
+
+    for tipo, label_column, metadata_name in LEGACY_SETS:
+        data_path = DATA_DIR / f"{tipo}_reference.pkl"
+        embeddings_path = DATA_DIR / f"{tipo}_embeddings.npy"
+        bundle = ReferenceBundle(DATA_DIR / tipo)
+
+        if bundle.exists():
+            print(f"[{tipo}] Artefato ja existe em {bundle.bundle_dir}, nada a fazer")
+            continue
+        if not (data_path.exists() and embeddings_path.exists()):
+            print(f"[{tipo}] Arquivos legados nao encontrados ({data_path}, {embeddings_path})")
+            continue
+
+        training_info = {'migrated_from': [str(data_path), str(embeddings_path)]}
+        model_name = args.modelo
+        if metadata_name and (DATA_DIR / metadata_name).exists():
+            with open(DATA_DIR / metadata_name, 'rb') as f:
+                metadata = pickle.load(f)
+            model_name = model_name or metadata.get('embedding_model')
+            training_info['legacy_metadata'] = {
+                key: value for key, value in metadata.items()
+                if key not in ('reference_path', 'embeddings_path')
+            }
+
+        reference_set = ReferenceSet.from_legacy(data_path, embeddings_path, label_column)
+        manifest = bundle.write(
+            reference_set,
+            model_name=model_name or MODEL_NAME,
+            label_column=label_column,
+            training_info=training_info
+        )
+        print(f"[{tipo}] OK {manifest['num_records']:,} registros migrados para {bundle.bundle_dir} "
+              f"(modelo {manifest['embedding_model']}, dimensao {manifest['embedding_dimension']})")
+
+
+if __name__ == "__main__":
+    main()
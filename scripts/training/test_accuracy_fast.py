@@ -6,6 +6,7 @@ import numpy as np
 from src.services.EmbeddingService import EmbeddingService
 from src.services.AssuntoClassifierService import AssuntoClassifierService
 from src.services.TextBuilderService import TextBuilderService
+from src.shared.utils.ClassificationMasks import needs_assunto_mask
 
 
 def normalizar_categoria(cat):
@@ -31,8 +32,8 @@ def main():
     )
 
     text_builder = TextBuilderService()
-    df_valid = df[~df['DS_ASSUNTO'].apply(text_builder.needs_classification)].copy()
-    df_valid['texto_referencia'] = df_valid.apply(text_builder.build_text_from_row, axis=1)
+    df_valid = df[~needs_assunto_mask(df['DS_ASSUNTO'])].copy()
+    df_valid['texto_referencia'] = text_builder.build_texts(df_valid)
     df_valid = df_valid[df_valid['texto_referencia'].apply(lambda x: text_builder.validate_text_length(x, 10))]
 
     print(f"Total validos: {len(df_valid):,}")
@@ -73,10 +74,10 @@ def main():
         correct = 0
         classified = 0
         total = len(test_sample)
+        textos = classifier.text_builder.build_texts(test_sample)  # Mesma configuracao de texto do artefato
 
-        for idx, row in test_sample.iterrows():
+        for (idx, row), texto in zip(test_sample.iterrows(), textos):
             real_category = normalizar_categoria(row['DS_ASSUNTO'])
-            texto = row['texto_referencia']
 
             result = classifier.classify_assunto(texto)
             predicted_category = normalizar_categoria(result['categoria'])
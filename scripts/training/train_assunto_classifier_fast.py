@@ -3,17 +3,23 @@ Script de treinamento OTIMIZADO do classificador de DS_ASSUNTO.
 
 Melhorias:
 1. Usa modelo menor e mais rapido (MiniLM)
-2. Amostra estratificada do dataset (mais rapido)
-3. Salva checkpoints incrementais
+2. Le o CSV em chunks (apenas as colunas necessarias) e usa todo o historico
+3. Embeddings gravados incrementalmente em .npy mapeado em memoria,
+   com checkpoint para retomar uma execucao interrompida
+4. Amostra estratificada opcional (SAMPLE_SIZE > 0)
+5. Resultado salvo como artefato versionado em data/ml/assunto/
+   (manifest.json com modelo, dimensao, checksums e vocabulario de rotulos)
 """
 import pandas as pd
-import numpy as np
 from pathlib import Path
-import pickle
 from datetime import datetime
 
 from src.services.EmbeddingService import EmbeddingService
 from src.services.TextBuilderService import TextBuilderService
+from src.shared.utils.ClassificationMasks import needs_assunto_mask
+from src.infrastructure.ml.StreamingEmbeddingWriter import StreamingEmbeddingWriter
+from src.infrastructure.ml.ReferenceBundle import ReferenceBundle
+from src.infrastructure.ml.ReferenceSet import ReferenceSet
 
 
 def criar_amostra_estratificada(df, coluna_categoria, n_por_categoria=None, total_desejado=5000):
@@ -58,6 +64,54 @@ def criar_amostra_estratificada(df, coluna_categoria, n_por_categoria=None, tota
     return df_resultado
 
 
+def carregar_referencias_streaming(caminho, text_builder, chunksize=50000):
+    """
+    Le o CSV de treinamento em chunks, mantendo apenas DS_ASSUNTO e o texto de referencia.
+
+    Args:
+        caminho: Caminho do CSV de treinamento
+        text_builder: TextBuilderService usado para montar os textos
+        chunksize: Linhas lidas por chunk
+
+    Returns:
+        tuple: (DataFrame com DS_ASSUNTO e texto_referencia, total de linhas lidas)
+    """
+    colunas = {'DS_ASSUNTO', *TextBuilderService.TEXT_COLUMNS}
+    partes = []
+    total_lido = 0
+
+    leitor = pd.read_csv(
+        caminho,
+        sep=';',
+        encoding='latin1',
+        usecols=lambda c: c in colunas,
+        dtype=str,
+        chunksize=chunksize
+    )
+
+    for chunk in leitor:
+        total_lido += len(chunk)
+
+        chunk = chunk[~needs_assunto_mask(chunk['DS_ASSUNTO'])]
+        if chunk.empty:
+            continue
+
+        textos = pd.Series(text_builder.build_texts(chunk), index=chunk.index)
+        validos = textos.apply(lambda x: text_builder.validate_text_length(x, min_length=10))
+
+        partes.append(pd.DataFrame({
+            'DS_ASSUNTO': chunk.loc[validos, 'DS_ASSUNTO'].values,
+            'texto_referencia': textos[validos].values
+        }))
+
+        print(f"   Lidos {total_lido:,} registros ({sum(len(p) for p in partes):,} validos)...")
+
+    if not partes:
+        return pd.DataFrame(columns=['DS_ASSUNTO', 'texto_referencia']), total_lido
+
+    return pd.concat(partes, ignore_index=True), total_lido
+
+
 def main():
     """Execute the optimized training pipeline."""
     print("="*80)
@@ -70,42 +124,46 @@ def main():
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     USE_SMALLER_MODEL = True  # Usar modelo menor (mais rapido)
-    USE_STRATIFIED_SAMPLE = True  # Usar amostra estratificada
-    SAMPLE_SIZE = 5000  # Tamanho da amostra (0 = usar todos)
+    USE_STRATIFIED_SAMPLE = False  # Amostra estratificada (so necessaria em maquinas muito limitadas)
+    SAMPLE_SIZE = 0  # Tamanho da amostra (0 = usar todos)
+    CSV_CHUNK_SIZE = 50000  # Linhas lidas do CSV por vez
+    EMBEDDING_CHUNK_SIZE = 2048  # Textos codificados e gravados por checkpoint
+    SEARCH_BACKENDS = ['faiss_hnsw']  # Indices ANN persistidos no artefato
+    ENCODE_WORKERS = 0  # Processos de encoding (0 = todos os nucleos, 1 = processo unico)
+    THREADS_PER_WORKER = 2  # Threads do torch por processo (evita oversubscription)
+    TOKEN_AWARE_TEXT = True  # Textos ajustados ao limite de tokens do modelo, com prioridade por campo
+    MAX_TEXT_CHUNKS = 1  # >1: reclamacoes longas viram ate N chunks com embeddings agregados pela media
 
-    print("ETAPA 1: Carregando dados de treinamento...")
-    print(f"Arquivo: {TRAINING_FILE}")
+    if USE_SMALLER_MODEL:
+        model_name = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+        print("\nOTIMIZACAO: Usando modelo menor e mais rapido (MiniLM)")
+    else:
+        model_name = 'neuralmind/bert-base-portuguese-cased'
 
-    df = pd.read_csv(
-        TRAINING_FILE,
-        sep=';',
-        encoding='latin1',
-        low_memory=False
+    embedding_service = EmbeddingService(
+        model_name=model_name,
+        num_workers=ENCODE_WORKERS,
+        threads_per_worker=THREADS_PER_WORKER
     )
 
-    print(f"Total de registros carregados: {len(df):,}\n")
-
-    print("ETAPA 2: Filtrando registros validos...")
-
-    text_builder = TextBuilderService()
-
-    df_valid = df[~df['DS_ASSUNTO'].apply(text_builder.needs_classification)].copy()
+    print("ETAPA 1: Carregando dados de treinamento (em chunks)...")
+    print(f"Arquivo: {TRAINING_FILE}")
 
-    print(f"Registros com DS_ASSUNTO valido: {len(df_valid):,}")
+    if TOKEN_AWARE_TEXT:
+        text_builder = TextBuilderService.for_model(embedding_service, max_chunks=MAX_TEXT_CHUNKS)
+    else:
+        text_builder = TextBuilderService()
 
-    print("\nConstruindo representacao textual dos registros...")
-    df_valid['texto_referencia'] = df_valid.apply(
-        text_builder.build_text_from_row,
-        axis=1
+    df_valid, total_lido = carregar_referencias_streaming(
+        TRAINING_FILE,
+        text_builder,
+        chunksize=CSV_CHUNK_SIZE
     )
 
-    df_valid = df_valid[
-        df_valid['texto_referencia'].apply(
-            lambda x: text_builder.validate_text_length(x, min_length=10)
-        )
-    ]
+    print(f"Total de registros carregados: {total_lido:,}\n")
 
-    print(f"Registros com texto suficiente: {len(df_valid):,}")
+    print("ETAPA 2: Registros validos para treinamento...")
+    print(f"Registros com DS_ASSUNTO valido e texto suficiente: {len(df_valid):,}")
 
     print("\nDistribuicao ORIGINAL por categoria:")
     category_counts = df_valid['DS_ASSUNTO'].value_counts()
@@ -133,57 +191,61 @@ def main():
     print("ETAPA 3: Gerando embeddings...")
     print("="*80)
 
-    if USE_SMALLER_MODEL:
-        model_name = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
-        print("\nOTIMIZACAO: Usando modelo menor e mais rapido (MiniLM)")
-    else:
-        model_name = 'neuralmind/bert-base-portuguese-cased'
-
-    embedding_service = EmbeddingService(model_name=model_name)
-
     print(f"\nModelo: {embedding_service.model_name}")
     print(f"Dimensao dos embeddings: {embedding_service.get_embedding_dimension()}")
     print(f"\nGerando embeddings para {len(df_train):,} textos...")
     print("(Agora sera mais rapido!)\n")
 
     texts = df_train['texto_referencia'].tolist()
-    embeddings = embedding_service.generate_embeddings(texts)
+
+    # O novo artefato e montado em <tipo>.staging; o atual continua servindo ate a troca no final
+    bundle = ReferenceBundle(OUTPUT_DIR / 'assunto')
+    staging = bundle.staging()
+    staging.bundle_dir.mkdir(parents=True, exist_ok=True)
+    staging.invalidate()
+    embeddings_path = staging.embeddings_path
+
+    def report_progress(done, total, texts_per_second):
+        print(f"   {done:,}/{total:,} textos ({texts_per_second:,.1f} textos/s)")
+
+    writer = StreamingEmbeddingWriter(
+        embedding_service,
+        embeddings_path,
+        chunk_size=EMBEDDING_CHUNK_SIZE,
+        text_config=text_builder.get_config()
+    )
+    embeddings = writer.encode(texts, progress_callback=report_progress)
+    embedding_service.close()
 
     print(f"\nEmbeddings gerados: {embeddings.shape}")
+    print(f"Throughput: {writer.throughput:,.1f} textos/s")
+    print(f"Embeddings salvos em: {embeddings_path}")
 
     print("\n" + "="*80)
     print("ETAPA 4: Salvando dados de referencia...")
     print("="*80)
 
-    reference_path = OUTPUT_DIR / 'assunto_reference.pkl'
-    with open(reference_path, 'wb') as f:
-        pickle.dump(df_train[['DS_ASSUNTO', 'texto_referencia']], f)
-
-    print(f"\nDataFrame de referencia salvo em: {reference_path}")
-
-    embeddings_path = OUTPUT_DIR / 'assunto_embeddings.npy'
-    np.save(embeddings_path, embeddings)
+    reference_set = ReferenceSet.from_labels(embeddings, df_train['DS_ASSUNTO'], texts)
+    reference_set.text_config = text_builder.get_config()
+    manifest = staging.write(
+        reference_set,
+        model_name=embedding_service.model_name,
+        label_column='DS_ASSUNTO',
+        search_backends=SEARCH_BACKENDS,
+        training_info={
+            'original_dataset_size': len(df_valid),
+            'used_stratified_sample': USE_STRATIFIED_SAMPLE,
+            'sample_size': len(df_train),
+            'encoding_throughput_texts_per_s': writer.throughput,
+            'categories': df_train['DS_ASSUNTO'].value_counts().to_dict(),
+        }
+    )
 
-    print(f"Embeddings salvos em: {embeddings_path}")
+    bundle.promote(staging)
+    embeddings_path = bundle.embeddings_path
 
-    metadata = {
-        'training_date': datetime.now().isoformat(),
-        'total_records': len(df_train),
-        'original_dataset_size': len(df_valid),
-        'used_stratified_sample': USE_STRATIFIED_SAMPLE,
-        'sample_size': len(df_train),
-        'embedding_model': embedding_service.model_name,
-        'embedding_dimension': embedding_service.get_embedding_dimension(),
-        'categories': df_train['DS_ASSUNTO'].value_counts().to_dict(),
-        'reference_path': str(reference_path),
-        'embeddings_path': str(embeddings_path)
-    }
-
-    metadata_path = OUTPUT_DIR / 'assunto_metadata.pkl'
-    with open(metadata_path, 'wb') as f:
-        pickle.dump(metadata, f)
-
-    print(f"Metadata salvo em: {metadata_path}")
+    print(f"\nArtefato de referencia salvo em: {bundle.bundle_dir}")
+    print(f"Manifest: {bundle.manifest_path} (versao {manifest['version']})")
 
     print("\n" + "="*80)
     print("TREINAMENTO CONCLUIDO COM SUCESSO!")
@@ -200,10 +262,10 @@ def main():
     for cat, count in df_train['DS_ASSUNTO'].value_counts().items():
         print(f"   - {cat}: {count:,}")
 
-    print(f"\nArquivos gerados:")
-    print(f"   - {reference_path}")
-    print(f"   - {embeddings_path}")
-    print(f"   - {metadata_path}")
+    print(f"\nArquivos gerados em {bundle.bundle_dir}:")
+    for name, info in manifest['files'].items():
+        print(f"   - {name} ({info['bytes'] / 1024 / 1024:.2f} MB)")
+    print(f"   - {bundle.manifest_path.name}")
 
     print(f"\nFim: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("\nO classificador esta pronto para uso!")
@@ -1,17 +1,71 @@
 """
 Script de treinamento RÁPIDO para classificação automática de SUB_ASSUNTO.
 Usa embeddings pré-computados e K-NN para classificação.
+Lê o CSV em chunks e grava os embeddings incrementalmente (com checkpoint),
+permitindo treinar com todo o histórico. O resultado é salvo como artefato
+versionado em data/ml/subassunto/ (manifest.json + arrays mapeados em memória).
 """
 import pandas as pd
-import numpy as np
 from pathlib import Path
-import pickle
-from sentence_transformers import SentenceTransformer
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+from src.services.EmbeddingService import EmbeddingService
 from src.services.TextBuilderService import TextBuilderService
+from src.shared.utils.ClassificationMasks import needs_subassunto_mask
+from src.infrastructure.ml.StreamingEmbeddingWriter import StreamingEmbeddingWriter
+from src.infrastructure.ml.ReferenceBundle import ReferenceBundle
+from src.infrastructure.ml.ReferenceSet import ReferenceSet
+
+SEARCH_BACKENDS = ['faiss_hnsw']  # Indices ANN persistidos no artefato
+CSV_CHUNK_SIZE = 50000  # Linhas lidas do CSV por vez
+EMBEDDING_CHUNK_SIZE = 2048  # Textos codificados e gravados por checkpoint
+MAX_TRAINING_SAMPLES = 0  # 0 = usar todo o historico
+ENCODE_WORKERS = 0  # Processos de encoding (0 = todos os nucleos, 1 = processo unico)
+THREADS_PER_WORKER = 2  # Threads do torch por processo (evita oversubscription)
+TOKEN_AWARE_TEXT = True  # Textos ajustados ao limite de tokens do modelo, com prioridade por campo
+MAX_TEXT_CHUNKS = 1  # >1: reclamacoes longas viram ate N chunks com embeddings agregados pela media
+
+
+def carregar_referencias_streaming(caminho, text_builder, chunksize=CSV_CHUNK_SIZE):
+    """
+    Le o CSV em chunks, mantendo apenas SUB_ASSUNTO validos e o texto de referencia.
+
+    Returns:
+        tuple: (DataFrame com SUB_ASSUNTO e texto_referencia, total de linhas lidas)
+    """
+    colunas = {'SUB_ASSUNTO', *TextBuilderService.TEXT_COLUMNS}
+    partes = []
+    total_lido = 0
+
+    leitor = pd.read_csv(
+        caminho,
+        sep=';',
+        encoding='latin1',
+        usecols=lambda c: c in colunas,
+        dtype=str,
+        chunksize=chunksize
+    )
+
+    for chunk in leitor:
+        total_lido += len(chunk)
+
+        chunk = chunk[~needs_subassunto_mask(chunk['SUB_ASSUNTO'])]  # Remove QUALQUER "OUTRO"
+        if chunk.empty:
+            continue
+
+        partes.append(pd.DataFrame({
+            'SUB_ASSUNTO': chunk['SUB_ASSUNTO'].values,
+            'texto_referencia': text_builder.build_texts(chunk)
+        }))
+
+        print(f"   Lidos {total_lido:,} registros...")
+
+    if not partes:
+        return pd.DataFrame(columns=['SUB_ASSUNTO', 'texto_referencia']), total_lido
+
+    return pd.concat(partes, ignore_index=True), total_lido
 
 
 def main():
@@ -27,30 +81,27 @@ def main():
         print("   Por favor, coloque o arquivo CSV na pasta raiz do projeto.")
         return
 
-    df = pd.read_csv(
-        training_file,
-        sep=';',
-        encoding='latin1',
-        low_memory=False
+    print("   > Carregando modelo de embeddings...")
+    embedding_service = EmbeddingService(
+        model_name='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+        num_workers=ENCODE_WORKERS,
+        threads_per_worker=THREADS_PER_WORKER
     )
+    print("   OK Modelo carregado")
 
-    print(f"   OK {len(df):,} registros carregados")
-
-    print("\n[2/4] Filtrando registros válidos para treinamento...")
+    if TOKEN_AWARE_TEXT:
+        text_builder = TextBuilderService.for_model(embedding_service, max_chunks=MAX_TEXT_CHUNKS)
+    else:
+        text_builder = TextBuilderService()
 
-    text_builder = TextBuilderService()
+    df_valid, total_lido = carregar_referencias_streaming(training_file, text_builder)
 
-    mask_valid = (
-        df['SUB_ASSUNTO'].notna() &
-        (df['SUB_ASSUNTO'].str.strip() != '') &
-        ~df['SUB_ASSUNTO'].str.upper().str.contains('OUTRO', na=False)  # Remove QUALQUER "OUTRO"
-    )
+    print(f"   OK {total_lido:,} registros lidos")
 
-    df_valid = df[mask_valid].copy()
+    print("\n[2/4] Filtrando registros válidos para treinamento...")
     print(f"   OK {len(df_valid):,} registros com SUB_ASSUNTO valido")
 
-    MAX_TRAINING_SAMPLES = 5000
-    if len(df_valid) > MAX_TRAINING_SAMPLES:
+    if MAX_TRAINING_SAMPLES > 0 and len(df_valid) > MAX_TRAINING_SAMPLES:
         print(f"\n   OTIMIZACAO: Limitando a {MAX_TRAINING_SAMPLES:,} registros (amostragem estratificada)")
         df_valid = df_valid.groupby('SUB_ASSUNTO', group_keys=False).apply(
             lambda x: x.sample(min(len(x), max(1, int(MAX_TRAINING_SAMPLES * len(x) / len(df_valid)))))
@@ -64,49 +115,50 @@ def main():
 
     print("\n[3/4] Gerando embeddings (isso pode demorar alguns minutos)...")
 
-    print("   > Construindo textos de referência...")
-    reference_texts = []
-    for idx, row in df_valid.iterrows():
-        text = text_builder.build_text_from_row(row)
-        reference_texts.append(text)
-
+    reference_texts = df_valid['texto_referencia'].tolist()
     print(f"   OK {len(reference_texts):,} textos construidos")
 
-    print("   > Carregando modelo de embeddings...")
-    model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-    print("   OK Modelo carregado")
-
-    print("   > Gerando embeddings em mini-batches...")
-    BATCH_SIZE = 100
-    all_embeddings = []
-
-    for i in range(0, len(reference_texts), BATCH_SIZE):
-        batch = reference_texts[i:i+BATCH_SIZE]
-        batch_embeddings = model.encode(batch, show_progress_bar=False)
-        all_embeddings.extend(batch_embeddings)
-
-        if (i // BATCH_SIZE + 1) % 10 == 0:
-            print(f"      Processados {i + len(batch):,}/{len(reference_texts):,} textos...")
-
-    embeddings_array = np.array(all_embeddings)
-    print(f"   OK Embeddings gerados: shape={embeddings_array.shape}")
-
-    print("\n[4/4] Salvando modelo treinado...")
-
     output_dir = Path(__file__).parent.parent / "data" / "ml"
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    reference_df = df_valid[['SUB_ASSUNTO']].copy()
-    reference_df['texto_referencia'] = reference_texts
+    # O novo artefato e montado em <tipo>.staging; o atual continua servindo ate a troca no final
+    bundle = ReferenceBundle(output_dir / "subassunto")
+    staging = bundle.staging()
+    staging.bundle_dir.mkdir(parents=True, exist_ok=True)
+    staging.invalidate()
+    embeddings_path = staging.embeddings_path
+
+    print("   > Gerando embeddings em chunks (com checkpoint)...")
+
+    def report_progress(done, total, texts_per_second):
+        print(f"      Processados {done:,}/{total:,} textos ({texts_per_second:,.1f} textos/s)")
+
+    writer = StreamingEmbeddingWriter(
+        embedding_service,
+        embeddings_path,
+        chunk_size=EMBEDDING_CHUNK_SIZE,
+        text_config=text_builder.get_config()
+    )
+    embeddings_array = writer.encode(reference_texts, progress_callback=report_progress)
+    embedding_service.close()
+    print(f"   OK Embeddings gerados: shape={embeddings_array.shape} ({writer.throughput:,.1f} textos/s)")
 
-    reference_path = output_dir / "subassunto_reference.pkl"
-    with open(reference_path, 'wb') as f:
-        pickle.dump(reference_df, f)
-    print(f"   OK Referencias salvas: {reference_path}")
+    print("\n[4/4] Salvando modelo treinado...")
 
-    embeddings_path = output_dir / "subassunto_embeddings.npy"
-    np.save(embeddings_path, embeddings_array)
-    print(f"   OK Embeddings salvos: {embeddings_path}")
+    reference_df = df_valid[['SUB_ASSUNTO', 'texto_referencia']]
+
+    reference_set = ReferenceSet.from_labels(embeddings_array, reference_df['SUB_ASSUNTO'], reference_texts)
+    reference_set.text_config = text_builder.get_config()
+    manifest = staging.write(
+        reference_set,
+        model_name=embedding_service.model_name,
+        label_column='SUB_ASSUNTO',
+        search_backends=SEARCH_BACKENDS,
+        training_info={
+            'original_dataset_size': total_lido,
+            'encoding_throughput_texts_per_s': writer.throughput,
+        }
+    )
+    bundle.promote(staging)
+    print(f"   OK Artefato salvo: {bundle.bundle_dir} (versao {manifest['version']})")
 
     print("\n" + "="*80)
     print("OK TREINAMENTO CONCLUIDO COM SUCESSO!")
@@ -117,9 +169,10 @@ def main():
     print(f"   - Total de subcategorias unicas: {reference_df['SUB_ASSUNTO'].nunique()}")
     print(f"   - Tamanho do modelo: {embeddings_array.nbytes / (1024*1024):.2f} MB")
 
-    print(f"\nArquivos gerados:")
-    print(f"   - {reference_path}")
-    print(f"   - {embeddings_path}")
+    print(f"\nArquivos gerados em {bundle.bundle_dir}:")
+    for name in manifest['files']:
+        print(f"   - {name}")
+    print(f"   - {bundle.manifest_path.name}")
 
     print(f"\nProximos passos:")
     print(f"   1. Execute a aplicacao: streamlit run app.py")
@@ -0,0 +1,86 @@
+"""
+Atualizacao INCREMENTAL do conjunto de referencia dos classificadores.
+
+Adiciona registros recem-rotulados (DS_ASSUNTO / SUB_ASSUNTO preenchidos) ao
+conjunto de referencia existente, codificando apenas as linhas novas.
+Registros cujo rotulo e texto ja estao no conjunto sao ignorados, entao rodar
+o script de novo com o mesmo arquivo nao duplica referencias.
+Atualiza o artefato versionado em data/ml/<tipo>/ (embeddings, rotulos,
+textos e indice FAISS) e registra a nova versao no manifest.json.
+
+Uso:
+    python scripts/training/update_reference_set.py novos_rotulados.xlsx
+    python scripts/training/update_reference_set.py novos.csv --tipo subassunto --backend faiss_hnsw
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.services.ExcelReaderService import ExcelReaderService
+from src.services.FuzzyColumnMapper import FuzzyColumnMapper
+from src.services.EmbeddingService import EmbeddingService
+from src.services.AssuntoClassifierService import AssuntoClassifierService
+from src.services.SubAssuntoClassifierService import SubAssuntoClassifierService
+from src.infrastructure.ml.NeighborSearch import SEARCH_BACKENDS
+
+MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adiciona registros rotulados ao conjunto de referencia")
+    parser.add_argument('arquivo', help="Planilha (xlsx/csv) com os novos registros rotulados")
+    parser.add_argument('--tipo', choices=['assunto', 'subassunto', 'ambos'], default='ambos',
+                        help="Classificador a atualizar (padrao: ambos)")
+    parser.add_argument('--backend', choices=SEARCH_BACKENDS, default='exact',
+                        help="Backend de busca cujo indice persistido sera atualizado")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("ATUALIZACAO INCREMENTAL DO CONJUNTO DE REFERENCIA")
+    print("="*80)
+    print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    with open(args.arquivo, 'rb') as f:
+        df = ExcelReaderService().read_excel(f)
+    df = FuzzyColumnMapper().map_columns(df)
+    print(f"-> {len(df):,} registros lidos de {args.arquivo}")
+
+    embedding_service = EmbeddingService(model_name=MODEL_NAME)
+
+    classificadores = []
+    if args.tipo in ('assunto', 'ambos') and 'DS_ASSUNTO' in df.columns:
+        classificadores.append(('DS_ASSUNTO', AssuntoClassifierService(
+            embedding_service=embedding_service,
+            search_backend=args.backend
+        )))
+    if args.tipo in ('subassunto', 'ambos') and 'SUB_ASSUNTO' in df.columns:
+        classificadores.append(('SUB_ASSUNTO', SubAssuntoClassifierService(
+            embedding_service=embedding_service,
+            search_backend=args.backend
+        )))
+
+    if not classificadores:
+        print("[ERRO] Nenhuma coluna de rotulo (DS_ASSUNTO/SUB_ASSUNTO) encontrada no arquivo")
+        return
+
+    for coluna, classifier in classificadores:
+        print(f"\n> Atualizando referencia de {coluna}...")
+        version = classifier.add_references(df)
+
+        if version['skipped_records']:
+            print(f"   {version['skipped_records']:,} registros ja estavam no conjunto (ignorados)")
+        if version['added_records'] == 0:
+            print("   Nenhum registro novo para adicionar")
+            continue
+
+        print(f"   OK versao {version['version']}: +{version['added_records']:,} registros "
+              f"(total {version['total_records']:,})")
+
+    print(f"\nFim: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Background writer that batches audit inserts into few short transactions.
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .SQLiteConnectionPool import SQLiteConnectionPool
+
+
+class _FlushMarker:
+    """Posição na fila até a qual flush() espera."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditLogWriter:
+    """
+    Buffers audit records (upload_audit, query_audit, ...) in a bounded
+    in-memory queue and writes them from a daemon thread: everything that
+    accumulated while the previous batch was being written (up to
+    batch_size records) goes into one transaction, with one executemany
+    per statement.
+
+    Callers only enqueue, so auditing adds no SQLite latency to dashboard
+    renders. When the queue is full, submit() blocks for up to put_timeout
+    (backpressure on a runaway producer) and then drops the record, counting
+    it in get_stats(). Pending records are flushed at interpreter exit, and
+    flush() lets readers see everything submitted before the call.
+    """
+
+    _instances: Dict[str, 'AuditLogWriter'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, pool: SQLiteConnectionPool) -> 'AuditLogWriter':
+        """
+        Return the process-wide writer of a connection pool's database.
+
+        Args:
+            pool: Pool of the database receiving the records
+
+        Returns:
+            AuditLogWriter: Writer shared by every service using the same file
+        """
+        with cls._instances_lock:
+            writer = cls._instances.get(pool.db_path)
+            if writer is None:
+                writer = cls(pool)
+                cls._instances[pool.db_path] = writer
+            return writer
+
+    def __init__(
+        self,
+        pool: SQLiteConnectionPool,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        put_timeout: float = 0.5
+    ):
+        """
+        Args:
+            pool: Connection pool of the audit database
+            max_queue: Maximum records waiting to be written
+            batch_size: Maximum records written per transaction
+            flush_interval: Seconds the idle writer blocks on the queue before polling again
+            put_timeout: Seconds submit() blocks on a full queue before dropping the record
+        """
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+
+        self._queue: 'queue.Queue[Any]' = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def submit(self, sql: str, params: Tuple) -> bool:
+        """
+        Enqueue one insert.
+
+        Args:
+            sql: Constant INSERT statement
+            params: Statement parameters
+
+        Returns:
+            bool: False if the writer is closed or the queue stayed full for put_timeout
+        """
+        if self._closed:
+            return False
+        self._start()
+        try:
+            self._queue.put((sql, params), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until every record submitted before the call is written.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            bool: True if the records were written within the timeout
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Grava o que estiver pendente e encerra a thread de escrita."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get writer counters.
+
+        Returns:
+            dict: Pending, written, dropped and failed records and batches written
+        """
+        return {
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            records: List[Tuple[str, Tuple]] = []
+            markers: List[_FlushMarker] = []
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, _FlushMarker):
+                    markers.append(item)
+                else:
+                    records.append(item)
+                if stop or markers or len(records) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._write(records)
+            for marker in markers:
+                marker.done.set()
+
+    def _write(self, records: List[Tuple[str, Tuple]]) -> None:
+        if not records:
+            return
+
+        # Agrupa por comando preservando a ordem de chegada de cada tabela
+        grouped: Dict[str, List[Tuple]] = {}
+        for sql, params in records:
+            grouped.setdefault(sql, []).append(params)
+
+        try:
+            with self.pool.transaction() as conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+            self.written += len(records)
+            self.batches += 1
+        except sqlite3.Error:
+            # Auditoria nao e critica: o lote e descartado e contabilizado
+            self.failed += len(records)
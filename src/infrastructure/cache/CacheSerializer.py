@@ -0,0 +1,213 @@
+"""
+Typed serialization of cache values (Arrow IPC / Parquet / .npy / pickle).
+"""
+import io
+import json
+import pickle
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow e opcional: sem ele DataFrames voltam a ser gravados com pickle
+    pyarrow = None
+
+
+CACHE_FORMATS = ('arrow', 'parquet', 'npy', 'pickle')
+COMPRESSIONS = (None, 'zstd', 'lz4')
+
+# Metadado do schema com as colunas string[pyarrow] (o metadado do pandas não guarda o storage)
+_ARROW_STRING_COLUMNS = b'cache_arrow_string_columns'
+
+
+class CacheSerializer:
+    """
+    Chooses a storage format per value type:
+
+        pandas.DataFrame  -> Arrow IPC file ('arrow', default) or Parquet,
+                             optionally zstd/lz4 compressed
+        numpy.ndarray     -> .npy (numeric dtypes; object arrays use pickle)
+        anything else     -> pickle (same as before)
+
+    DataFrames come back with the dtypes they were stored with, including
+    the storage of StringDtype columns (string[pyarrow] stays Arrow-backed
+    instead of coming back as string[python]).
+
+    Arrow and .npy values read from a sidecar file are memory-mapped: an
+    uncompressed Arrow file or a .npy array is used in place, without
+    reading the file into memory first. Compressed Arrow buffers are
+    decompressed on read (lz4, the default, costs little; compression=None
+    trades disk for zero-copy reads, zstd the other way around).
+    """
+
+    EXTENSIONS = {'arrow': '.arrow', 'parquet': '.parquet', 'npy': '.npy', 'pickle': '.pkl'}
+
+    def __init__(self, dataframe_format: str = 'arrow', compression: Optional[str] = 'lz4'):
+        """
+        Args:
+            dataframe_format: Format of DataFrames ('arrow' or 'parquet')
+            compression: Arrow/Parquet compression (None, 'zstd' or 'lz4')
+        """
+        if dataframe_format not in ('arrow', 'parquet'):
+            raise ValueError(f"Formato de DataFrame invalido: {dataframe_format} (use 'arrow' ou 'parquet')")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compressao invalida: {compression} (opcoes: {COMPRESSIONS})")
+        self.dataframe_format = dataframe_format
+        self.compression = compression
+
+    def format_for(self, value: Any) -> str:
+        """Formato usado para gravar o valor."""
+        if isinstance(value, pd.DataFrame) and pyarrow is not None:
+            return self.dataframe_format
+        if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+            return 'npy'
+        return 'pickle'
+
+    @staticmethod
+    def estimated_size(value: Any) -> int:
+        """Tamanho em memória de DataFrames/arrays (0 para outros tipos, medidos depois de serializados)."""
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True).sum())
+        if isinstance(value, np.ndarray):
+            return int(value.nbytes)
+        return 0
+
+    def dumps(self, value: Any, fmt: Optional[str] = None) -> Tuple[str, bytes]:
+        """
+        Serialize a value.
+
+        Args:
+            value: Value to cache
+            fmt: Format to use (None = format_for(value))
+
+        Returns:
+            tuple: (format, serialized bytes)
+        """
+        fmt = fmt or self.format_for(value)
+        sink = io.BytesIO()
+        self._write(fmt, value, sink)
+        return fmt, sink.getvalue()
+
+    def dump_file(self, value: Any, path: Path, fmt: Optional[str] = None) -> str:
+        """
+        Serialize a value straight into a file (sidecar of large values).
+
+        Args:
+            value: Value to cache
+            path: Destination file
+            fmt: Format to use (None = format_for(value))
+
+        Returns:
+            str: Format written
+        """
+        fmt = fmt or self.format_for(value)
+        with open(path, 'wb') as f:
+            self._write(fmt, value, f)
+        return fmt
+
+    def loads(self, fmt: Optional[str], data: bytes) -> Any:
+        """
+        Deserialize a value stored inline in the table.
+
+        Args:
+            fmt: Stored format (None = rows written before typed formats, pickle)
+            data: Serialized bytes
+
+        Returns:
+            Any: Cached value
+        """
+        if fmt in (None, 'pickle'):
+            return pickle.loads(data)
+        if fmt == 'npy':
+            return np.load(io.BytesIO(data), allow_pickle=False)
+        _require_pyarrow()
+        if fmt == 'arrow':
+            return _frame_from_table(pyarrow.ipc.open_file(pyarrow.py_buffer(data)).read_all())
+        if fmt == 'parquet':
+            return _frame_from_table(pyarrow.parquet.read_table(pyarrow.BufferReader(data)))
+        raise ValueError(f"Formato de cache desconhecido: {fmt}")
+
+    def load_file(self, fmt: str, path: Path) -> Any:
+        """
+        Deserialize a sidecar file, memory-mapping Arrow and .npy files.
+
+        Args:
+            fmt: Stored format
+            path: Sidecar file
+
+        Returns:
+            Any: Cached value
+        """
+        if fmt == 'npy':
+            return np.load(path, mmap_mode='r', allow_pickle=False)
+        if fmt == 'arrow':
+            _require_pyarrow()
+            with pyarrow.memory_map(str(path), 'r') as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+            return _frame_from_table(table)
+        if fmt == 'parquet':
+            _require_pyarrow()
+            return _frame_from_table(pyarrow.parquet.read_table(str(path), memory_map=True))
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _write(self, fmt: str, value: Any, sink) -> None:
+        if fmt == 'arrow':
+            table = _table_from_frame(value)
+            options = pyarrow.ipc.IpcWriteOptions(compression=self.compression)
+            with pyarrow.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        elif fmt == 'parquet':
+            table = _table_from_frame(value)
+            pyarrow.parquet.write_table(table, sink, compression=self.compression or 'none')
+        elif fmt == 'npy':
+            np.save(sink, value, allow_pickle=False)
+        else:
+            pickle.dump(value, sink, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _table_from_frame(df: pd.DataFrame) -> 'pyarrow.Table':
+    table = pyarrow.Table.from_pandas(df, preserve_index=True)
+    columns = [
+        str(col) for col, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.StringDtype) and dtype.storage == 'pyarrow'
+    ]
+    if columns:
+        metadata = dict(table.schema.metadata or {})
+        metadata[_ARROW_STRING_COLUMNS] = json.dumps(columns).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+    return table
+
+
+def _frame_from_table(table: 'pyarrow.Table') -> pd.DataFrame:
+    raw = (table.schema.metadata or {}).get(_ARROW_STRING_COLUMNS)
+    if not raw:
+        return table.to_pandas()
+
+    columns = set(json.loads(raw))
+    string_fields = {
+        field.name for field in table.schema
+        if pyarrow.types.is_string(field.type) or pyarrow.types.is_large_string(field.type)
+    }
+    if string_fields <= columns:
+        # Todas as colunas de texto eram string[pyarrow]: convertidas direto, sem passar por objetos Python
+        return table.to_pandas(
+            types_mapper=lambda t: pd.StringDtype('pyarrow') if t in (pyarrow.string(), pyarrow.large_string()) else None
+        )
+
+    df = table.to_pandas()
+    types = {
+        col: pd.StringDtype('pyarrow') for col in df.columns
+        if str(col) in columns and df[col].dtype != pd.StringDtype('pyarrow')
+    }
+    return df.astype(types) if types else df
+
+
+def _require_pyarrow() -> None:
+    if pyarrow is None:
+        raise ImportError("pyarrow nao instalado. Execute: pip install pyarrow")
@@ -1,99 +1,181 @@
-import sqlite3
-import pickle
+import hashlib
+import uuid
 from datetime import datetime, timedelta
-from typing import Any, Optional, Dict, List
 from pathlib import Path
+from typing import Any, Optional, Dict, List, Tuple
 from ...core.domain.interfaces.ICacheService import ICacheService
+from .AuditLogWriter import AuditLogWriter
+from .CacheSerializer import CacheSerializer
+from .SQLiteConnectionPool import SQLiteConnectionPool
+
+
+# SQL constante: cada conexão do pool prepara cada comando uma única vez
+_SQL_SET = """
+    INSERT OR REPLACE INTO cache (key, value, format, sidecar, expires_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+_SQL_GET = "SELECT value, format, sidecar, expires_at FROM cache WHERE key = ?"
+_SQL_GET_SIDECAR = "SELECT sidecar FROM cache WHERE key = ?"
+_SQL_DELETE = "DELETE FROM cache WHERE key = ?"
+_SQL_GET_SIDECAR_IF_EXPIRED = "SELECT sidecar FROM cache WHERE key = ? AND expires_at <= ?"
+_SQL_DELETE_IF_EXPIRED = "DELETE FROM cache WHERE key = ? AND expires_at <= ?"
+_SQL_EXPIRED_SIDECARS = "SELECT sidecar FROM cache WHERE expires_at < ? AND sidecar IS NOT NULL"
+_SQL_CLEAR_EXPIRED = "DELETE FROM cache WHERE expires_at < ?"
+_SQL_LOG_UPLOAD = """
+    INSERT INTO upload_audit (filename, num_records, user, metadata)
+    VALUES (?, ?, ?, ?)
+"""
+_SQL_LOG_QUERY = """
+    INSERT INTO query_audit (query_text, query_type, user, response_time_ms)
+    VALUES (?, ?, ?, ?)
+"""
+_SQL_UPLOAD_HISTORY = """
+    SELECT filename, num_records, user, uploaded_at
+    FROM upload_audit
+    ORDER BY uploaded_at DESC
+    LIMIT ?
+"""
+_SQL_QUERY_STATS = """
+    SELECT
+        COUNT(*) as total_queries,
+        AVG(response_time_ms) as avg_response_time_ms,
+        query_type,
+        COUNT(*) as count
+    FROM query_audit
+    WHERE executed_at > ?
+    GROUP BY query_type
+"""
 
 
 class SQLiteCacheService(ICacheService):
-    """Implementação de cache e auditoria usando SQLite"""
-
-    def __init__(self, db_path: str = "./data/cache.db"):
+    """
+    Implementação de cache e auditoria usando SQLite.
+
+    As operações usam o pool de conexões compartilhado do arquivo (WAL,
+    conexões reaproveitadas entre chamadas e sessões do Streamlit);
+    escritas rodam em transações curtas com commit/rollback automático.
+    Os registros de auditoria só entram na fila do AuditLogWriter e são
+    gravados em lote por uma thread de fundo.
+
+    Valores são gravados por tipo (CacheSerializer): DataFrames em Arrow IPC
+    ou Parquet comprimido, arrays NumPy em .npy, o resto em pickle. Valores
+    a partir de sidecar_threshold bytes vão para arquivos em cache_blobs/
+    (referenciados pela tabela) e são lidos com memory mapping.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "./data/cache.db",
+        max_connections: int = 8,
+        dataframe_format: str = 'arrow',
+        compression: Optional[str] = 'lz4',
+        sidecar_threshold: int = 1024 * 1024
+    ):
         self.db_path = db_path
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.sidecar_threshold = sidecar_threshold
+        self._serializer = CacheSerializer(dataframe_format=dataframe_format, compression=compression)
+        self._blob_dir = Path(db_path).parent / 'cache_blobs'
+        self._blob_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = SQLiteConnectionPool.shared(db_path, max_connections=max_connections)
         self._init_db()
+        self._audit = AuditLogWriter.shared(self._pool)
 
     def _init_db(self):
         """Inicializa o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS cache (
-                key TEXT PRIMARY KEY,
-                value BLOB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS upload_audit (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT,
-                num_records INTEGER,
-                user TEXT,
-                metadata TEXT,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS query_audit (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query_text TEXT,
-                query_type TEXT,
-                user TEXT,
-                response_time_ms REAL,
-                executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        conn.commit()
-        conn.close()
+        with self._pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP
+                )
+            """)
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_audit (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT,
+                    num_records INTEGER,
+                    user TEXT,
+                    metadata TEXT,
+                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_audit (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    query_text TEXT,
+                    query_type TEXT,
+                    user TEXT,
+                    response_time_ms REAL,
+                    executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Bancos criados antes dos formatos tipados: linhas sem format são pickle
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+            if 'format' not in columns:
+                conn.execute("ALTER TABLE cache ADD COLUMN format TEXT")
+            if 'sidecar' not in columns:
+                conn.execute("ALTER TABLE cache ADD COLUMN sidecar TEXT")
+
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_query_audit_executed_at ON query_audit (executed_at)")
 
     def set(self, key: str, value: Any, ttl_seconds: int = 3600) -> bool:
         """Armazena um valor no cache"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            pickled_value = pickle.dumps(value)
             expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
 
-            cursor.execute("""
-                INSERT OR REPLACE INTO cache (key, value, expires_at)
-                VALUES (?, ?, ?)
-            """, (key, pickled_value, expires_at))
-
-            conn.commit()
-            conn.close()
+            try:
+                fmt, data, sidecar = self._serialize(key, value)
+            except Exception:
+                # Arrow/.npy não aceitam o valor (ex.: coluna object com int e str): grava em pickle
+                fmt, data, sidecar = self._serialize(key, value, 'pickle')
+
+            try:
+                with self._pool.transaction() as conn:
+                    previous = conn.execute(_SQL_GET_SIDECAR, (key,)).fetchone()
+                    conn.execute(_SQL_SET, (key, data, fmt, sidecar, expires_at.isoformat(' ')))
+            except Exception:
+                if sidecar:
+                    self._remove_sidecar(sidecar)
+                raise
+            if previous and previous[0]:
+                self._remove_sidecar(previous[0])
             return True
         except Exception:
             return False
 
     def get(self, key: str) -> Optional[Any]:
         """Recupera um valor do cache"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
 
-            cursor.execute("""
-                SELECT value, expires_at FROM cache WHERE key = ?
-            """, (key,))
-
-            result = cursor.fetchone()
-            conn.close()
+    def get_entry(self, key: str) -> Optional[Tuple[Any, datetime]]:
+        """Recupera um valor do cache junto com a data de expiração"""
+        try:
+            with self._pool.connection() as conn:
+                result = conn.execute(_SQL_GET, (key,)).fetchone()
 
             if result:
-                value, expires_at = result
+                value, fmt, sidecar, expires_at = result
                 expires_at = datetime.fromisoformat(expires_at)
 
                 if expires_at > datetime.now():
-                    return pickle.loads(value)
+                    if sidecar:
+                        return self._serializer.load_file(fmt, self._blob_dir / sidecar), expires_at
+                    return self._serializer.loads(fmt, value), expires_at
                 else:
-                    self.delete(key)
+                    # Só remove se continuar expirado (outra sessão pode ter regravado a chave)
+                    now = datetime.now().isoformat(' ')
+                    with self._pool.transaction() as conn:
+                        previous = conn.execute(_SQL_GET_SIDECAR_IF_EXPIRED, (key, now)).fetchone()
+                        conn.execute(_SQL_DELETE_IF_EXPIRED, (key, now))
+                    if previous and previous[0]:
+                        self._remove_sidecar(previous[0])
                     return None
 
             return None
@@ -103,11 +185,11 @@ class SQLiteCacheService(ICacheService):
     def delete(self, key: str) -> bool:
         """Remove um valor do cache"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM cache WHERE key = ?", (key,))
-            conn.commit()
-            conn.close()
+            with self._pool.transaction() as conn:
+                previous = conn.execute(_SQL_GET_SIDECAR, (key,)).fetchone()
+                conn.execute(_SQL_DELETE, (key,))
+            if previous and previous[0]:
+                self._remove_sidecar(previous[0])
             return True
         except Exception:
             return False
@@ -115,71 +197,62 @@ class SQLiteCacheService(ICacheService):
     def clear_expired(self) -> int:
         """Remove itens expirados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                DELETE FROM cache WHERE expires_at < ?
-            """, (datetime.now(),))
-
-            deleted = cursor.rowcount
-            conn.commit()
-            conn.close()
+            now = datetime.now().isoformat(' ')
+            with self._pool.transaction() as conn:
+                sidecars = [row[0] for row in conn.execute(_SQL_EXPIRED_SIDECARS, (now,))]
+                deleted = conn.execute(_SQL_CLEAR_EXPIRED, (now,)).rowcount
+            for sidecar in sidecars:
+                self._remove_sidecar(sidecar)
             return deleted
         except Exception:
             return 0
 
-    def log_upload(self, filename: str, num_records: int, user: str = "system", metadata: Dict = None) -> bool:
-        """Registra upload de arquivo"""
+    def _serialize(self, key: str, value: Any, fmt: Optional[str] = None) -> Tuple[str, Optional[bytes], Optional[str]]:
+        """Serializa o valor; retorna (formato, bytes na tabela, arquivo sidecar)."""
+        if self._serializer.estimated_size(value) >= self.sidecar_threshold:
+            # DataFrame/array grande: grava direto no arquivo, sem cópia intermediária em memória
+            fmt = fmt or self._serializer.format_for(value)
+            sidecar = self._sidecar_name(key, fmt)
+            try:
+                self._serializer.dump_file(value, self._blob_dir / sidecar, fmt)
+            except Exception:
+                self._remove_sidecar(sidecar)  # Não deixa arquivo parcial em cache_blobs/
+                raise
+            return fmt, None, sidecar
+
+        fmt, data = self._serializer.dumps(value, fmt)
+        if len(data) >= self.sidecar_threshold:
+            sidecar = self._sidecar_name(key, fmt)
+            (self._blob_dir / sidecar).write_bytes(data)
+            return fmt, None, sidecar
+        return fmt, data, None
+
+    def _sidecar_name(self, key: str, fmt: str) -> str:
+        """Nome único por gravação: leitores com o arquivo anterior mapeado não são afetados."""
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return f"{key_hash}_{uuid.uuid4().hex[:8]}{CacheSerializer.EXTENSIONS[fmt]}"
+
+    def _remove_sidecar(self, sidecar: str) -> None:
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            metadata_str = str(metadata) if metadata else ""
-
-            cursor.execute("""
-                INSERT INTO upload_audit (filename, num_records, user, metadata)
-                VALUES (?, ?, ?, ?)
-            """, (filename, num_records, user, metadata_str))
+            (self._blob_dir / sidecar).unlink(missing_ok=True)
+        except OSError:
+            pass  # Ainda aberto em outro processo (Windows): fica para a próxima limpeza
 
-            conn.commit()
-            conn.close()
-            return True
-        except Exception:
-            return False
+    def log_upload(self, filename: str, num_records: int, user: str = "system", metadata: Dict = None) -> bool:
+        """Registra upload de arquivo (gravação assíncrona, em lote)"""
+        metadata_str = str(metadata) if metadata else ""
+        return self._audit.submit(_SQL_LOG_UPLOAD, (filename, num_records, user, metadata_str))
 
     def log_query(self, query_text: str, query_type: str, user: str = "system", response_time_ms: float = 0) -> bool:
-        """Registra query executada"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                INSERT INTO query_audit (query_text, query_type, user, response_time_ms)
-                VALUES (?, ?, ?, ?)
-            """, (query_text, query_type, user, response_time_ms))
-
-            conn.commit()
-            conn.close()
-            return True
-        except Exception:
-            return False
+        """Registra query executada (gravação assíncrona, em lote)"""
+        return self._audit.submit(_SQL_LOG_QUERY, (query_text, query_type, user, response_time_ms))
 
     def get_upload_history(self, limit: int = 10) -> List[Dict]:
         """Retorna histórico de uploads"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT filename, num_records, user, uploaded_at
-                FROM upload_audit
-                ORDER BY uploaded_at DESC
-                LIMIT ?
-            """, (limit,))
-
-            results = cursor.fetchall()
-            conn.close()
+            self._audit.flush()  # Inclui registros ainda na fila
+            with self._pool.connection() as conn:
+                results = conn.execute(_SQL_UPLOAD_HISTORY, (limit,)).fetchall()
 
             return [
                 {
@@ -196,24 +269,11 @@ class SQLiteCacheService(ICacheService):
     def get_query_stats(self, hours: int = 24) -> Dict:
         """Retorna estatísticas de queries"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
+            self._audit.flush()
             since = datetime.now() - timedelta(hours=hours)
 
-            cursor.execute("""
-                SELECT
-                    COUNT(*) as total_queries,
-                    AVG(response_time_ms) as avg_response_time_ms,
-                    query_type,
-                    COUNT(*) as count
-                FROM query_audit
-                WHERE executed_at > ?
-                GROUP BY query_type
-            """, (since,))
-
-            results = cursor.fetchall()
-            conn.close()
+            with self._pool.connection() as conn:
+                results = conn.execute(_SQL_QUERY_STATS, (since.isoformat(' '),)).fetchall()
 
             if not results:
                 return {
@@ -238,3 +298,11 @@ class SQLiteCacheService(ICacheService):
                 'avg_response_time_ms': 0,
                 'query_types': {}
             }
+
+    def get_pool_stats(self) -> Dict:
+        """Retorna ocupação do pool de conexões"""
+        return self._pool.get_stats()
+
+    def get_audit_stats(self) -> Dict:
+        """Retorna contadores da fila de auditoria (pendentes, gravados, descartados)"""
+        return self._audit.get_stats()
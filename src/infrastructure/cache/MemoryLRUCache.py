@@ -0,0 +1,144 @@
+"""
+In-memory LRU cache bounded by bytes, with per-entry TTL.
+"""
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class MemoryLRUCache:
+    """
+    Least-recently-used cache limited by the estimated size of its values
+    (max_bytes) rather than by the number of entries, so a few classified
+    DataFrames cannot push the process out of memory while many small
+    values still fit.
+
+    Every entry carries an absolute expiry time; expired entries are
+    treated as misses and dropped when found. Values are returned by
+    reference (no copy): callers must not mutate a cached DataFrame.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: Maximum estimated size of all cached values
+        """
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[Any, float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            tuple: (found, value); expired entries count as not found
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def set(self, key: str, value: Any, expires_at: float, size: Optional[int] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries to fit.
+
+        Args:
+            key: Cache key
+            value: Value to keep in memory
+            expires_at: Absolute expiry time (time.time() scale)
+            size: Estimated size in bytes (None = estimate)
+
+        Returns:
+            bool: False if the value alone exceeds max_bytes (not cached)
+        """
+        size = self.sizeof(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return False
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, expires_at, size)
+            self.current_bytes += size
+            return True
+
+    def delete(self, key: str) -> None:
+        """Remove uma entrada (se existir)."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear_expired(self) -> int:
+        """Remove entradas expiradas e retorna quantas foram removidas."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters and occupancy.
+
+        Returns:
+            dict: Cache statistics
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+    @staticmethod
+    def sizeof(value: Any) -> int:
+        """Tamanho estimado em bytes (DataFrames com strings incluídas)."""
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, np.ndarray):
+            return int(value.nbytes)
+        if isinstance(value, (bytes, bytearray, str)):
+            return len(value)
+        try:
+            return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return sys.getsizeof(value)
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
@@ -0,0 +1,198 @@
+"""
+Pool of tuned SQLite connections shared by every service using the same file.
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+
+# WAL: leitores nao bloqueiam o escritor (e vice-versa); synchronous=NORMAL e seguro com WAL
+DEFAULT_PRAGMAS: Tuple[Tuple[str, Any], ...] = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -8000),  # ~8 MB por conexao
+    ('mmap_size', 64 * 1024 * 1024),
+)
+
+
+class SQLiteConnectionPool:
+    """
+    Bounded pool of SQLite connections to one database file.
+
+    Connections are opened once (WAL journaling, busy timeout, pragmas
+    above) and reused, instead of paying sqlite3.connect on every call.
+    They run in autocommit mode: single reads need no transaction, and
+    writes go through transaction(), which takes the write lock up front
+    (BEGIN IMMEDIATE) and commits or rolls back as a unit. Each connection
+    keeps its own prepared-statement cache, so the constant SQL strings of
+    the callers are compiled once per connection.
+
+    A pool rather than thread-local connections: Streamlit runs every rerun
+    on a new script thread, which would leave one orphan connection per
+    rerun. Use shared() so all sessions of the app draw from one pool.
+    """
+
+    _instances: Dict[str, 'SQLiteConnectionPool'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, db_path: str, max_connections: int = 8) -> 'SQLiteConnectionPool':
+        """
+        Return the process-wide pool of a database file.
+
+        Args:
+            db_path: SQLite file
+            max_connections: Pool size used when the pool is created
+
+        Returns:
+            SQLiteConnectionPool: Pool shared by every caller of the same file
+        """
+        key = str(Path(db_path).resolve())
+        with cls._instances_lock:
+            pool = cls._instances.get(key)
+            if pool is None:
+                pool = cls(db_path, max_connections=max_connections)
+                cls._instances[key] = pool
+            return pool
+
+    def __init__(
+        self,
+        db_path: str,
+        max_connections: int = 8,
+        busy_timeout: float = 5.0,
+        acquire_timeout: float = 10.0,
+        cached_statements: int = 256,
+        pragmas: Tuple[Tuple[str, Any], ...] = DEFAULT_PRAGMAS
+    ):
+        """
+        Args:
+            db_path: SQLite file (parent directory is created)
+            max_connections: Maximum open connections
+            busy_timeout: Seconds a statement waits for a lock held by another connection/process
+            acquire_timeout: Seconds a caller waits for a free connection when the pool is exhausted
+            cached_statements: Prepared statements kept per connection
+            pragmas: PRAGMA (name, value) pairs applied to every new connection
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_connections = max(1, max_connections)
+        self.busy_timeout = busy_timeout
+        self.acquire_timeout = acquire_timeout
+        self.cached_statements = cached_statements
+        self.pragmas = pragmas
+
+        self._idle: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Empresta uma conexão do pool (autocommit) e a devolve ao sair."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a connection inside a write transaction.
+
+        Commits when the block exits normally and rolls back on any
+        exception (which is re-raised).
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close_all(self) -> None:
+        """Fecha as conexões ociosas (as emprestadas são fechadas ao voltar para o pool)."""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._opened -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool occupancy.
+
+        Returns:
+            dict: Open, idle and maximum connections
+        """
+        return {
+            'open_connections': self._opened,
+            'idle_connections': self._idle.qsize(),
+            'max_connections': self.max_connections,
+            'journal_mode': dict(self.pragmas).get('journal_mode', 'DELETE'),
+        }
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.max_connections:
+                self._opened += 1
+                open_new = True
+            else:
+                open_new = False
+
+        if open_new:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Pool de conexoes de {self.db_path} esgotado ({self.max_connections} em uso)"
+            ) from None
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            # Bloco interrompido no meio de uma transacao: nao devolver a conexao com lock preso
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        self._idle.put(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._opened -= 1
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional, Dict, List
+from ...core.domain.interfaces.ICacheService import ICacheService
+from .MemoryLRUCache import MemoryLRUCache
+from .CacheService import SQLiteCacheService
+
+
+class TieredCacheService(ICacheService):
+    """
+    Cache em duas camadas: LRU em memória (limitado em bytes) na frente do
+    SQLiteCacheService. Use shared() para que todas as sessões do app
+    compartilhem a mesma camada em memória e as mesmas métricas.
+
+    - set: write-through, grava no SQLite e depois na memória
+    - get: memória primeiro; em caso de falta lê do SQLite e promove o valor
+      com a mesma expiração da entrada em disco (o TTL vale nas duas camadas)
+    - auditoria: delegada ao SQLiteCacheService
+
+    Outro processo gravando no mesmo SQLite só é visto depois que a entrada
+    em memória expira ou é removida.
+    """
+
+    _instances: Dict[str, 'TieredCacheService'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, db_path: str = "./data/cache.db", max_memory_bytes: int = 256 * 1024 * 1024) -> 'TieredCacheService':
+        """Retorna o cache em camadas do processo para o arquivo SQLite"""
+        with cls._instances_lock:
+            cache = cls._instances.get(db_path)
+            if cache is None:
+                cache = cls(db_path, max_memory_bytes=max_memory_bytes)
+                cls._instances[db_path] = cache
+            return cache
+
+    def __init__(
+        self,
+        db_path: str = "./data/cache.db",
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        backing: Optional[SQLiteCacheService] = None
+    ):
+        self.backing = backing or SQLiteCacheService(db_path)
+        self.memory = MemoryLRUCache(max_bytes=max_memory_bytes)
+        self.sqlite_hits = 0
+        self.sqlite_misses = 0
+
+    def set(self, key: str, value: Any, ttl_seconds: int = 3600) -> bool:
+        """Armazena um valor nas duas camadas (write-through)"""
+        expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
+        if not self.backing.set(key, value, ttl_seconds):
+            self.memory.delete(key)  # Não servir da memória um valor que não está no SQLite
+            return False
+        self.memory.set(key, value, expires_at.timestamp())
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        """Recupera um valor (memória, depois SQLite)"""
+        found, value = self.memory.get(key)
+        if found:
+            return value
+
+        entry = self.backing.get_entry(key)
+        if entry is None:
+            self.sqlite_misses += 1
+            return None
+        self.sqlite_hits += 1
+
+        value, expires_at = entry
+        self.memory.set(key, value, expires_at.timestamp())
+        return value
+
+    def delete(self, key: str) -> bool:
+        """Remove um valor das duas camadas"""
+        self.memory.delete(key)
+        return self.backing.delete(key)
+
+    def clear_expired(self) -> int:
+        """Remove itens expirados das duas camadas (retorna os removidos do SQLite)"""
+        self.memory.clear_expired()
+        return self.backing.clear_expired()
+
+    def log_upload(self, filename: str, num_records: int, user: str = "system", metadata: Dict = None) -> bool:
+        """Registra upload de arquivo"""
+        return self.backing.log_upload(filename, num_records, user, metadata)
+
+    def log_query(self, query_text: str, query_type: str, user: str = "system", response_time_ms: float = 0) -> bool:
+        """Registra query executada"""
+        return self.backing.log_query(query_text, query_type, user, response_time_ms)
+
+    def get_upload_history(self, limit: int = 10) -> List[Dict]:
+        """Retorna histórico de uploads"""
+        return self.backing.get_upload_history(limit)
+
+    def get_query_stats(self, hours: int = 24) -> Dict:
+        """Retorna estatísticas de queries"""
+        return self.backing.get_query_stats(hours)
+
+    def get_tier_stats(self) -> Dict[str, Dict]:
+        """
+        Retorna acertos por camada: 'memoria' conta todas as leituras,
+        'sqlite' só as que não estavam em memória.
+        """
+        sqlite_total = self.sqlite_hits + self.sqlite_misses
+        return {
+            'memoria': self.memory.get_stats(),
+            'sqlite': {
+                'hits': self.sqlite_hits,
+                'misses': self.sqlite_misses,
+                'hit_ratio': self.sqlite_hits / sqlite_total if sqlite_total else 0.0,
+            },
+        }
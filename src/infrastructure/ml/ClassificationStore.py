@@ -0,0 +1,201 @@
+"""
+Persistent store of automatic classifications keyed by NU_REGISTRO.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_STORE_PATH = 'data/ml/classification_store.db'
+
+
+class ClassificationStore:
+    """
+    Remembers the label given to each record by the K-NN classifiers, so a
+    record that comes back in a later upload (the default planilha plus the
+    weekly files) is not encoded again.
+
+    An entry is reused only when the record's NU_REGISTRO, the hash of the
+    text the classifier built from it and the classifier's model version
+    all match: an edited record, a retrained or extended reference set, a
+    different embedding model/backend or new threshold/k sends the record
+    back through the encoder. Results below the threshold are stored too
+    (label NULL), so they are not re-encoded just to be rejected again.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH):
+        """
+        Args:
+            db_path: SQLite file of the store
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS classifications (
+                label_column TEXT NOT NULL,
+                nu_registro TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                label TEXT,
+                classified_at REAL NOT NULL,
+                PRIMARY KEY (label_column, nu_registro)
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_model_version(*parts: Any) -> str:
+        """Hash curto dos componentes que determinam o resultado da classificação."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Hash SHA-1 do texto montado para o classificador."""
+        return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+    def lookup(
+        self,
+        label_column: str,
+        registros: Sequence,
+        texts: Sequence[str],
+        model_version: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up stored classifications for a batch of records.
+
+        Args:
+            label_column: Classified column (DS_ASSUNTO / SUB_ASSUNTO)
+            registros: NU_REGISTRO of each record
+            texts: Text built for each record by the classifier
+            model_version: Current model version of the classifier
+
+        Returns:
+            tuple: (boolean mask of records found with the same text and version,
+                    stored label per record; None when not found or below threshold)
+        """
+        keys = [_registro_key(value) for value in registros]
+        found = np.zeros(len(keys), dtype=bool)
+        labels = np.full(len(keys), None, dtype=object)
+
+        unique_keys = list({key for key in keys if key is not None})
+        rows = {}
+        with self._lock:
+            for start in range(0, len(unique_keys), 900):
+                chunk = unique_keys[start:start + 900]
+                placeholders = ','.join('?' * len(chunk))
+                for nu_registro, text_hash, label in self._conn.execute(
+                    f"""
+                    SELECT nu_registro, text_hash, label FROM classifications
+                    WHERE label_column = ? AND model_version = ? AND nu_registro IN ({placeholders})
+                    """,
+                    [label_column, model_version, *chunk]
+                ):
+                    rows[nu_registro] = (text_hash, label)
+
+        for i, (key, text) in enumerate(zip(keys, texts)):
+            entry = rows.get(key)
+            if entry is not None and entry[0] == self.hash_text(text):
+                found[i] = True
+                labels[i] = entry[1]
+
+        self.hits += int(found.sum())
+        self.misses += len(keys) - int(found.sum())
+        return found, labels
+
+    def save(
+        self,
+        label_column: str,
+        registros: Sequence,
+        texts: Sequence[str],
+        model_version: str,
+        labels: Sequence
+    ) -> int:
+        """
+        Store the classification of a batch of records (replacing older entries).
+
+        Args:
+            label_column: Classified column (DS_ASSUNTO / SUB_ASSUNTO)
+            registros: NU_REGISTRO of each record
+            texts: Text built for each record by the classifier
+            model_version: Model version that produced the labels
+            labels: Label per record (None = below threshold)
+
+        Returns:
+            int: Number of records stored (records without NU_REGISTRO are skipped)
+        """
+        now = time.time()
+        rows = [
+            (label_column, key, self.hash_text(text), model_version, None if pd.isna(label) else str(label), now)
+            for key, text, label in zip((_registro_key(value) for value in registros), texts, labels)
+            if key is not None
+        ]
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO classifications
+                    (label_column, nu_registro, text_hash, model_version, label, classified_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters and number of stored records per column.
+
+        Returns:
+            dict: Store statistics
+        """
+        with self._lock:
+            entries = dict(self._conn.execute(
+                "SELECT label_column, COUNT(*) FROM classifications GROUP BY label_column"
+            ).fetchall())
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'entries': entries,
+        }
+
+    def clear(self, label_column: str = None) -> None:
+        """Remove as classificações armazenadas (de uma coluna ou de todas)."""
+        with self._lock:
+            if label_column is None:
+                self._conn.execute("DELETE FROM classifications")
+            else:
+                self._conn.execute("DELETE FROM classifications WHERE label_column = ?", (label_column,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self._conn.close()
+
+
+def _registro_key(value: Any) -> Any:
+    """NU_REGISTRO como texto estável (123, 123.0 e '123' viram '123'); None se vazio."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    key = str(value).strip()
+    return key or None
@@ -0,0 +1,146 @@
+"""
+Background execution of classification jobs for the Streamlit server.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+
+class JobCancelledError(Exception):
+    """Job cancelado (ex.: novo upload substituiu os dados)."""
+
+
+@dataclass
+class ClassificationJob:
+    """
+    Estado de um job de classificação em segundo plano.
+    """
+    job_id: str
+    status: str = 'pending'  # 'pending', 'running', 'done', 'failed' ou 'cancelled'
+    stage: str = ''
+    progress: float = 0.0
+    result: Optional[pd.DataFrame] = None
+    error: Optional[str] = None
+    messages: List[str] = field(default_factory=list)
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    cancel_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+
+class ClassificationWorker:
+    """
+    Process-wide job queue that runs classification off the Streamlit script
+    thread. Jobs run one at a time on a dedicated thread: the embedding model
+    is shared through ModelRegistry and PyTorch already uses every core, so
+    running jobs concurrently would only contend for the same CPU.
+
+    The script submits a job, renders the unclassified data immediately and
+    polls get() on later reruns; progress is fed by the classifiers'
+    progress_callback hooks.
+    """
+
+    _shared: Optional['ClassificationWorker'] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_finished_jobs: int = 8):
+        """
+        Args:
+            max_finished_jobs: Finished jobs kept for polling before the oldest are dropped
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='classification')
+        self._jobs: Dict[str, ClassificationJob] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> 'ClassificationWorker':
+        """Instância única por processo (sobrevive aos reruns do Streamlit)."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def submit(
+        self,
+        df: pd.DataFrame,
+        classify_fn: Callable[..., pd.DataFrame]
+    ) -> str:
+        """
+        Queue a classification job.
+
+        Args:
+            df: Data to classify (the job works on it and returns a new DataFrame)
+            classify_fn: Called as classify_fn(df, progress) in the worker thread;
+                         progress(stage, fraction, message=None) updates the job
+                         (message is appended to job.messages) and raises
+                         JobCancelledError once cancel() was requested
+
+        Returns:
+            str: Job id for get() / cancel()
+        """
+        job = ClassificationJob(job_id=uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict_finished()
+
+        self._executor.submit(self._run, job, df, classify_fn)
+        return job.job_id
+
+    def get(self, job_id: str) -> Optional[ClassificationJob]:
+        """Retorna o job (ou None se desconhecido/descartado)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id: str) -> Optional[ClassificationJob]:
+        """Remove e retorna o job (após consumir o resultado)."""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> None:
+        """Pede o cancelamento; o job para no próximo callback de progresso."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.cancel_requested = True
+
+    def _run(self, job: ClassificationJob, df: pd.DataFrame, classify_fn) -> None:
+        def progress(stage: str, fraction: float, message: Optional[str] = None) -> None:
+            if job.cancel_requested:
+                raise JobCancelledError(job.job_id)
+            job.stage = stage
+            job.progress = min(max(fraction, 0.0), 1.0)
+            if message:
+                job.messages.append(message)
+
+        status = 'failed'
+        try:
+            if job.cancel_requested:
+                raise JobCancelledError(job.job_id)
+            job.status = 'running'
+            job.result = classify_fn(df, progress)
+            job.progress = 1.0
+            status = 'done'
+        except JobCancelledError:
+            status = 'cancelled'
+        except Exception as e:  # o erro e exibido na interface ao consultar o job
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.status = status
+
+    def _evict_finished(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at
+        )
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job.job_id]
@@ -0,0 +1,311 @@
+"""
+Persistent, content-addressed cache of text embeddings.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from ...shared.builders.TextBuilderService import TextBuilderService
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model_name, normalized text hash).
+
+    Vectors live in a memory-mapped float32 matrix (one row per slot) and a
+    small SQLite index maps each text hash to its slot and last access time.
+    The matrix file starts at INITIAL_ROWS rows and doubles as slots are
+    used, up to max_entries (files are not sparse on NTFS, so the full
+    matrix is never allocated up front). When the cache is full the least
+    recently used entries are evicted and their slots reused.
+    """
+
+    INITIAL_ROWS = 1024
+
+    _instances: Dict[Tuple[str, str], 'EmbeddingCache'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def shared(
+        cls,
+        cache_dir: str,
+        model_name: str,
+        dimension: int,
+        max_entries: int = 500_000
+    ) -> 'EmbeddingCache':
+        """
+        Return the process-wide cache for (cache_dir, model_name).
+
+        Every EmbeddingService using the same directory and model must go
+        through the same instance so slot allocation stays consistent.
+        """
+        key = (str(Path(cache_dir).resolve()), model_name)
+        with cls._instances_lock:
+            cache = cls._instances.get(key)
+            if cache is None:
+                cache = cls(cache_dir, model_name, dimension, max_entries)
+                cls._instances[key] = cache
+            return cache
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str,
+        dimension: int,
+        max_entries: int = 500_000
+    ):
+        """
+        Args:
+            cache_dir: Base directory of the cache (one subdirectory per model)
+            model_name: Name of the embedding model the vectors belong to
+            dimension: Dimension of the embedding vectors
+            max_entries: Maximum number of cached texts before LRU eviction
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_dir = Path(cache_dir) / re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.cache_dir / 'vectors.f32'
+        self._meta_path = self.cache_dir / 'meta.json'
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_dir / 'index.db'), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        self._conn.commit()
+
+        if not self._meta_matches():
+            self._reset()
+        self._vectors = self._open_vectors()
+        self._shrink_to_capacity()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """
+        Normaliza espaços para que variações triviais compartilhem a mesma
+        entrada. Cada chunk é normalizado separadamente e o separador é
+        mantido: str.split() trata '\x1f' como espaço, e um texto em chunks
+        (vetor com mean pooling) não pode ter a chave do texto único.
+        """
+        separator = TextBuilderService.CHUNK_SEPARATOR
+        return separator.join(' '.join(chunk.split()) for chunk in str(text).split(separator))
+
+    def make_key(self, text: str) -> str:
+        """Hash SHA-1 do texto normalizado."""
+        return hashlib.sha1(self.normalize_text(text).encode('utf-8')).hexdigest()
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Look up cached embeddings for a list of texts.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            tuple: (matrix (len(texts), dimension) with cached rows filled,
+                    positions of texts that were not found)
+        """
+        result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        keys = [self.make_key(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            unique_keys = list(set(keys))
+            for start in range(0, len(unique_keys), 900):
+                chunk = unique_keys[start:start + 900]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            missing = []
+            for i, key in enumerate(keys):
+                slot = found.get(key)
+                if slot is None:
+                    missing.append(i)
+                else:
+                    result[i] = self._vectors[slot]
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return result, missing
+
+    def store(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """
+        Store embeddings for texts, evicting least recently used entries if needed.
+
+        Args:
+            texts: Texts that were encoded
+            embeddings: Matrix (len(texts), dimension) of their embeddings
+        """
+        if len(texts) == 0:
+            return
+
+        new_entries = {}
+        for text, vector in zip(texts, embeddings):
+            new_entries[self.make_key(text)] = vector
+
+        with self._lock:
+            keys = list(new_entries)
+            existing = set()
+            for start in range(0, len(keys), 900):
+                chunk = keys[start:start + 900]
+                placeholders = ','.join('?' * len(chunk))
+                existing.update(
+                    row[0] for row in self._conn.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", chunk
+                    )
+                )
+            keys = [k for k in keys if k not in existing][-self.max_entries:]
+            if not keys:
+                return
+
+            count = self._count()
+            free = self.max_entries - count
+            slots = list(range(count, count + min(free, len(keys))))
+
+            to_evict = len(keys) - len(slots)
+            if to_evict > 0:
+                evicted = self._conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used ASC LIMIT ?", (to_evict,)
+                ).fetchall()
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in evicted])
+                slots.extend(slot for _, slot in evicted)
+
+            now = time.time()
+            self._ensure_rows(max(slots) + 1)
+            for key, slot in zip(keys, slots):
+                self._vectors[slot] = new_entries[key]
+            self._vectors.flush()
+
+            self._conn.executemany(
+                "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in zip(keys, slots)]
+            )
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters and occupancy of the cache.
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            entries = self._count()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'disk_bytes': self._vectors_path.stat().st_size if self._vectors_path.exists() else 0,
+        }
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _meta_matches(self) -> bool:
+        """Check that the cache on disk was written by the same model and dimension."""
+        if not self._meta_path.exists():
+            return False
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        return meta.get('model_name') == self.model_name and meta.get('dimension') == self.dimension
+
+    def _reset(self) -> None:
+        """Discard cached vectors and write fresh metadata."""
+        self._conn.execute("DELETE FROM entries")
+        self._conn.commit()
+        if self._vectors_path.exists():
+            self._vectors_path.unlink()
+        self._meta_path.write_text(
+            json.dumps({'model_name': self.model_name, 'dimension': self.dimension}),
+            encoding='utf-8'
+        )
+
+    def _open_vectors(self, rows: int = 0) -> np.memmap:
+        """Open the memory-mapped vector matrix, growing the file to at least rows rows."""
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        needed = (rows or min(self.max_entries, self.INITIAL_ROWS)) * row_bytes
+        current = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        if current < needed:
+            with open(self._vectors_path, 'ab') as f:
+                f.truncate(needed)
+        rows = max(current, needed) // row_bytes
+        return np.memmap(self._vectors_path, dtype=np.float32, mode='r+', shape=(rows, self.dimension))
+
+    def _ensure_rows(self, rows: int) -> None:
+        """Grow the matrix geometrically (capped at max_entries) so it holds rows rows."""
+        if rows <= len(self._vectors):
+            return
+        target = min(self.max_entries, max(rows, 2 * len(self._vectors)))
+        self._vectors.flush()
+        self._vectors = None  # Solta o mapeamento antes de aumentar o arquivo (Windows)
+        self._vectors = self._open_vectors(target)
+
+    def _shrink_to_capacity(self) -> None:
+        """Evict the least recently used entries when max_entries was lowered."""
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+            self._conn.commit()
+
+        # Keep used slots contiguous (0..count-1) by moving high slots into holes
+        count = self._count()
+        high = self._conn.execute(
+            "SELECT key, slot FROM entries WHERE slot >= ? ORDER BY slot", (count,)
+        ).fetchall()
+        if high:
+            used_low = {row[0] for row in self._conn.execute("SELECT slot FROM entries WHERE slot < ?", (count,))}
+            holes = [s for s in range(count) if s not in used_low]
+            for (key, slot), target in zip(high, holes):
+                self._vectors[target] = self._vectors[slot]
+                self._conn.execute("UPDATE entries SET slot = ? WHERE key = ?", (target, key))
+            self._vectors.flush()
+            self._conn.commit()
+
+        if len(self._vectors) > self.max_entries:
+            # Arquivo maior que o novo limite: descarta as linhas além de max_entries
+            self._vectors = None
+            with open(self._vectors_path, 'r+b') as f:
+                f.truncate(self.max_entries * self.dimension * np.dtype(np.float32).itemsize)
+            self._vectors = self._open_vectors()
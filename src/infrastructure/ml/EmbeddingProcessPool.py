@@ -0,0 +1,175 @@
+"""
+Multi-process embedding encoding with shared-memory output.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from .TokenBudgetBatcher import TokenBudgetBatcher
+
+# Variaveis lidas pelas bibliotecas de BLAS/OpenMP na importacao do torch
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+_worker_model = None
+_worker_batcher: Optional[TokenBudgetBatcher] = None
+
+
+class EmbeddingProcessPool:
+    """
+    Encodes large text lists on several worker processes, each holding its
+    own copy of the model and limited to threads_per_worker intra-op threads,
+    so num_workers x threads_per_worker matches the cores of the batch host
+    instead of every process trying to use all of them.
+
+    Texts are ordered by length and split into chunks of similar size; each
+    worker encodes its chunks with the same token-budget batching as
+    EmbeddingService and writes the rows straight into a shared-memory
+    output matrix, so only the texts are pickled to the workers.
+
+    Workers are started with 'spawn' (same behaviour on Linux and Windows)
+    on the first encode() and kept until close().
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dimension: int,
+        backend: str = 'torch',
+        onnx_dir: Optional[str] = None,
+        num_workers: int = 0,
+        threads_per_worker: int = 2,
+        token_budget: int = 8192,
+        chunk_size: int = 512
+    ):
+        """
+        Args:
+            model_name: Sentence Transformer model loaded by every worker
+            dimension: Embedding dimension of the model
+            backend: Inference backend ('torch', 'onnx' or 'onnx_int8')
+            onnx_dir: Base directory of the ONNX exports (ONNX backends only)
+            num_workers: Worker processes (0 = cpu_count // threads_per_worker)
+            threads_per_worker: Intra-op threads of each worker (torch / ONNX Runtime / BLAS)
+            token_budget: Maximum padded tokens per encoder batch inside a worker
+            chunk_size: Maximum texts sent to a worker per task
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.token_budget = token_budget
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts on the worker processes.
+
+        Args:
+            texts: Texts to encode
+
+        Returns:
+            numpy.ndarray: L2-normalized float32 matrix (len(texts), dimension) in input order
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        executor = self._start()
+        shape = (len(texts), self.dimension)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(texts) * self.dimension * 4))
+        try:
+            # Textos de tamanho parecido no mesmo chunk: menos padding dentro do worker
+            order = np.argsort([-len(text) for text in texts], kind='stable')
+            size = max(1, min(self.chunk_size, math.ceil(len(texts) / (self.num_workers * 4))))
+            futures = [
+                executor.submit(
+                    _encode_chunk,
+                    shm.name,
+                    shape,
+                    positions,
+                    [texts[i] for i in positions]
+                )
+                for positions in (order[start:start + size] for start in range(0, len(order), size))
+            ]
+            wait(futures)
+            for future in futures:
+                future.result()  # Propaga erros dos workers
+
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self) -> None:
+        """Encerra os processos de trabalho."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.onnx_dir, self.threads_per_worker, self.token_budget)
+            )
+        return self._executor
+
+    def __enter__(self) -> 'EmbeddingProcessPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _init_worker(model_name: str, backend: str, onnx_dir: Optional[str], threads: int, token_budget: int) -> None:
+    """Limita as threads do processo e carrega o modelo (antes da primeira tarefa)."""
+    global _worker_model, _worker_batcher
+
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    # Importado aqui para que o torch leia as variaveis acima (se o script principal ainda nao o importou);
+    # set_num_threads abaixo vale de qualquer forma
+    from .ModelRegistry import ModelRegistry
+
+    kwargs = {'intra_op_threads': threads}
+    if onnx_dir is not None:
+        kwargs['onnx_dir'] = onnx_dir
+    _worker_model = ModelRegistry.get_model(model_name, backend=backend, **kwargs)
+    if backend == 'torch':
+        import torch
+        torch.set_num_threads(threads)
+
+    _worker_batcher = TokenBudgetBatcher(token_budget=token_budget)
+
+
+def _encode_chunk(shm_name: str, shape: tuple, positions: np.ndarray, texts: List[str]) -> int:
+    """Codifica um chunk e grava as linhas na matriz compartilhada."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        lengths = _worker_batcher.token_lengths(
+            texts,
+            getattr(_worker_model, 'tokenizer', None),
+            _worker_model.max_seq_length
+        )
+        for batch in _worker_batcher.plan(lengths):
+            output[positions[batch]] = _worker_model.encode(
+                [texts[i] for i in batch],
+                show_progress_bar=False,
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            )
+        del output
+    finally:
+        shm.close()
+    return len(texts)
@@ -0,0 +1,146 @@
+"""
+Process-wide registry of Sentence Transformer models.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sentence_transformers import SentenceTransformer
+
+from .OnnxEncoder import DEFAULT_ONNX_DIR, EMBEDDING_BACKENDS, OnnxSentenceEncoder, onnx_model_dir
+
+
+class ModelRegistry:
+    """
+    Loads each Sentence Transformer model once per process and shares it
+    between classifiers, Streamlit reruns and sessions.
+
+    Loading is guarded by a per-model lock, so concurrent sessions asking for
+    the same model wait for a single load instead of each reading it from disk.
+
+    Besides PyTorch ('torch'), a model can be served by its ONNX Runtime
+    export ('onnx', 'onnx_int8'); each backend is registered under its own
+    key (see registry_key()).
+    """
+
+    _models: Dict[str, Any] = {}
+    _stats: Dict[str, Dict[str, Any]] = {}
+    _locks: Dict[str, threading.Lock] = {}
+    _registry_lock = threading.Lock()
+
+    @staticmethod
+    def registry_key(model_name: str, backend: str = 'torch') -> str:
+        """Chave do modelo no registro (o backend torch usa só o nome, como antes)."""
+        return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+    @classmethod
+    def get_model(
+        cls,
+        model_name: str,
+        backend: str = 'torch',
+        onnx_dir: str = DEFAULT_ONNX_DIR,
+        intra_op_threads: Optional[int] = None
+    ) -> Any:
+        """
+        Return the shared model instance, loading it on first use.
+
+        Args:
+            model_name: Name or path of the Sentence Transformer model
+            backend: Inference backend ('torch', 'onnx' or 'onnx_int8')
+            onnx_dir: Base directory of the ONNX exports (ONNX backends only)
+            intra_op_threads: ONNX Runtime intra-op threads (ONNX backends only)
+
+        Returns:
+            SentenceTransformer | OnnxSentenceEncoder: Shared model instance
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Backend de embeddings invalido: {backend}. Use um de {EMBEDDING_BACKENDS}")
+
+        key = cls.registry_key(model_name, backend)
+        model = cls._models.get(key)
+        if model is not None:
+            cls._stats[key]['hits'] += 1
+            return model
+
+        with cls._registry_lock:
+            lock = cls._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            model = cls._models.get(key)
+            if model is not None:
+                cls._stats[key]['hits'] += 1
+                return model
+
+            start = time.perf_counter()
+            if backend == 'torch':
+                model = SentenceTransformer(model_name)
+            else:
+                model = OnnxSentenceEncoder(
+                    onnx_model_dir(model_name, onnx_dir),
+                    quantized=(backend == 'onnx_int8'),
+                    intra_op_threads=intra_op_threads
+                )
+            load_time = time.perf_counter() - start
+
+            cls._stats[key] = {
+                'model_name': model_name,
+                'backend': backend,
+                'load_time_s': load_time,
+                'memory_bytes': cls._estimate_memory(model),
+                'embedding_dimension': model.get_sentence_embedding_dimension(),
+                'loaded_at': time.time(),
+                'hits': 0,
+            }
+            cls._models[key] = model
+
+        return model
+
+    @classmethod
+    def is_loaded(cls, model_name: str, backend: str = 'torch') -> bool:
+        """Indica se o modelo já está carregado no processo."""
+        return cls.registry_key(model_name, backend) in cls._models
+
+    @classmethod
+    def get_stats(cls, model_name: str) -> Dict[str, Any]:
+        """
+        Return load time, memory footprint and reuse count of a loaded model.
+
+        Args:
+            model_name: Registry key of a loaded model (see registry_key())
+
+        Returns:
+            dict: Model statistics (empty if the model was never loaded)
+        """
+        return dict(cls._stats.get(model_name, {}))
+
+    @classmethod
+    def list_models(cls) -> List[Dict[str, Any]]:
+        """Retorna estatísticas de todos os modelos carregados."""
+        return [dict(stats) for stats in cls._stats.values()]
+
+    @classmethod
+    def unload(cls, model_name: str) -> bool:
+        """
+        Drop a model from the registry so its memory can be reclaimed.
+
+        Args:
+            model_name: Registry key of the model to unload (see registry_key())
+
+        Returns:
+            bool: True if the model was loaded
+        """
+        with cls._registry_lock:
+            cls._stats.pop(model_name, None)
+            cls._locks.pop(model_name, None)
+            return cls._models.pop(model_name, None) is not None
+
+    @staticmethod
+    def _estimate_memory(model: Any) -> int:
+        """Estimate model memory as the size of its parameters and buffers."""
+        if isinstance(model, OnnxSentenceEncoder):
+            return model.memory_bytes()
+
+        total = 0
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        return total
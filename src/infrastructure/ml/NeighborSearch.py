@@ -0,0 +1,287 @@
+"""
+Neighbor search backends (exact NumPy and FAISS) for the K-NN classifiers.
+"""
+import hashlib
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from ...core.domain.interfaces.INeighborSearch import INeighborSearch
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu e opcional: sem ele so o backend exato fica disponivel
+    faiss = None
+
+
+SEARCH_BACKENDS = ('exact', 'faiss_flat', 'faiss_ivf', 'faiss_hnsw')
+
+
+class ExactNeighborSearch(INeighborSearch):
+    """
+    Brute-force inner product search with NumPy.
+    Queries are processed in chunks so the similarity matrix stays bounded
+    even for reference sets with hundreds of thousands of rows.
+    """
+
+    def __init__(self, embeddings: np.ndarray, max_chunk_elements: int = 32_000_000):
+        """
+        Args:
+            embeddings: Matrix (n, dimension) of L2-normalized reference embeddings
+            max_chunk_elements: Maximum size of each similarity block (rows x references)
+        """
+        self.embeddings = embeddings
+        self.max_chunk_elements = max_chunk_elements
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca exata dos k vizinhos por produto interno."""
+        n_queries = queries.shape[0]
+        n_ref = self.embeddings.shape[0]
+        k = min(k, n_ref)
+
+        scores = np.empty((n_queries, k), dtype=np.float32)
+        indices = np.empty((n_queries, k), dtype=np.int64)
+
+        chunk_rows = max(1, self.max_chunk_elements // max(n_ref, 1))
+        for start in range(0, n_queries, chunk_rows):
+            end = min(start + chunk_rows, n_queries)
+            similarities = queries[start:end] @ self.embeddings.T
+
+            top_k = np.argpartition(similarities, -k, axis=1)[:, -k:]
+            top_scores = np.take_along_axis(similarities, top_k, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+
+            indices[start:end] = np.take_along_axis(top_k, order, axis=1)
+            scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+
+        return scores, indices
+
+    def add(self, embeddings: np.ndarray) -> None:
+        self.embeddings = np.concatenate([self.embeddings, embeddings.astype(self.embeddings.dtype, copy=False)])
+
+    def size(self) -> int:
+        return self.embeddings.shape[0]
+
+
+class FaissNeighborSearch(INeighborSearch):
+    """
+    FAISS inner product index (flat, IVF or HNSW) over normalized embeddings.
+    """
+
+    KINDS = ('flat', 'ivf', 'hnsw')
+
+    def __init__(self, index):
+        """
+        Args:
+            index: Trained FAISS index using METRIC_INNER_PRODUCT
+        """
+        _require_faiss()
+        self.index = index
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        kind: str = 'hnsw',
+        nlist: Optional[int] = None,
+        hnsw_m: int = 32,
+        ef_construction: int = 200
+    ) -> 'FaissNeighborSearch':
+        """
+        Build a FAISS index from reference embeddings.
+
+        Args:
+            embeddings: Matrix (n, dimension) of L2-normalized reference embeddings
+            kind: 'flat' (exact), 'ivf' (inverted lists) or 'hnsw' (graph)
+            nlist: Number of IVF lists (default ~4*sqrt(n))
+            hnsw_m: Number of HNSW neighbors per node
+            ef_construction: HNSW build-time search depth
+
+        Returns:
+            FaissNeighborSearch: Index with all embeddings added
+        """
+        _require_faiss()
+        if kind not in cls.KINDS:
+            raise ValueError(f"Tipo de indice FAISS invalido: {kind}. Use um de {cls.KINDS}")
+
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n, dimension = vectors.shape
+
+        if kind == 'flat':
+            index = faiss.IndexFlatIP(dimension)
+        elif kind == 'ivf':
+            if nlist is None:
+                nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = ef_construction
+
+        index.add(vectors)
+        return cls(index)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], nprobe: int = 16, ef_search: int = 128) -> 'FaissNeighborSearch':
+        """
+        Load a persisted FAISS index.
+
+        Args:
+            path: Index file written by save()
+            nprobe: IVF lists visited per query
+            ef_search: HNSW search depth
+
+        Returns:
+            FaissNeighborSearch: Loaded index
+        """
+        _require_faiss()
+        index = faiss.read_index(str(path))
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = nprobe
+        return cls(index)
+
+    def save(self, path: Union[str, Path], fingerprint: Optional[str] = None) -> None:
+        """
+        Persist the index to disk.
+
+        Args:
+            path: Index file
+            fingerprint: embeddings_fingerprint() of the indexed embeddings, written
+                next to the index so load_neighbor_search() can tell it is current
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fingerprint_path = index_fingerprint_path(path)
+        fingerprint_path.unlink(missing_ok=True)  # Impressão antiga não vale para o novo índice
+        faiss.write_index(self.index, str(path))
+        if fingerprint is not None:
+            fingerprint_path.write_text(fingerprint, encoding='utf-8')
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca aproximada (ou exata, para 'flat') dos k vizinhos."""
+        k = min(k, self.index.ntotal)
+        scores, indices = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+        return scores, indices.astype(np.int64, copy=False)
+
+    def add(self, embeddings: np.ndarray) -> None:
+        """Adiciona vetores sem retreinar (listas IVF existentes são reaproveitadas)."""
+        self.index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+    def size(self) -> int:
+        return self.index.ntotal
+
+
+def _require_faiss() -> None:
+    if faiss is None:
+        raise ImportError(
+            "faiss-cpu nao esta instalado. Instale com 'pip install faiss-cpu' "
+            "ou use search_backend='exact'."
+        )
+
+
+def default_index_path(embeddings_path: Union[str, Path], backend: str) -> Path:
+    """
+    Path of the persisted index for a backend, next to the embeddings file.
+    Ex.: data/ml/assunto_embeddings.npy -> data/ml/assunto_embeddings.faiss_hnsw.index
+    """
+    embeddings_path = Path(embeddings_path)
+    return embeddings_path.with_name(f"{embeddings_path.stem}.{backend}.index")
+
+
+def index_fingerprint_path(index_path: Union[str, Path]) -> Path:
+    """
+    Path of the embeddings fingerprint stored next to a persisted index.
+    Ex.: embeddings.faiss_hnsw.index -> embeddings.faiss_hnsw.index.fingerprint
+    """
+    index_path = Path(index_path)
+    return index_path.with_name(f"{index_path.name}.fingerprint")
+
+
+def embeddings_fingerprint(embeddings: np.ndarray, sample_rows: int = 4096) -> str:
+    """
+    Fingerprint of a reference embedding matrix: SHA-1 of its shape plus up to
+    sample_rows rows spread evenly over the matrix (first and last included).
+
+    Sampling keeps the check cheap on memory-mapped sets with millions of rows
+    while still catching a retrain (every row changes) or an append (the shape
+    and the last row change).
+
+    Args:
+        embeddings: Matrix (n, dimension) of reference embeddings
+        sample_rows: Maximum number of rows hashed
+
+    Returns:
+        str: Hex digest
+    """
+    n = embeddings.shape[0]
+    digest = hashlib.sha1(f"{tuple(embeddings.shape)}".encode('ascii'))
+    if n:
+        rows = np.unique(np.linspace(0, n - 1, num=min(n, sample_rows)).astype(np.int64))
+        digest.update(np.ascontiguousarray(embeddings[rows], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def build_neighbor_search(backend: str, embeddings: np.ndarray) -> INeighborSearch:
+    """
+    Build a neighbor search backend from reference embeddings.
+
+    Args:
+        backend: One of SEARCH_BACKENDS
+        embeddings: Matrix (n, dimension) of L2-normalized reference embeddings
+
+    Returns:
+        INeighborSearch: Ready-to-query backend
+    """
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"Backend de busca invalido: {backend}. Use um de {SEARCH_BACKENDS}")
+
+    if backend == 'exact':
+        return ExactNeighborSearch(embeddings)
+
+    return FaissNeighborSearch.build(embeddings, kind=backend[len('faiss_'):])
+
+
+def load_neighbor_search(
+    backend: str,
+    embeddings: np.ndarray,
+    embeddings_path: Union[str, Path],
+    index_path: Optional[Union[str, Path]] = None
+) -> INeighborSearch:
+    """
+    Load the persisted index for a backend, building it in memory if the file
+    is missing or does not match the reference embeddings (its stored
+    embeddings_fingerprint() differs, or it has no fingerprint).
+
+    Args:
+        backend: One of SEARCH_BACKENDS
+        embeddings: Reference embeddings the index must cover
+        embeddings_path: Path of the embeddings file (used to locate the index)
+        index_path: Explicit index path (default: default_index_path())
+
+    Returns:
+        INeighborSearch: Ready-to-query backend
+    """
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"Backend de busca invalido: {backend}. Use um de {SEARCH_BACKENDS}")
+
+    if backend == 'exact':
+        return ExactNeighborSearch(embeddings)
+
+    path = Path(index_path) if index_path else default_index_path(embeddings_path, backend)
+    fingerprint_path = index_fingerprint_path(path)
+    if path.exists() and fingerprint_path.exists():
+        stored = fingerprint_path.read_text(encoding='utf-8').strip()
+        if stored == embeddings_fingerprint(embeddings):
+            search = FaissNeighborSearch.load(path)
+            if search.size() == len(embeddings):
+                return search
+
+    try:
+        print(f"Indice {backend} ausente ou desatualizado ({path}); construindo em memoria...")
+    except (OSError, IOError):
+        pass
+    return build_neighbor_search(backend, embeddings)
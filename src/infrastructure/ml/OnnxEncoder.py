@@ -0,0 +1,240 @@
+"""
+ONNX Runtime sentence encoder (fp32 or int8 dynamically quantized export).
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:  # onnxruntime e opcional: sem ele so o backend torch fica disponivel
+    onnxruntime = None
+
+
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'onnx_int8')
+DEFAULT_ONNX_DIR = 'data/ml/onnx'
+
+MODEL_FILES = {'onnx': 'model.onnx', 'onnx_int8': 'model_int8.onnx'}
+CONFIG_NAME = 'encoder_config.json'
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in replacement for the parts of SentenceTransformer used by
+    EmbeddingService (encode / get_sentence_embedding_dimension), running
+    the transformer exported by export_onnx_model() on ONNX Runtime.
+
+    Export layout (one directory per model, e.g.
+    data/ml/onnx/sentence-transformers__paraphrase-multilingual-MiniLM-L12-v2/):
+
+        model.onnx             fp32 transformer (outputs token embeddings)
+        model_int8.onnx        same graph with int8 dynamically quantized weights
+        encoder_config.json    pooling mode, max_seq_length, dimension, inputs
+        tokenizer files        saved from the original model
+
+    Pooling and normalization run in NumPy, reproducing the model's
+    sentence-transformers Pooling module.
+    """
+
+    def __init__(
+        self,
+        model_dir: Union[str, Path],
+        quantized: bool = False,
+        intra_op_threads: Optional[int] = None
+    ):
+        """
+        Args:
+            model_dir: Export directory written by export_onnx_model()
+            quantized: Load model_int8.onnx instead of model.onnx
+            intra_op_threads: ONNX Runtime intra-op threads (None = runtime default)
+        """
+        _require_onnxruntime()
+        from transformers import AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        self.model_path = self.model_dir / MODEL_FILES['onnx_int8' if quantized else 'onnx']
+        if not self.model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found: {self.model_path}. "
+                "Run scripts/training/export_onnx_model.py first."
+            )
+
+        self.config: Dict[str, Any] = json.loads((self.model_dir / CONFIG_NAME).read_text(encoding='utf-8'))
+        self.max_seq_length = self.config['max_seq_length']
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads is not None:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_path), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode sentences (same call convention as SentenceTransformer.encode).
+
+        Args:
+            sentences: Texts to encode
+            batch_size: Texts per inference call
+            show_progress_bar: Show a tqdm progress bar
+            normalize_embeddings: L2-normalize the sentence embeddings
+            convert_to_numpy: Accepted for compatibility (always returns NumPy)
+
+        Returns:
+            numpy.ndarray: float32 matrix (len(sentences), dimension)
+        """
+        starts = range(0, len(sentences), batch_size)
+        if show_progress_bar:
+            from tqdm import tqdm
+            starts = tqdm(starts, desc="Batches")
+
+        embeddings = np.empty((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in starts:
+            batch = sentences[start:start + batch_size]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            embeddings[start:start + len(batch)] = self._pool(token_embeddings, encoded['attention_mask'])
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        return embeddings
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Pooling do sentence-transformers (mean ou cls) sobre os tokens."""
+        if self.config['pooling_mode'] == 'cls':
+            return token_embeddings[:, 0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return summed / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['embedding_dimension']
+
+    def memory_bytes(self) -> int:
+        """Tamanho do grafo ONNX carregado (pesos)."""
+        return self.model_path.stat().st_size
+
+
+def _require_onnxruntime() -> None:
+    if onnxruntime is None:
+        raise ImportError(
+            "onnxruntime nao esta instalado. Instale com 'pip install onnxruntime' "
+            "ou use embedding_backend='torch'."
+        )
+
+
+def onnx_model_dir(model_name: str, base_dir: Union[str, Path] = DEFAULT_ONNX_DIR) -> Path:
+    """
+    Export directory of a model.
+    Ex.: sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 ->
+         data/ml/onnx/sentence-transformers__paraphrase-multilingual-MiniLM-L12-v2
+    """
+    return Path(base_dir) / model_name.replace('/', '__')
+
+
+def export_onnx_model(
+    model_name: str,
+    base_dir: Union[str, Path] = DEFAULT_ONNX_DIR,
+    quantize: bool = True,
+    opset: int = 14
+) -> Path:
+    """
+    Export a Sentence Transformer to ONNX and, optionally, an int8 dynamically
+    quantized copy (weights of MatMul/Gemm in int8, activations quantized at
+    run time).
+
+    Args:
+        model_name: Sentence Transformer to export
+        base_dir: Base directory of the exports
+        quantize: Also write model_int8.onnx
+        opset: ONNX opset used by torch.onnx.export
+
+    Returns:
+        Path: Export directory
+
+    Raises:
+        ValueError: Model with modules other than Transformer / Pooling / Normalize
+    """
+    _require_onnxruntime()
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    model.eval()
+
+    modules = [type(module).__name__ for module in model]
+    unsupported = [name for name in modules[1:] if name not in ('Pooling', 'Normalize')]
+    if modules[0] != 'Transformer' or unsupported:
+        raise ValueError(f"Modulos nao suportados na exportacao ONNX de {model_name}: {modules}")
+
+    pooling_mode = 'mean'
+    if len(model) > 1 and type(model[1]).__name__ == 'Pooling':
+        pooling_mode = model[1].get_pooling_mode_str()
+        if pooling_mode not in ('mean', 'cls'):
+            raise ValueError(f"Pooling '{pooling_mode}' nao suportado na exportacao ONNX")
+
+    output_dir = onnx_model_dir(model_name, base_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    transformer = model[0].auto_model
+    tokenizer = model.tokenizer
+    sample = tokenizer(['exemplo de texto'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['token_embeddings'] = {0: 'batch', 1: 'sequence'}
+
+    fp32_path = output_dir / MODEL_FILES['onnx']
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(fp32_path), str(output_dir / MODEL_FILES['onnx_int8']), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(str(output_dir))
+    config = {
+        'model_name': model_name,
+        'pooling_mode': pooling_mode,
+        'max_seq_length': model.max_seq_length,
+        'embedding_dimension': model.get_sentence_embedding_dimension(),
+        'inputs': input_names,
+        'opset': opset,
+    }
+    tmp_path = output_dir / f"{CONFIG_NAME}.tmp"
+    tmp_path.write_text(json.dumps(config, indent=2), encoding='utf-8')
+    os.replace(tmp_path, output_dir / CONFIG_NAME)
+
+    return output_dir
@@ -0,0 +1,350 @@
+"""
+Versioned artifact directory holding a K-NN reference set and its manifest.
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .NeighborSearch import build_neighbor_search, default_index_path, embeddings_fingerprint
+from .ReferenceSet import ReferenceSet
+from .TextColumnFile import TextColumnFile
+
+
+BUNDLE_FORMAT_VERSION = 1
+
+
+class ArtifactMismatchError(ValueError):
+    """Artefato de referência incompatível com o modelo em uso ou corrompido."""
+
+
+class ReferenceBundle:
+    """
+    One directory per classifier (e.g. data/ml/assunto/):
+
+        manifest.json                 format, version, embedding model/dimension,
+                                      text builder config, label vocabulary,
+                                      training info, history, size and SHA-256
+                                      of every file below
+        embeddings.npy                float32 L2-normalized vectors (mmap)
+        labels.npy                    int32 label code per row (mmap)
+        reference.texts.bin/...       reference texts (TextColumnFile)
+        embeddings.<backend>.index    persisted FAISS indexes (optional, + .fingerprint)
+
+    Nothing is unpickled. manifest.json is written last, so a bundle whose
+    files do not match their manifest entry is detected on load; a model or
+    dimension different from the running EmbeddingService fails fast.
+
+    Training runs write the new bundle into staging() (a sibling directory)
+    and publish it with promote(), so the live bundle keeps serving until the
+    new one is complete.
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+    STAGING_SUFFIX = '.staging'
+    PREVIOUS_SUFFIX = '.previous'
+
+    def __init__(self, bundle_dir: Union[str, Path]):
+        """
+        Args:
+            bundle_dir: Artifact directory (e.g. data/ml/assunto)
+        """
+        self.bundle_dir = Path(bundle_dir)
+        self.manifest_path = self.bundle_dir / self.MANIFEST_NAME
+        self.embeddings_path = self.bundle_dir / 'embeddings.npy'
+        self.labels_path = self.bundle_dir / 'labels.npy'
+        self.texts = TextColumnFile(self.bundle_dir / 'reference')
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def invalidate(self) -> None:
+        """Remove o manifest: o bundle fica inválido até o próximo write() (ex.: retreino em andamento)."""
+        self.manifest_path.unlink(missing_ok=True)
+
+    def staging(self) -> 'ReferenceBundle':
+        """Bundle ao lado deste (ex.: data/ml/assunto.staging) onde um retreino grava o novo artefato."""
+        return ReferenceBundle(self.bundle_dir.with_name(self.bundle_dir.name + self.STAGING_SUFFIX))
+
+    def promote(self, staging: 'ReferenceBundle') -> None:
+        """
+        Replace this bundle with a complete staging bundle.
+
+        The live directory is renamed aside, the staging directory is renamed
+        into its place, and only then is the previous bundle deleted, so the
+        directory holds a complete bundle at every point except between the
+        two renames.
+
+        Args:
+            staging: Bundle written by a training run (its manifest marks it complete)
+
+        Raises:
+            FileNotFoundError: The staging bundle has no manifest
+        """
+        if not staging.exists():
+            raise FileNotFoundError(f"Staging artifact not found: {staging.manifest_path}")
+
+        # Mapeamentos abertos impedem renomear o diretório no Windows
+        self.texts.close()
+        staging.texts.close()
+
+        previous = self.bundle_dir.with_name(self.bundle_dir.name + self.PREVIOUS_SUFFIX)
+        shutil.rmtree(previous, ignore_errors=True)
+        if self.bundle_dir.exists():
+            os.replace(self.bundle_dir, previous)
+        os.replace(staging.bundle_dir, self.bundle_dir)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def index_path(self, backend: str) -> Path:
+        """Caminho do índice persistido de um backend dentro do bundle."""
+        return default_index_path(self.embeddings_path, backend)
+
+    def read_manifest(self) -> Dict[str, Any]:
+        """Lê o manifest.json do bundle."""
+        if not self.exists():
+            raise FileNotFoundError(f"Reference artifact not found: {self.manifest_path}")
+        return json.loads(self.manifest_path.read_text(encoding='utf-8'))
+
+    def load(
+        self,
+        model_name: Optional[str] = None,
+        dimension: Optional[int] = None,
+        verify_checksums: bool = False
+    ) -> ReferenceSet:
+        """
+        Validate the bundle and open it as a memory-mapped ReferenceSet.
+
+        Args:
+            model_name: Embedding model in use (None skips the check)
+            dimension: Embedding dimension in use (None skips the check)
+            verify_checksums: Also hash every file (slow for large sets; sizes are always checked)
+
+        Returns:
+            ReferenceSet: Reference set backed by the bundle files
+
+        Raises:
+            ArtifactMismatchError: Incompatible model/dimension or files not matching the manifest
+        """
+        manifest = self.read_manifest()
+
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise ArtifactMismatchError(
+                f"Formato de artefato nao suportado em {self.bundle_dir}: "
+                f"{manifest.get('format_version')} (esperado {BUNDLE_FORMAT_VERSION})"
+            )
+        if model_name is not None and manifest['embedding_model'] != model_name:
+            raise ArtifactMismatchError(
+                f"Artefato {self.bundle_dir} foi treinado com '{manifest['embedding_model']}', "
+                f"mas o EmbeddingService usa '{model_name}'. Retreine ou ajuste o modelo."
+            )
+        if dimension is not None and manifest['embedding_dimension'] != dimension:
+            raise ArtifactMismatchError(
+                f"Artefato {self.bundle_dir} tem dimensao {manifest['embedding_dimension']}, "
+                f"mas o EmbeddingService gera vetores de dimensao {dimension}."
+            )
+
+        self._check_files(manifest, verify_checksums)
+
+        embeddings = np.load(self.embeddings_path, mmap_mode='r')
+        label_codes = np.load(self.labels_path, mmap_mode='r')
+        expected_shape = (manifest['num_records'], manifest['embedding_dimension'])
+        if embeddings.shape != expected_shape or embeddings.dtype != np.float32:
+            raise ArtifactMismatchError(
+                f"embeddings.npy em {self.bundle_dir} tem shape {embeddings.shape} ({embeddings.dtype}), "
+                f"manifest declara {expected_shape} (float32)"
+            )
+        if len(label_codes) != manifest['num_records']:
+            raise ArtifactMismatchError(
+                f"labels.npy em {self.bundle_dir} tem {len(label_codes)} linhas, "
+                f"manifest declara {manifest['num_records']}"
+            )
+
+        reference_set = ReferenceSet(
+            embeddings,
+            label_codes,
+            np.asarray(manifest['label_vocab'], dtype=object),
+            self.texts
+        )
+        reference_set.text_config = manifest.get('text_builder', {})
+        reference_set.version_tag = manifest.get('training_date', '')
+        return reference_set
+
+    def write(
+        self,
+        reference_set: ReferenceSet,
+        model_name: str,
+        label_column: str,
+        search_backends: Iterable[str] = (),
+        training_info: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Write a complete bundle (training run or migration of a legacy set).
+
+        Args:
+            reference_set: Reference set to persist (embeddings already L2-normalized)
+            model_name: Embedding model that produced the embeddings
+            label_column: Label column the set classifies (DS_ASSUNTO / SUB_ASSUNTO)
+            search_backends: FAISS backends whose index is built and stored in the bundle
+            training_info: Free-form training metadata kept in the manifest
+
+        Returns:
+            dict: Written manifest
+        """
+        self.bundle_dir.mkdir(parents=True, exist_ok=True)
+        self.invalidate()
+
+        if not self._is_bundle_file(reference_set.embeddings):
+            tmp_path = self.bundle_dir / 'embeddings.tmp.npy'
+            np.save(tmp_path, np.asarray(reference_set.embeddings, dtype=np.float32))
+            os.replace(tmp_path, self.embeddings_path)
+
+        self.save_labels(reference_set)
+        self.texts.write(
+            reference_set.texts if isinstance(reference_set.texts, list)
+            else reference_set.get_texts(range(len(reference_set)))
+        )
+        reference_set.texts = self.texts
+        reference_set.pending_texts = []
+
+        search_indexes = {}
+        for backend in search_backends:
+            if backend == 'exact':
+                continue
+            build_neighbor_search(backend, reference_set.embeddings).save(
+                self.index_path(backend), embeddings_fingerprint(reference_set.embeddings)
+            )
+            search_indexes[backend] = self.index_path(backend).name
+
+        now = datetime.now().isoformat()
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'version': 1,
+            'label_column': label_column,
+            'embedding_model': model_name,
+            'embedding_dimension': int(reference_set.embeddings.shape[1]),
+            'text_builder': reference_set.text_config,
+            'num_records': len(reference_set),
+            'label_vocab': [str(label) for label in reference_set.label_vocab],
+            'training_date': now,
+            'updated_at': now,
+            'training': training_info or {},
+            'search_indexes': search_indexes,
+            'history': [],
+        }
+        return self.write_manifest(manifest)
+
+    def save_labels(self, reference_set: ReferenceSet) -> None:
+        """Grava labels.npy de forma atômica."""
+        label_codes = np.array(reference_set.label_codes, dtype=np.int32)
+        reference_set.label_codes = label_codes
+        tmp_path = self.bundle_dir / 'labels.tmp.npy'
+        np.save(tmp_path, label_codes)
+        os.replace(tmp_path, self.labels_path)
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Recalcula tamanhos/checksums dos arquivos e grava o manifest (último passo)."""
+        files = [self.embeddings_path, self.labels_path, self.texts.blob_path, self.texts.offsets_path]
+        files += [self.bundle_dir / name for name in manifest.get('search_indexes', {}).values()]
+
+        manifest['files'] = {
+            path.name: {'bytes': path.stat().st_size, 'sha256': _sha256(path)}
+            for path in files
+        }
+
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+        return manifest
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        """Histórico de atualizações incrementais registrado no manifest."""
+        if not self.exists():
+            return []
+        return self.read_manifest().get('history', [])
+
+    def _check_files(self, manifest: Dict[str, Any], verify_checksums: bool) -> None:
+        for name, info in manifest.get('files', {}).items():
+            path = self.bundle_dir / name
+            if not path.exists():
+                raise ArtifactMismatchError(f"Arquivo ausente no artefato {self.bundle_dir}: {name}")
+            if path.stat().st_size != info['bytes']:
+                raise ArtifactMismatchError(
+                    f"Tamanho de {name} difere do manifest em {self.bundle_dir} (artefato incompleto?)"
+                )
+            if verify_checksums and _sha256(path) != info['sha256']:
+                raise ArtifactMismatchError(f"Checksum de {name} difere do manifest em {self.bundle_dir}")
+
+    def _is_bundle_file(self, embeddings: np.ndarray) -> bool:
+        """True se os embeddings já são um memmap do embeddings.npy do bundle."""
+        filename = getattr(embeddings, 'filename', None)
+        return (
+            filename is not None
+            and self.embeddings_path.exists()
+            and Path(filename).resolve() == self.embeddings_path.resolve()
+        )
+
+
+def _sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_reference_set(
+    artifact_dir: Union[str, Path],
+    label_column: str,
+    model_name: Optional[str] = None,
+    dimension: Optional[int] = None,
+    verify_checksums: bool = False,
+    legacy_data_path: Optional[Union[str, Path]] = None,
+    legacy_embeddings_path: Optional[Union[str, Path]] = None
+) -> ReferenceSet:
+    """
+    Load a classifier's reference set from its bundle, falling back to the
+    legacy pickle + .npy files when no bundle has been written yet.
+
+    Args:
+        artifact_dir: Reference bundle directory
+        label_column: Label column (DS_ASSUNTO / SUB_ASSUNTO)
+        model_name: Embedding model in use (checked against the manifest)
+        dimension: Embedding dimension in use (checked against the artifact)
+        verify_checksums: Hash every bundle file before loading
+        legacy_data_path: Legacy reference DataFrame pickle
+        legacy_embeddings_path: Legacy reference embeddings .npy
+
+    Returns:
+        ReferenceSet: Loaded reference set
+
+    Raises:
+        ArtifactMismatchError: Artifact incompatible with the embedding model
+        FileNotFoundError: Neither a bundle nor legacy files exist
+    """
+    bundle = ReferenceBundle(artifact_dir)
+    if bundle.exists():
+        return bundle.load(model_name=model_name, dimension=dimension, verify_checksums=verify_checksums)
+
+    if not (legacy_data_path and legacy_embeddings_path
+            and Path(legacy_data_path).exists() and Path(legacy_embeddings_path).exists()):
+        raise FileNotFoundError(f"Reference artifact not found: {bundle.manifest_path}")
+
+    try:
+        print(f"Artefato {artifact_dir} nao encontrado; carregando arquivos legados {legacy_data_path}. "
+              "Migre com scripts/training/migrate_reference_artifacts.py")
+    except (OSError, IOError):
+        pass
+
+    reference_set = ReferenceSet.from_legacy(legacy_data_path, legacy_embeddings_path, label_column)
+    reference_set.version_tag = f"legacy:{Path(legacy_embeddings_path).stat().st_mtime_ns}"
+    if dimension is not None and reference_set.embeddings.shape[1] != dimension:
+        raise ArtifactMismatchError(
+            f"Embeddings legados {legacy_embeddings_path} tem dimensao {reference_set.embeddings.shape[1]}, "
+            f"mas o EmbeddingService gera vetores de dimensao {dimension}."
+        )
+    return reference_set
@@ -0,0 +1,202 @@
+"""
+Columnar, memory-mapped K-NN reference set (embeddings, label codes, texts).
+"""
+import hashlib
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Union
+
+import numpy as np
+import pandas as pd
+
+from .TextColumnFile import TextColumnFile
+
+
+class ReferenceSet:
+    """
+    Reference set of a K-NN classifier held column by column: L2-normalized
+    embeddings, int32 label codes plus a label vocabulary, and the reference
+    texts (decoded lazily from a TextColumnFile, only for top_similares).
+
+    Persisted as a ReferenceBundle; sets trained before the bundle format
+    (a DataFrame pickle + .npy) are read through from_legacy().
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        label_codes: np.ndarray,
+        label_vocab: np.ndarray,
+        texts: Union[TextColumnFile, List[str]]
+    ):
+        """
+        Args:
+            embeddings: Matrix (n, dimension) of L2-normalized reference embeddings
+            label_codes: Label code of each row (index into label_vocab)
+            label_vocab: Label of each code
+            texts: Reference texts (lazy column file or in-memory list)
+        """
+        self.embeddings = embeddings
+        self.label_codes = label_codes
+        self.label_vocab = label_vocab
+        self.texts = texts
+        self.pending_texts: List[str] = []
+        # Configuracao do TextBuilderService usada para montar os textos (vazia = modo caracteres)
+        self.text_config: Dict[str, Any] = {}
+        # Identifica o treino que gerou o conjunto (data do treino do bundle ou mtime dos arquivos legados)
+        self.version_tag: str = ''
+        self._row_keys: Optional[Set[int]] = None  # Hash de (rótulo, texto) de cada linha, montado sob demanda
+
+    def __len__(self) -> int:
+        return len(self.label_codes)
+
+    @classmethod
+    def from_legacy(
+        cls,
+        reference_data_path: Union[str, Path],
+        reference_embeddings_path: Union[str, Path],
+        label_column: str
+    ) -> 'ReferenceSet':
+        """
+        Load a set saved by older training runs (DataFrame pickle + embeddings .npy).
+
+        Args:
+            reference_data_path: Reference DataFrame pickle (label column + texto_referencia)
+            reference_embeddings_path: Reference embeddings .npy
+            label_column: Label column of the pickle (DS_ASSUNTO / SUB_ASSUNTO)
+
+        Returns:
+            ReferenceSet: In-memory reference set
+        """
+        reference_data_path = Path(reference_data_path)
+        if not reference_data_path.exists():
+            raise FileNotFoundError(f"Reference data not found: {reference_data_path}")
+
+        embeddings = load_embeddings(reference_embeddings_path)
+        with open(reference_data_path, 'rb') as f:
+            df = pickle.load(f)
+
+        return cls.from_labels(embeddings, df[label_column], df['texto_referencia'].tolist())
+
+    @classmethod
+    def from_labels(cls, embeddings: np.ndarray, labels: Sequence, texts: List[str]) -> 'ReferenceSet':
+        """Monta o conjunto a partir de rótulos em texto."""
+        codes, vocab = pd.factorize(pd.Series(labels, dtype=object))
+        return cls(embeddings, codes.astype(np.int32), np.asarray(vocab, dtype=object), list(texts))
+
+    def get_texts(self, indices: Sequence[int]) -> List[str]:
+        """Textos de referência das linhas indicadas."""
+        if isinstance(self.texts, TextColumnFile):
+            return self.texts.get(indices)
+        return [self.texts[i] for i in indices]
+
+    def new_rows_mask(self, labels: Sequence, texts: Sequence[str], chunk_rows: int = 50_000) -> np.ndarray:
+        """
+        Flag the (label, text) pairs not yet in the set, so an update run twice
+        with the same file adds nothing the second time. A pair repeated in the
+        input is flagged only on its first occurrence.
+
+        The hashes of the existing rows are computed on the first call
+        (texts decoded chunk_rows at a time) and kept up to date by append().
+
+        Args:
+            labels: Label of each candidate row
+            texts: Reference text of each candidate row
+            chunk_rows: Texts decoded per step while hashing the existing rows
+
+        Returns:
+            numpy.ndarray: Boolean mask, True for rows to append
+        """
+        existing = self._existing_row_keys(chunk_rows)
+        seen = set()
+        mask = np.zeros(len(texts), dtype=bool)
+        for i, key in enumerate(map(_row_key, labels, texts)):
+            if key not in existing and key not in seen:
+                seen.add(key)
+                mask[i] = True
+        return mask
+
+    def _existing_row_keys(self, chunk_rows: int) -> Set[int]:
+        if self._row_keys is None:
+            keys = set()
+            labels = self.label_vocab[np.asarray(self.label_codes)]
+            total = len(self)
+            for start in range(0, total, chunk_rows):
+                end = min(start + chunk_rows, total)
+                keys.update(map(_row_key, labels[start:end], self._texts_between(start, end)))
+            self._row_keys = keys
+        return self._row_keys
+
+    def _texts_between(self, start: int, end: int) -> List[str]:
+        if not isinstance(self.texts, TextColumnFile):
+            return self.texts[start:end]
+        # Linhas ainda não gravadas (pending_texts) vêm depois das do arquivo
+        stored = len(self.texts) if self.texts.exists() else 0
+        texts = self.texts.get(range(start, min(end, stored))) if start < stored else []
+        return texts + self.pending_texts[max(start - stored, 0):max(end - stored, 0)]
+
+    def append(self, labels: Sequence, texts: List[str], embeddings: np.ndarray) -> None:
+        """
+        Append rows in memory (persisting is up to ReferenceSetUpdater).
+
+        Args:
+            labels: Label of each new row
+            texts: Reference text of each new row
+            embeddings: Normalized embeddings of the new rows
+        """
+        index = {label: code for code, label in enumerate(self.label_vocab)}
+        vocab = list(self.label_vocab)
+        new_codes = np.empty(len(labels), dtype=np.int32)
+        for i, label in enumerate(labels):
+            if label not in index:
+                index[label] = len(vocab)
+                vocab.append(label)
+            new_codes[i] = index[label]
+
+        self.label_codes = np.concatenate([np.asarray(self.label_codes, dtype=np.int32), new_codes])
+        self.label_vocab = np.asarray(vocab, dtype=object)
+        self.embeddings = np.concatenate([self.embeddings, embeddings.astype(np.float32, copy=False)])
+
+        if isinstance(self.texts, TextColumnFile):
+            self.pending_texts.extend(texts)
+        else:
+            self.texts = self.texts + list(texts)
+
+        if self._row_keys is not None:
+            self._row_keys.update(map(_row_key, labels, texts))
+
+
+def _row_key(label: Any, text: str) -> int:
+    """Hash de 64 bits do par (rótulo, texto)."""
+    digest = hashlib.blake2b(f"{label}\0{text}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def load_embeddings(path: Union[str, Path], check_rows: int = 1000) -> np.ndarray:
+    """
+    Memory-map reference embeddings, copying them only when they still need
+    to be cast to float32 or L2-normalized (older training runs).
+
+    Args:
+        path: Embeddings .npy file
+        check_rows: Rows sampled to decide whether the file is already normalized
+
+    Returns:
+        numpy.ndarray: Read-only memmap, or an in-memory normalized copy
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Reference embeddings not found: {path}")
+
+    embeddings = np.load(path, mmap_mode='r')
+    if embeddings.dtype != np.float32:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+    # Garantir vetores unitarios: similaridade de cosseno vira produto escalar
+    step = max(1, len(embeddings) // check_rows)
+    sample_norms = np.linalg.norm(embeddings[::step], axis=1)
+    if not np.allclose(sample_norms, 1.0, atol=1e-3):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+
+    return embeddings
@@ -0,0 +1,122 @@
+"""
+Incremental, versioned updates of a K-NN reference bundle on disk.
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from ...core.domain.interfaces.INeighborSearch import INeighborSearch
+from .NeighborSearch import FaissNeighborSearch, embeddings_fingerprint, index_fingerprint_path
+from .ReferenceBundle import ReferenceBundle
+from .ReferenceSet import ReferenceSet
+
+
+class ReferenceSetUpdater:
+    """
+    Appends newly labeled rows to a ReferenceBundle (embeddings, labels,
+    texts and the persisted FAISS index) without re-encoding the existing set.
+
+    Every append bumps the bundle version and adds an entry to the manifest
+    history. A set still loaded from legacy pickle files is written as a new
+    bundle on its first append.
+    """
+
+    def __init__(
+        self,
+        artifact_dir: Union[str, Path],
+        label_column: str,
+        search_backend: str = 'exact',
+        copy_chunk_rows: int = 100_000
+    ):
+        """
+        Args:
+            artifact_dir: Reference bundle directory (e.g. data/ml/assunto)
+            label_column: Label column of the reference set (DS_ASSUNTO / SUB_ASSUNTO)
+            search_backend: Backend whose persisted index is kept in sync ('exact' keeps none)
+            copy_chunk_rows: Rows copied per step when rewriting the embeddings file
+        """
+        self.bundle = ReferenceBundle(artifact_dir)
+        self.label_column = label_column
+        self.search_backend = search_backend
+        self.copy_chunk_rows = copy_chunk_rows
+
+    def append(
+        self,
+        reference_set: ReferenceSet,
+        new_embeddings: np.ndarray,
+        neighbor_search: Optional[INeighborSearch] = None,
+        model_name: str = ''
+    ) -> Dict[str, Any]:
+        """
+        Persist an append of new reference rows.
+
+        Args:
+            reference_set: Reference set with the new rows already appended in memory
+            new_embeddings: Normalized embeddings of the new rows
+            neighbor_search: Search backend already updated in memory (saved if FAISS)
+            model_name: Embedding model used to encode the new rows
+
+        Returns:
+            dict: Version entry recorded in the manifest history
+        """
+        existed = self.bundle.exists()
+        if existed:
+            manifest = self.bundle.read_manifest()
+            self.bundle.invalidate()
+            self._append_embeddings(new_embeddings)
+            self.bundle.save_labels(reference_set)
+            if reference_set.pending_texts:
+                reference_set.texts.append(reference_set.pending_texts)
+                reference_set.pending_texts = []
+        else:
+            manifest = self.bundle.write(reference_set, model_name, self.label_column)
+
+        if isinstance(neighbor_search, FaissNeighborSearch):
+            index_path = self.bundle.index_path(self.search_backend)
+            tmp_path = index_path.with_name(index_path.name + '.tmp')
+            neighbor_search.save(tmp_path, embeddings_fingerprint(reference_set.embeddings))
+            os.replace(index_fingerprint_path(tmp_path), index_fingerprint_path(index_path))
+            os.replace(tmp_path, index_path)
+            manifest.setdefault('search_indexes', {})[self.search_backend] = index_path.name
+
+        entry = {
+            'version': manifest['version'] + 1 if existed else manifest['version'],
+            'updated_at': datetime.now().isoformat(),
+            'added_records': len(new_embeddings),
+            'total_records': len(reference_set),
+            'embedding_model': model_name,
+        }
+        manifest.update({
+            'version': entry['version'],
+            'updated_at': entry['updated_at'],
+            'num_records': len(reference_set),
+            'label_vocab': [str(label) for label in reference_set.label_vocab],
+        })
+        manifest['history'].append(entry)
+        self.bundle.write_manifest(manifest)
+
+        return entry
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        """Retorna o histórico de versões do conjunto de referência."""
+        return self.bundle.get_history()
+
+    def _append_embeddings(self, new_embeddings: np.ndarray) -> None:
+        """Rewrite embeddings.npy as old rows + new rows, copying in chunks via memmap."""
+        embeddings_path = self.bundle.embeddings_path
+        old = np.load(embeddings_path, mmap_mode='r')
+        total = old.shape[0] + new_embeddings.shape[0]
+
+        tmp_path = embeddings_path.with_name(f"{embeddings_path.stem}.tmp.npy")
+        merged = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(total, old.shape[1]))
+        for start in range(0, old.shape[0], self.copy_chunk_rows):
+            end = min(start + self.copy_chunk_rows, old.shape[0])
+            merged[start:end] = old[start:end]
+        merged[old.shape[0]:] = new_embeddings
+        merged.flush()
+
+        del merged, old
+        os.replace(tmp_path, embeddings_path)
@@ -0,0 +1,147 @@
+"""
+Chunked, resumable encoding of large text sets into a memory-mapped .npy file.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from ...core.domain.interfaces.IEmbeddingService import IEmbeddingService
+from .ModelRegistry import ModelRegistry
+
+
+class StreamingEmbeddingWriter:
+    """
+    Encodes texts chunk by chunk and writes each chunk straight into a
+    memory-mapped .npy file, so embeddings never have to fit in RAM at once.
+
+    Progress is checkpointed after every chunk in a JSON file next to the
+    output; an interrupted run with the same texts, model, inference backend
+    and text builder configuration resumes from the last completed chunk. The final file only appears (atomic rename) once
+    every text has been encoded.
+    """
+
+    def __init__(
+        self,
+        embedding_service: IEmbeddingService,
+        output_path: Union[str, Path],
+        chunk_size: int = 2048,
+        text_config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            embedding_service: Service used to encode each chunk
+            output_path: Final .npy path (e.g. data/ml/assunto_embeddings.npy)
+            chunk_size: Number of texts encoded and flushed per step
+            text_config: TextBuilderService.get_config() of the builder that produced the texts
+        """
+        self.embedding_service = embedding_service
+        self.output_path = Path(output_path)
+        self.chunk_size = chunk_size
+        self.text_config = text_config or {}
+        self.partial_path = self.output_path.with_name(f"{self.output_path.stem}.partial.npy")
+        self.checkpoint_path = self.output_path.with_name(f"{self.output_path.stem}.checkpoint.json")
+        self.throughput = 0.0
+
+    @staticmethod
+    def fingerprint(
+        texts: Sequence[str],
+        model_key: str = '',
+        text_config: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Hash SHA-1 do modelo, da configuração de texto e dos textos (identifica a execução para retomada)."""
+        digest = hashlib.sha1()
+        digest.update(json.dumps([model_key, text_config or {}], sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        progress_callback: Optional[Callable[[int, int, float], None]] = None
+    ) -> np.ndarray:
+        """
+        Encode all texts into output_path, resuming a previous run if possible.
+
+        Args:
+            texts: Texts to encode (order defines the row of each embedding)
+            progress_callback: Called after each chunk with (done, total, texts_per_second)
+
+        Returns:
+            numpy.ndarray: Read-only memory map of the final embeddings
+        """
+        total = len(texts)
+        dimension = self.embedding_service.get_embedding_dimension()
+        # Vetores de backends diferentes nao sao identicos: o backend entra na chave, como no cache
+        model_key = ModelRegistry.registry_key(
+            getattr(self.embedding_service, 'model_name', ''),
+            getattr(self.embedding_service, 'backend', 'torch')
+        )
+        fingerprint = self.fingerprint(texts, model_key, self.text_config)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        done = self._resume_position(total, dimension, model_key, fingerprint)
+        if done == 0:
+            embeddings = np.lib.format.open_memmap(
+                self.partial_path, mode='w+', dtype=np.float32, shape=(total, dimension)
+            )
+        else:
+            embeddings = np.lib.format.open_memmap(self.partial_path, mode='r+')
+
+        start_time = time.perf_counter()
+        start_done = done
+
+        while done < total:
+            end = min(done + self.chunk_size, total)
+            embeddings[done:end] = self.embedding_service.generate_embeddings(list(texts[done:end]))
+            embeddings.flush()
+            done = end
+
+            self._write_checkpoint({
+                'done': done,
+                'total': total,
+                'dimension': dimension,
+                'model_key': model_key,
+                'fingerprint': fingerprint,
+            })
+
+            elapsed = time.perf_counter() - start_time
+            self.throughput = (done - start_done) / elapsed if elapsed > 0 else 0.0
+            if progress_callback:
+                progress_callback(done, total, self.throughput)
+
+        del embeddings
+        os.replace(self.partial_path, self.output_path)
+        self.checkpoint_path.unlink(missing_ok=True)
+
+        return np.load(self.output_path, mmap_mode='r')
+
+    def _resume_position(self, total: int, dimension: int, model_key: str, fingerprint: str) -> int:
+        """Return how many rows a compatible previous run already encoded."""
+        if not (self.checkpoint_path.exists() and self.partial_path.exists()):
+            return 0
+        try:
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return 0
+
+        compatible = (
+            checkpoint.get('total') == total
+            and checkpoint.get('dimension') == dimension
+            and checkpoint.get('model_key') == model_key
+            and checkpoint.get('fingerprint') == fingerprint
+        )
+        return int(checkpoint.get('done', 0)) if compatible else 0
+
+    def _write_checkpoint(self, data: dict) -> None:
+        """Escreve o checkpoint de forma atômica."""
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.checkpoint_path)
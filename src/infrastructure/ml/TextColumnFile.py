@@ -0,0 +1,100 @@
+"""
+Append-friendly, memory-mapped storage for a column of strings.
+"""
+from pathlib import Path
+from typing import Iterable, List, Sequence, Union
+
+import numpy as np
+
+
+class TextColumnFile:
+    """
+    Stores strings as one UTF-8 blob plus an int64 offsets array
+    (<prefix>.texts.bin / <prefix>.texts_offsets.npy).
+
+    Nothing is read at open time: both files are memory-mapped and only the
+    requested rows are decoded, so reference texts cost no resident memory
+    until top_similares actually needs them.
+    """
+
+    def __init__(self, prefix: Union[str, Path]):
+        """
+        Args:
+            prefix: Path prefix of the column files (e.g. data/ml/assunto_reference)
+        """
+        prefix = Path(prefix)
+        self.blob_path = prefix.with_name(f"{prefix.name}.texts.bin")
+        self.offsets_path = prefix.with_name(f"{prefix.name}.texts_offsets.npy")
+        self._blob = None
+        self._offsets = None
+
+    def exists(self) -> bool:
+        return self.blob_path.exists() and self.offsets_path.exists()
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._offsets) - 1
+
+    def get(self, indices: Iterable[int]) -> List[str]:
+        """
+        Decode the strings at the given row positions.
+
+        Args:
+            indices: Row positions
+
+        Returns:
+            list: Decoded strings in the requested order
+        """
+        self._open()
+        texts = []
+        for i in indices:
+            start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+            texts.append(bytes(self._blob[start:end]).decode('utf-8') if end > start else '')
+        return texts
+
+    def write(self, texts: Sequence[str]) -> None:
+        """Reescreve a coluna inteira."""
+        self.close()
+        self.blob_path.parent.mkdir(parents=True, exist_ok=True)
+
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        with open(self.blob_path, 'wb') as f:
+            for i, text in enumerate(texts):
+                encoded = str(text).encode('utf-8')
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(self.offsets_path, offsets)
+
+    def append(self, texts: Sequence[str]) -> None:
+        """Acrescenta textos ao final sem reescrever o blob existente."""
+        if not self.exists():
+            self.write(texts)
+            return
+
+        old_offsets = np.load(self.offsets_path)
+        self.close()
+
+        offsets = np.empty(len(old_offsets) + len(texts), dtype=np.int64)
+        offsets[:len(old_offsets)] = old_offsets
+        with open(self.blob_path, 'ab') as f:
+            f.truncate(int(old_offsets[-1]))
+            position = int(old_offsets[-1])
+            for i, text in enumerate(texts, start=len(old_offsets)):
+                encoded = str(text).encode('utf-8')
+                f.write(encoded)
+                position += len(encoded)
+                offsets[i] = position
+        np.save(self.offsets_path, offsets)
+
+    def close(self) -> None:
+        """Libera os mapeamentos (necessário antes de reescrever no Windows)."""
+        self._blob = None
+        self._offsets = None
+
+    def _open(self) -> None:
+        if self._offsets is None:
+            self._offsets = np.load(self.offsets_path, mmap_mode='r')
+            if self.blob_path.stat().st_size > 0:
+                self._blob = np.memmap(self.blob_path, dtype=np.uint8, mode='r')
+            else:
+                self._blob = np.zeros(0, dtype=np.uint8)
@@ -0,0 +1,81 @@
+"""
+Length-bucketed batching of texts by a padded-token budget.
+"""
+from typing import Any, List, Sequence
+
+import numpy as np
+
+
+class TokenBudgetBatcher:
+    """
+    Plans encoder batches for texts of very different lengths (complaint
+    texts range from a few words to the 2,000-char cap of TextBuilderService).
+
+    Texts are ordered by token length and cut into batches whose padded size
+    (rows x longest row) stays within token_budget, so short texts go in
+    large batches and long texts in small ones instead of every batch being
+    padded to its longest member. Callers scatter the results back with the
+    returned positions, restoring the original order.
+    """
+
+    def __init__(self, token_budget: int = 8192, max_batch_size: int = 256, tokenize_chunk: int = 4096):
+        """
+        Args:
+            token_budget: Maximum padded tokens (rows x longest row) per batch
+            max_batch_size: Maximum texts per batch regardless of the budget
+            tokenize_chunk: Texts tokenized per tokenizer call when measuring lengths
+        """
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.tokenize_chunk = tokenize_chunk
+
+    def token_lengths(self, texts: Sequence[str], tokenizer: Any, max_seq_length: int) -> np.ndarray:
+        """
+        Token count of each text after truncation (special tokens included).
+
+        Args:
+            texts: Texts to measure
+            tokenizer: Hugging Face tokenizer of the model (None = estimate from characters)
+            max_seq_length: Truncation length of the model
+
+        Returns:
+            numpy.ndarray: int64 length per text
+        """
+        if tokenizer is None:
+            # Sem tokenizer: ~4 caracteres por token em portugues
+            return np.minimum(np.fromiter((len(t) // 4 + 2 for t in texts), dtype=np.int64, count=len(texts)),
+                              max_seq_length)
+
+        lengths = np.empty(len(texts), dtype=np.int64)
+        for start in range(0, len(texts), self.tokenize_chunk):
+            chunk = list(texts[start:start + self.tokenize_chunk])
+            encoded = tokenizer(
+                chunk,
+                truncation=True,
+                max_length=max_seq_length,
+                return_attention_mask=False,
+                return_token_type_ids=False
+            )['input_ids']
+            lengths[start:start + len(chunk)] = [len(ids) for ids in encoded]
+        return lengths
+
+    def plan(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """
+        Split text positions into batches within the token budget.
+
+        Args:
+            lengths: Token length of each text
+
+        Returns:
+            list: One array of original positions per batch (longest texts first)
+        """
+        order = np.argsort(-lengths, kind='stable')
+        batches = []
+        start = 0
+        while start < len(order):
+            # Ordem decrescente: o primeiro texto do batch define o padding
+            longest = max(int(lengths[order[start]]), 1)
+            size = max(1, min(self.max_batch_size, self.token_budget // longest))
+            batches.append(order[start:start + size])
+            start += size
+        return batches
@@ -0,0 +1,166 @@
+"""
+Streaming CSV reader yielding fixed-size chunks with a stable schema.
+"""
+import codecs
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.csv
+except ImportError:  # pyarrow e opcional: sem ele os blocos sao lidos pelo pandas
+    pyarrow = None
+
+from .CsvDialectSniffer import CsvDialect, CsvDialectSniffer
+
+
+class ChunkedCsvReader:
+    """
+    Reads a CSV too large for memory as a sequence of DataFrames of
+    chunk_rows rows each (the last one may be shorter).
+
+    Every column is read as text (pandas' Arrow-backed StringDtype) unless
+    listed in column_types, so the dtypes are identical in every chunk: a
+    column that looks numeric in the first rows and holds text later cannot
+    change type mid-file or fail the read. Typed columns (dates, ...) are
+    converted by the caller, chunk by chunk.
+
+    The dialect is sniffed once from the first bytes of the file
+    (CsvDialectSniffer). When the sample looks like UTF-8, the whole file is
+    checked before the first chunk is read (one sequential pass, no parsing)
+    and read as latin1 if invalid bytes show up further on, so the stream
+    never fails halfway through a file. Chunks come from pyarrow's streaming reader, which
+    holds one block (block_size bytes) plus the chunk being assembled;
+    without pyarrow, pd.read_csv(chunksize=...) is used.
+    """
+
+    def __init__(
+        self,
+        chunk_rows: int = 100_000,
+        column_types: Optional[Dict[str, str]] = None,
+        sniffer: Optional[CsvDialectSniffer] = None,
+        block_size: int = 16 * 1024 * 1024
+    ):
+        """
+        Args:
+            chunk_rows: Rows per yielded DataFrame
+            column_types: Column name -> pandas dtype for columns not read as text
+            sniffer: Dialect detector (default CsvDialectSniffer())
+            block_size: Bytes per pyarrow read block
+        """
+        if chunk_rows < 1:
+            raise ValueError(f"chunk_rows deve ser positivo: {chunk_rows}")
+        self.chunk_rows = chunk_rows
+        self.column_types = column_types or {}
+        self.sniffer = sniffer or CsvDialectSniffer()
+        self.block_size = block_size
+        self.dialect: Optional[CsvDialect] = None  # Dialeto do último arquivo aberto
+
+    def iter_chunks(self, path: Union[str, Path], encoding: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Stream a CSV file.
+
+        Args:
+            path: CSV file
+            encoding: Encoding used instead of the sniffed one (no UTF-8 check is
+                made; None = sniffed)
+
+        Yields:
+            pandas.DataFrame: Chunks of chunk_rows rows with a RangeIndex continuing across chunks
+        """
+        with open(path, 'rb') as f:
+            self.dialect = self.sniffer.sniff(f)
+        if encoding:
+            self.dialect.encoding = encoding
+        elif self.dialect.encoding == 'utf-8' and not self._is_utf8(path):
+            # Amostra era UTF-8 válido mas o restante do arquivo não
+            self.dialect.encoding = 'latin1'
+
+        if pyarrow is not None:
+            chunks = self._iter_arrow(path, self.dialect)
+        else:
+            chunks = self._iter_pandas(path, self.dialect)
+
+        start = 0
+        for chunk in chunks:
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield chunk
+
+    def _iter_arrow(self, path: Union[str, Path], dialect: CsvDialect) -> Iterator[pd.DataFrame]:
+        encoding = 'utf8' if dialect.encoding in ('utf-8', 'utf-8-sig') else dialect.encoding
+        read_options = pyarrow.csv.ReadOptions(encoding=encoding, block_size=self.block_size)
+        parse_options = pyarrow.csv.ParseOptions(
+            delimiter=dialect.delimiter,
+            quote_char=dialect.quotechar,
+            newlines_in_values=True
+        )
+
+        # Tudo como texto no Arrow; column_types é aplicado depois, em cada bloco
+        column_types = {col: pyarrow.string() for col in self._header(path, read_options, parse_options)}
+        reader = pyarrow.csv.open_csv(
+            str(path),
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=column_types,
+                strings_can_be_null=True
+            )
+        )
+
+        pending: List['pyarrow.RecordBatch'] = []
+        pending_rows = 0
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= self.chunk_rows:
+                table = pyarrow.Table.from_batches(pending)
+                yield self._to_pandas(table.slice(0, self.chunk_rows))
+                rest = table.slice(self.chunk_rows)
+                pending = rest.to_batches()
+                pending_rows = rest.num_rows
+        if pending_rows:
+            yield self._to_pandas(pyarrow.Table.from_batches(pending))
+
+    def _iter_pandas(self, path: Union[str, Path], dialect: CsvDialect) -> Iterator[pd.DataFrame]:
+        with pd.read_csv(
+            path,
+            sep=dialect.delimiter,
+            quotechar=dialect.quotechar,
+            encoding=dialect.encoding,
+            dtype='string',
+            chunksize=self.chunk_rows
+        ) as reader:
+            for chunk in reader:
+                yield self._apply_column_types(chunk)
+
+    def _is_utf8(self, path: Union[str, Path]) -> bool:
+        """Confere o arquivo inteiro, bloco a bloco, sem montar o texto."""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(self.block_size), b''):
+                    decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return False
+        return True
+
+    @staticmethod
+    def _header(path, read_options, parse_options) -> List[str]:
+        """Nomes das colunas lidos do primeiro bloco."""
+        reader = pyarrow.csv.open_csv(str(path), read_options=read_options, parse_options=parse_options)
+        try:
+            return reader.schema.names
+        finally:
+            reader.close()
+
+    def _to_pandas(self, table: 'pyarrow.Table') -> pd.DataFrame:
+        df = table.to_pandas(types_mapper=lambda t: pd.StringDtype('pyarrow') if t == pyarrow.string() else None)
+        return self._apply_column_types(df)
+
+    def _apply_column_types(self, df: pd.DataFrame) -> pd.DataFrame:
+        types = {col: dtype for col, dtype in self.column_types.items() if col in df.columns}
+        return df.astype(types) if types else df
@@ -0,0 +1,167 @@
+"""
+Encoding and delimiter detection from the first bytes of a CSV file.
+"""
+import codecs
+import csv
+import io
+from collections import Counter
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Tuple
+
+
+# Ordem de preferência em caso de empate (';' é o separador das exportações do SAC)
+DELIMITERS = (';', ',', '\t', '|')
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+@dataclass
+class CsvDialect:
+    """
+    Dialeto detectado de um arquivo CSV.
+    """
+    encoding: str
+    delimiter: str
+    quotechar: str = '"'
+    bom: bool = False
+    columns: int = 1
+    confidence: float = 0.0  # Fração das linhas da amostra com o número de colunas mais comum
+
+    def describe(self) -> str:
+        """Descrição curta (ex.: "latin1, ';', 22 colunas")."""
+        delimiter = {'\t': 'TAB'}.get(self.delimiter, f"'{self.delimiter}'")
+        return f"{self.encoding}, {delimiter}, {self.columns} colunas"
+
+
+class CsvDialectSniffer:
+    """
+    Detects the encoding and delimiter of a CSV by inspecting only its first
+    sample_size bytes, so the file itself is parsed exactly once.
+
+    Encoding: a byte-order mark wins; otherwise the sample is decoded as
+    UTF-8 (a multi-byte character cut at the end of the sample is allowed),
+    then cp1252 and finally latin1, which accepts any byte.
+
+    Delimiter: the sample is split into records with csv.reader (quoted
+    fields may contain separators and line breaks) for every candidate
+    delimiter; the candidate whose most common field count is greater than
+    one and shared by the largest fraction of records wins, ties going to
+    the candidate with more columns and then to DELIMITERS order.
+    """
+
+    def __init__(self, sample_size: int = 64 * 1024, delimiters: Tuple[str, ...] = DELIMITERS):
+        """
+        Args:
+            sample_size: Bytes read from the start of the file
+            delimiters: Candidate delimiters, in order of preference
+        """
+        self.sample_size = sample_size
+        self.delimiters = delimiters
+
+    def sniff(self, file: BinaryIO) -> CsvDialect:
+        """
+        Detect the dialect of a binary file, leaving it at position 0.
+
+        Args:
+            file: CSV opened in binary mode (or Streamlit UploadedFile)
+
+        Returns:
+            CsvDialect: Detected encoding and delimiter
+        """
+        file.seek(0)
+        sample = file.read(self.sample_size)
+        truncated = len(sample) == self.sample_size and bool(file.read(1))
+        file.seek(0)
+        return self.sniff_bytes(sample, truncated)
+
+    def sniff_bytes(self, sample: bytes, truncated: bool = False) -> CsvDialect:
+        """
+        Detect the dialect from the first bytes of a file.
+
+        Args:
+            sample: First bytes of the file
+            truncated: Whether the file continues after the sample
+
+        Returns:
+            CsvDialect: Detected encoding and delimiter
+        """
+        encoding, bom = self.detect_encoding(sample, truncated)
+        text = sample.decode(encoding, errors='ignore')
+        delimiter, columns, confidence = self.detect_delimiter(text, truncated)
+        return CsvDialect(
+            encoding=encoding,
+            delimiter=delimiter,
+            bom=bom,
+            columns=columns,
+            confidence=confidence
+        )
+
+    @staticmethod
+    def detect_encoding(sample: bytes, truncated: bool = False) -> Tuple[str, bool]:
+        """
+        Detect the encoding of a sample.
+
+        Args:
+            sample: First bytes of the file
+            truncated: Whether the file continues after the sample
+
+        Returns:
+            tuple: (encoding, whether the file starts with a BOM)
+        """
+        for bom, encoding in _BOMS:
+            if sample.startswith(bom):
+                return encoding, True
+
+        try:
+            sample.decode('utf-8')
+            return 'utf-8', False
+        except UnicodeDecodeError as e:
+            # Caractere multibyte cortado no fim da amostra continua sendo UTF-8
+            if truncated and e.reason == 'unexpected end of data':
+                return 'utf-8', False
+
+        try:
+            sample.decode('cp1252')
+            return 'cp1252', False
+        except UnicodeDecodeError:
+            return 'latin1', False
+
+    def detect_delimiter(self, text: str, truncated: bool = False) -> Tuple[str, int, float]:
+        """
+        Score candidate delimiters on decoded sample text.
+
+        Args:
+            text: Decoded sample
+            truncated: Whether the file continues after the sample (last record is dropped)
+
+        Returns:
+            tuple: (delimiter, modal number of columns, fraction of records with it)
+        """
+        best: Optional[Tuple[Tuple[bool, float, int, int], str, int, float]] = None
+        for rank, delimiter in enumerate(self.delimiters):
+            counts = self._field_counts(text, delimiter, truncated)
+            if not counts:
+                continue
+            columns, frequency = Counter(counts).most_common(1)[0]
+            confidence = frequency / len(counts)
+            score = (columns > 1, confidence, columns, -rank)
+            if best is None or score > best[0]:
+                best = (score, delimiter, columns, confidence)
+
+        if best is None or best[2] <= 1:
+            return ',', 1, 0.0  # Uma coluna só: mesmo padrão do pandas
+        return best[1], best[2], best[3]
+
+    @staticmethod
+    def _field_counts(text: str, delimiter: str, truncated: bool) -> List[int]:
+        try:
+            counts = [len(row) for row in csv.reader(io.StringIO(text), delimiter=delimiter) if row]
+        except csv.Error:
+            return []
+        if truncated and len(counts) > 1:
+            counts.pop()  # Último registro da amostra pode estar incompleto
+        return counts
@@ -1,40 +1,98 @@
 import pandas as pd
-from typing import BinaryIO, Union
+from typing import BinaryIO, Optional, Union
 from ...core.domain.interfaces.IExcelReader import IExcelReader
-import io
+from .CsvDialectSniffer import CsvDialect, CsvDialectSniffer
+from .FastTableReader import FastTableReader
 
 
 class ExcelReaderService(IExcelReader):
-    """Implementação do leitor de Excel e CSV"""
+    """
+    Implementação do leitor de Excel e CSV
+
+    engine='fast' lê CSV com pyarrow e xlsx com calamine (DataFrames com
+    colunas Arrow); se o pacote não estiver instalado ou a leitura falhar,
+    o arquivo é lido pelo pandas (engine='pandas'), como antes.
+    """
+
+    ENGINES = ('fast', 'pandas')
+
+    def __init__(
+        self,
+        sniffer: Optional[CsvDialectSniffer] = None,
+        engine: str = 'fast',
+        fast_reader: Optional[FastTableReader] = None
+    ):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Engine invalida: {engine} (opcoes: {self.ENGINES})")
+        self.sniffer = sniffer or CsvDialectSniffer()
+        self.engine = engine
+        self.fast_reader = fast_reader or FastTableReader()
+        self.last_dialect: Optional[CsvDialect] = None  # Dialeto do último CSV lido
+        self.last_engine: Optional[str] = None  # 'pyarrow', 'calamine' ou 'pandas'
 
     def read_excel(self, file: Union[BinaryIO, str]) -> pd.DataFrame:
         """Lê arquivo Excel ou CSV e retorna DataFrame"""
         try:
             file_name = getattr(file, 'name', '')
+            self.last_dialect = None
+            self.last_engine = None
 
             if file_name.lower().endswith('.csv'):
                 return self._read_csv(file)
             else:
-                df = pd.read_excel(file)
-                return df
+                return self._read_spreadsheet(file)
         except Exception as e:
             raise ValueError(f"Erro ao ler arquivo: {str(e)}")
 
     def _read_csv(self, file: BinaryIO) -> pd.DataFrame:
-        """Lê arquivo CSV com detecção automática de separador e encoding"""
-        encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-        separators = [';', ',', '\t']
+        """
+        Lê arquivo CSV em uma única leitura: encoding e separador são
+        detectados nos primeiros KB do arquivo (ver CsvDialectSniffer)
+        """
+        dialect = self.sniffer.sniff(file)
+        self.last_dialect = dialect
+
+        if self.engine == 'fast' and self.fast_reader.csv_available():
+            try:
+                df = self.fast_reader.read_csv(file, dialect)
+                self.last_engine = 'pyarrow'
+                return df
+            except Exception as e:
+                print(f"[ExcelReader] pyarrow nao leu o CSV ({e}); usando pandas")
+
+        try:
+            df = self._parse_csv(file, dialect)
+        except UnicodeDecodeError:
+            # Amostra era UTF-8 válido mas o restante do arquivo não
+            dialect.encoding = 'latin1'
+            df = self._parse_csv(file, dialect)
 
-        for encoding in encodings:
-            for separator in separators:
-                try:
-                    file.seek(0)  # Voltar ao início do arquivo
-                    df = pd.read_csv(file, sep=separator, encoding=encoding, low_memory=False)
+        self.last_engine = 'pandas'
+        return df
+
+    def _read_spreadsheet(self, file: Union[BinaryIO, str]) -> pd.DataFrame:
+        """Lê a primeira aba com calamine (engine='fast') ou openpyxl"""
+        if self.engine == 'fast' and self.fast_reader.xlsx_available():
+            try:
+                df = self.fast_reader.read_xlsx(file)
+                self.last_engine = 'calamine'
+                return df
+            except Exception as e:
+                print(f"[ExcelReader] calamine nao leu a planilha ({e}); usando openpyxl")
+            if hasattr(file, 'seek'):
+                file.seek(0)
 
-                    if len(df.columns) > 1:
-                        return df
-                except:
-                    continue
+        df = pd.read_excel(file)
+        self.last_engine = 'pandas'
+        return df
 
+    @staticmethod
+    def _parse_csv(file: BinaryIO, dialect: CsvDialect) -> pd.DataFrame:
         file.seek(0)
-        return pd.read_csv(file, low_memory=False)
+        return pd.read_csv(
+            file,
+            sep=dialect.delimiter,
+            quotechar=dialect.quotechar,
+            encoding=dialect.encoding,
+            low_memory=False
+        )
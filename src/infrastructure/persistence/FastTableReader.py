@@ -0,0 +1,133 @@
+"""
+Columnar readers for uploads: pyarrow CSV and calamine xlsx.
+"""
+from typing import BinaryIO, Union
+
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.csv
+except ImportError:  # pyarrow e opcional: sem ele os CSVs sao lidos pelo pandas
+    pyarrow = None
+
+try:
+    import python_calamine
+except ImportError:  # python-calamine e opcional: sem ele o xlsx e lido pelo openpyxl
+    python_calamine = None
+
+from .CsvDialectSniffer import CsvDialect
+
+
+# Encodings que o leitor do pyarrow já lê como UTF-8 (ele ignora o BOM sozinho)
+_ARROW_UTF8 = ('utf-8', 'utf-8-sig')
+
+
+class FastTableReader:
+    """
+    Parses CSV files with pyarrow's multithreaded reader and xlsx files with
+    calamine (Rust), returning DataFrames backed by Arrow arrays
+    (pd.ArrowDtype) so no copy into NumPy object columns is needed. Text
+    columns use pandas' Arrow-backed StringDtype, the dtype they come back
+    with from an Arrow round trip (e.g. the parsed-file cache).
+
+    xlsx sheets are converted to Arrow column by column: a column mixing
+    types (numbers and text) keeps object dtype instead of failing the read.
+
+    Both readers raise on anything they cannot parse (unavailable package,
+    type inference conflict in a CSV, malformed file); ExcelReaderService
+    then falls back to pd.read_csv / pd.read_excel.
+    """
+
+    def __init__(self, block_size: int = 16 * 1024 * 1024):
+        """
+        Args:
+            block_size: Bytes per pyarrow CSV block (type inference uses the first one)
+        """
+        self.block_size = block_size
+
+    @staticmethod
+    def csv_available() -> bool:
+        return pyarrow is not None
+
+    @staticmethod
+    def xlsx_available() -> bool:
+        return python_calamine is not None
+
+    def read_csv(self, file: BinaryIO, dialect: CsvDialect) -> pd.DataFrame:
+        """
+        Parse a CSV with pyarrow using a sniffed dialect.
+
+        Args:
+            file: CSV opened in binary mode
+            dialect: Encoding and delimiter from CsvDialectSniffer
+
+        Returns:
+            pandas.DataFrame: Arrow-backed DataFrame
+        """
+        if pyarrow is None:
+            raise ImportError("pyarrow nao instalado. Execute: pip install pyarrow")
+
+        encoding = 'utf8' if dialect.encoding in _ARROW_UTF8 else dialect.encoding
+        table = self._read_table(file, dialect, encoding)
+        if encoding == 'utf8' and any(pyarrow.types.is_binary(field.type) for field in table.schema):
+            # Amostra era UTF-8 válido mas o restante do arquivo não: colunas viraram binárias
+            dialect.encoding = 'latin1'
+            table = self._read_table(file, dialect, 'latin1')
+        return table.to_pandas(types_mapper=_pandas_dtype)
+
+    def _read_table(self, file: BinaryIO, dialect: CsvDialect, encoding: str) -> 'pyarrow.Table':
+        file.seek(0)
+        return pyarrow.csv.read_csv(
+            file,
+            read_options=pyarrow.csv.ReadOptions(
+                encoding=encoding,
+                block_size=self.block_size,
+                use_threads=True
+            ),
+            parse_options=pyarrow.csv.ParseOptions(
+                delimiter=dialect.delimiter,
+                quote_char=dialect.quotechar,
+                newlines_in_values=True  # DS_OBSERVACAO pode ter quebras de linha entre aspas
+            ),
+            # Campos vazios viram nulos, como no pd.read_csv
+            convert_options=pyarrow.csv.ConvertOptions(strings_can_be_null=True)
+        )
+
+    @staticmethod
+    def read_xlsx(file: Union[BinaryIO, str]) -> pd.DataFrame:
+        """
+        Parse the first sheet of an xlsx/xls/ods file with calamine.
+
+        Args:
+            file: Path or binary file
+
+        Returns:
+            pandas.DataFrame: Arrow-backed DataFrame (mixed-type columns stay object)
+        """
+        if python_calamine is None:
+            raise ImportError("python-calamine nao instalado. Execute: pip install python-calamine")
+
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        # dtype_backend='pyarrow' falha na planilha inteira se uma coluna misturar tipos
+        df = pd.read_excel(file, engine='calamine')
+        if pyarrow is None:
+            return df
+        for position in range(df.shape[1]):
+            df.isetitem(position, _to_arrow_column(df.iloc[:, position]))
+        return df
+
+
+def _pandas_dtype(arrow_type: 'pyarrow.DataType'):
+    if pyarrow.types.is_string(arrow_type) or pyarrow.types.is_large_string(arrow_type):
+        return pd.StringDtype('pyarrow')
+    return pd.ArrowDtype(arrow_type)
+
+
+def _to_arrow_column(series: pd.Series) -> pd.Series:
+    try:
+        array = pyarrow.Array.from_pandas(series)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        return series  # Tipos mistos: continua object
+    return pd.Series(array.to_pandas(types_mapper=_pandas_dtype), index=series.index, name=series.name)
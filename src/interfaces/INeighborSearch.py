@@ -0,0 +1,47 @@
+"""
+Interface para busca de vizinhos mais próximos (K-NN) sobre embeddings.
+"""
+from abc import ABC, abstractmethod
+from typing import Tuple
+import numpy as np
+
+
+class INeighborSearch(ABC):
+    """
+    Interface para backends de busca de vizinhos (exata ou aproximada).
+    """
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca os k vizinhos mais similares (produto interno) de cada consulta.
+
+        Args:
+            queries: Matriz (n, dimensao) de embeddings normalizados
+            k: Número de vizinhos
+
+        Returns:
+            tuple: (scores (n, k), indices (n, k)) ordenados por similaridade
+                   decrescente; índice -1 indica vizinho inexistente
+        """
+        pass
+
+    @abstractmethod
+    def add(self, embeddings: np.ndarray) -> None:
+        """
+        Adiciona novos vetores de referência ao final do índice.
+
+        Args:
+            embeddings: Matriz (n, dimensao) de embeddings normalizados
+        """
+        pass
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        Retorna o número de vetores indexados.
+
+        Returns:
+            int: Quantidade de vetores de referência
+        """
+        pass
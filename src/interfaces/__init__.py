@@ -9,6 +9,7 @@ from .IReportExporter import IReportExporter
 from .ICacheService import ICacheService
 from .IEmbeddingService import IEmbeddingService
 from .IAssuntoClassifier import IAssuntoClassifier
+from .INeighborSearch import INeighborSearch
 
 __all__ = [
     'IExcelReader',
@@ -19,4 +20,5 @@ __all__ = [
     'ICacheService',
     'IEmbeddingService',
     'IAssuntoClassifier',
+    'INeighborSearch',
 ]
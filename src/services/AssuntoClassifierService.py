@@ -3,15 +3,18 @@ Service for automatic DS_ASSUNTO classification using K-NN with embeddings.
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional
-from sklearn.metrics.pairwise import cosine_similarity
-from pathlib import Path
-import pickle
+from typing import Dict, Any, List, Optional, Tuple
 
 from ..interfaces.IAssuntoClassifier import IAssuntoClassifier
 from ..interfaces.IEmbeddingService import IEmbeddingService
 from ..models.ClassificationResult import ClassificationResult
 from .TextBuilderService import TextBuilderService
+from ..infrastructure.ml.ClassificationStore import ClassificationStore
+from ..infrastructure.ml.NeighborSearch import ExactNeighborSearch, load_neighbor_search
+from ..infrastructure.ml.ReferenceBundle import ReferenceBundle, load_reference_set
+from ..infrastructure.ml.ReferenceSet import ReferenceSet
+from ..infrastructure.ml.ReferenceSetUpdater import ReferenceSetUpdater
+from ..shared.utils.ClassificationMasks import needs_assunto_mask
 
 
 class AssuntoClassifierService(IAssuntoClassifier):
@@ -23,57 +26,128 @@ class AssuntoClassifierService(IAssuntoClassifier):
     def __init__(
         self,
         embedding_service: IEmbeddingService,
-        reference_data_path: str = 'data/ml/assunto_reference.pkl',
-        reference_embeddings_path: str = 'data/ml/assunto_embeddings.npy',
+        artifact_dir: str = 'data/ml/assunto',
         threshold: float = 0.65,
-        k_neighbors: int = 5
+        k_neighbors: int = 5,
+        search_backend: str = 'exact',
+        index_path: Optional[str] = None,
+        verify_checksums: bool = False,
+        reference_data_path: Optional[str] = 'data/ml/assunto_reference.pkl',
+        reference_embeddings_path: Optional[str] = 'data/ml/assunto_embeddings.npy',
+        classification_store: Optional[ClassificationStore] = None
     ):
         """
         Initialize the classifier with pre-trained data.
 
         Args:
             embedding_service: Service for generating embeddings
-            reference_data_path: Path to reference data (pickle)
-            reference_embeddings_path: Path to reference embeddings (numpy)
+            artifact_dir: Reference bundle directory (manifest + memory-mapped arrays)
             threshold: Minimum confidence threshold for auto-classification (0-1)
             k_neighbors: Number of neighbors for K-NN voting
+            search_backend: Neighbor search backend ('exact', 'faiss_flat', 'faiss_ivf', 'faiss_hnsw')
+            index_path: Path of the persisted FAISS index (default: inside the bundle)
+            verify_checksums: Verify the SHA-256 of every bundle file on load
+            reference_data_path: Legacy reference pickle, used only while no bundle exists
+            reference_embeddings_path: Legacy reference embeddings, used only while no bundle exists
+            classification_store: Store of earlier classifications reused by NU_REGISTRO (None = always encode)
         """
         self.embedding_service = embedding_service
-        self.text_builder = TextBuilderService()
         self.threshold = threshold
         self.k_neighbors = k_neighbors
+        self.classification_store = classification_store
+        self.reused_count = 0
 
-        self.reference_df = self._load_reference_data(reference_data_path)
-        self.reference_embeddings = self._load_embeddings(reference_embeddings_path)
+        bundle = ReferenceBundle(artifact_dir)
+        self.reference_set = self._load_reference_set(
+            artifact_dir, verify_checksums, reference_data_path, reference_embeddings_path
+        )
+        # Textos montados com a mesma configuracao usada no treino do artefato
+        self.text_builder = TextBuilderService.from_config(self.reference_set.text_config, embedding_service)
+        self.search_backend = search_backend
+        self.neighbor_search = load_neighbor_search(
+            search_backend,
+            self.reference_set.embeddings,
+            bundle.embeddings_path if bundle.exists() else reference_embeddings_path,
+            index_path
+        )
+
+        self.reference_updater = ReferenceSetUpdater(artifact_dir, 'DS_ASSUNTO', search_backend)
 
-        print(f"Classificador carregado com {len(self.reference_df)} registros de referencia")
+        print(f"Classificador carregado com {len(self.reference_set)} registros de referencia")
         print(f"Threshold: {self.threshold}, K-neighbors: {self.k_neighbors}")
 
-    def _load_reference_data(self, path: str) -> pd.DataFrame:
-        """Load reference DataFrame from disk."""
-        file_path = Path(path)
-        if not file_path.exists():
-            raise FileNotFoundError(
-                f"Reference data not found: {path}\n"
-                "Please run train_assunto_classifier.py first to generate training data."
+    def _load_reference_set(
+        self,
+        artifact_dir: str,
+        verify_checksums: bool,
+        legacy_data_path: Optional[str],
+        legacy_embeddings_path: Optional[str]
+    ) -> ReferenceSet:
+        """Load the reference bundle, checked against the embedding model in use."""
+        try:
+            return load_reference_set(
+                artifact_dir,
+                'DS_ASSUNTO',
+                model_name=getattr(self.embedding_service, 'model_name', None),
+                dimension=self.embedding_service.get_embedding_dimension(),
+                verify_checksums=verify_checksums,
+                legacy_data_path=legacy_data_path,
+                legacy_embeddings_path=legacy_embeddings_path
             )
+        except FileNotFoundError as e:
+            raise FileNotFoundError(
+                f"{e}\n"
+                "Please run train_assunto_classifier_fast.py first to generate the reference artifact."
+            ) from e
 
-        with open(file_path, 'rb') as f:
-            df = pickle.load(f)
+    @property
+    def model_version(self) -> str:
+        """
+        Version of everything that determines a classification: embedding
+        model and backend, reference set (training run and size, so
+        add_references also changes it), text builder config and voting
+        parameters.
+        """
+        return ClassificationStore.make_model_version(
+            getattr(self.embedding_service, 'model_name', ''),
+            getattr(self.embedding_service, 'backend', 'torch'),
+            self.reference_set.version_tag,
+            len(self.reference_set),
+            self.reference_set.text_config,
+            self.search_backend,
+            self.threshold,
+            self.k_neighbors
+        )
 
-        return df
+    def _vote(self, query_embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Weighted K-NN vote for a batch of normalized query embeddings.
 
-    def _load_embeddings(self, path: str) -> np.ndarray:
-        """Load reference embeddings from disk."""
-        file_path = Path(path)
-        if not file_path.exists():
-            raise FileNotFoundError(
-                f"Reference embeddings not found: {path}\n"
-                "Please run train_assunto_classifier.py first to generate embeddings."
-            )
+        Args:
+            query_embeddings: Matrix (n, dimension) of L2-normalized embeddings
+
+        Returns:
+            tuple: (best label code per row, average similarity of the best label,
+                    top-k reference indices sorted by descending similarity)
+        """
+        top_k_scores, top_k_indices = self.neighbor_search.search(query_embeddings, self.k_neighbors)
+        n_rows = top_k_indices.shape[0]
+
+        # Backends aproximados podem devolver -1 quando ha menos de k vizinhos
+        valid = top_k_indices >= 0
+        top_k_scores = np.where(valid, top_k_scores, 0.0)
+
+        n_labels = len(self.reference_set.label_vocab)
+        top_k_codes = self.reference_set.label_codes[np.where(valid, top_k_indices, 0)]
+        flat = (np.arange(n_rows)[:, None] * n_labels + top_k_codes).ravel()
+        votes = np.bincount(flat, weights=top_k_scores.ravel(), minlength=n_rows * n_labels).reshape(n_rows, n_labels)
+        counts = np.bincount(flat, weights=valid.ravel(), minlength=n_rows * n_labels).reshape(n_rows, n_labels)
 
-        embeddings = np.load(file_path)
-        return embeddings
+        best = votes.argmax(axis=1)
+        rows = np.arange(n_rows)
+        avg_scores = votes[rows, best] / np.maximum(counts[rows, best], 1)
+
+        return best, avg_scores, top_k_indices
 
     def classify_assunto(self, texto: str) -> Dict[str, Any]:
         """
@@ -95,22 +169,15 @@ class AssuntoClassifierService(IAssuntoClassifier):
 
         texto_embedding = self.embedding_service.generate_embeddings([texto])
 
-        similarities = cosine_similarity(texto_embedding, self.reference_embeddings)[0]
-
-        top_k_indices = np.argsort(similarities)[-self.k_neighbors:][::-1]
-        top_k_scores = similarities[top_k_indices]
-
-        top_k_categories = self.reference_df.iloc[top_k_indices]['DS_ASSUNTO'].tolist()
-        top_k_texts = self.reference_df.iloc[top_k_indices]['texto_referencia'].tolist()
-
-        category_scores = {}
-        for cat, score in zip(top_k_categories, top_k_scores):
-            category_scores[cat] = category_scores.get(cat, 0) + score
-
-        best_category = max(category_scores, key=category_scores.get)
+        best, avg_scores, top_k_indices = self._vote(texto_embedding)
+        best_category = self.reference_set.label_vocab[best[0]]
+        avg_score = float(avg_scores[0])
 
-        category_count = sum(1 for c in top_k_categories if c == best_category)
-        avg_score = category_scores[best_category] / category_count
+        top_k_positions = top_k_indices[0][top_k_indices[0] >= 0]
+        top_k_texts = [
+            text.replace(TextBuilderService.CHUNK_SEPARATOR, ' ')
+            for text in self.reference_set.get_texts(top_k_positions[:3])
+        ]
 
         if avg_score < self.threshold:
             return {
@@ -142,69 +209,136 @@ class AssuntoClassifierService(IAssuntoClassifier):
         """
         df_result = df.copy()
 
-        mask_needs_classification = df_result['DS_ASSUNTO'].apply(
-            self.text_builder.needs_classification
-        )
-        indices_to_classify = df_result[mask_needs_classification].index.tolist()
+        mask_needs_classification = needs_assunto_mask(df_result['DS_ASSUNTO'])
+        positions_to_classify = np.flatnonzero(mask_needs_classification.to_numpy())
 
-        total_to_classify = len(indices_to_classify)
+        total_to_classify = len(positions_to_classify)
         print(f"\nClassificando {total_to_classify} registros em mini-batches...")
 
         if total_to_classify == 0:
             return df_result
 
-        classified_count = 0
-        not_classified_count = 0
+        texts_to_classify = self.text_builder.build_texts(df_result.iloc[positions_to_classify])
+
+        classified_positions = []
+        classified_labels = []
+
+        # Registros ja classificados em uploads anteriores (mesmo texto e mesma versao) nao passam pelo encoder
+        pending = np.arange(total_to_classify)
+        registros = None
+        if self.classification_store is not None and 'NU_REGISTRO' in df_result.columns:
+            registros = df_result['NU_REGISTRO'].to_numpy()[positions_to_classify]
+            model_version = self.model_version
+            found, stored_labels = self.classification_store.lookup(
+                'DS_ASSUNTO', registros, texts_to_classify, model_version
+            )
+            reused = found & pd.notna(stored_labels)
+            classified_positions.append(positions_to_classify[reused])
+            classified_labels.append(stored_labels[reused])
+            pending = np.flatnonzero(~found)
+        self.reused_count = total_to_classify - len(pending)
+        total_to_encode = len(pending)
 
         BATCH_SIZE = 500
 
-        for batch_start in range(0, total_to_classify, BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, total_to_classify)
-            batch_indices = indices_to_classify[batch_start:batch_end]
+        for batch_start in range(0, total_to_encode, BATCH_SIZE):
+            batch_end = min(batch_start + BATCH_SIZE, total_to_encode)
+            batch = pending[batch_start:batch_end]
+            batch_positions = positions_to_classify[batch]
 
-            print(f"   Processando batch {batch_start//BATCH_SIZE + 1}/{(total_to_classify + BATCH_SIZE - 1)//BATCH_SIZE}: registros {batch_start+1}-{batch_end}")
+            print(f"   Processando batch {batch_start//BATCH_SIZE + 1}/{(total_to_encode + BATCH_SIZE - 1)//BATCH_SIZE}: registros {batch_start+1}-{batch_end}")
 
-            batch_texts = [
-                self.text_builder.build_text_from_row(df_result.loc[idx])
-                for idx in batch_indices
-            ]
+            batch_texts = [texts_to_classify[i] for i in batch]
 
             batch_embeddings = self.embedding_service.generate_embeddings(batch_texts)
 
-            for i, idx in enumerate(batch_indices):
-                texto_embedding = batch_embeddings[i:i+1]  # Pegar embedding individual
+            best, avg_scores, _ = self._vote(batch_embeddings)
+            accepted = avg_scores >= self.threshold
+            batch_labels = self.reference_set.label_vocab[best]
 
-                from sklearn.metrics.pairwise import cosine_similarity
-                similarities = cosine_similarity(texto_embedding, self.reference_embeddings)[0]
+            classified_positions.append(batch_positions[accepted])
+            classified_labels.append(batch_labels[accepted])
 
-                top_k_indices = np.argsort(similarities)[-self.k_neighbors:][::-1]
-                top_k_scores = similarities[top_k_indices]
-                top_k_categories = self.reference_df.iloc[top_k_indices]['DS_ASSUNTO'].tolist()
+            if registros is not None:
+                self.classification_store.save(
+                    'DS_ASSUNTO', registros[batch], batch_texts, model_version,
+                    np.where(accepted, batch_labels, None)
+                )
 
-                category_scores = {}
-                for cat, score in zip(top_k_categories, top_k_scores):
-                    category_scores[cat] = category_scores.get(cat, 0) + score
+            if progress_callback:
+                progress = batch_end / total_to_encode
+                progress_callback(progress)
 
-                best_category = max(category_scores, key=category_scores.get)
-                category_count = sum(1 for c in top_k_categories if c == best_category)
-                avg_score = category_scores[best_category] / category_count
+        if progress_callback and total_to_encode == 0:
+            progress_callback(1.0)
 
-                if avg_score >= self.threshold:
-                    df_result.loc[idx, 'DS_ASSUNTO'] = best_category
-                    classified_count += 1
-                else:
-                    not_classified_count += 1
+        classified_positions = np.concatenate(classified_positions)
+        classified_count = len(classified_positions)
+        not_classified_count = total_to_classify - classified_count
 
-            if progress_callback:
-                progress = batch_end / total_to_classify
-                progress_callback(progress)
+        if classified_count > 0:
+            values = df_result['DS_ASSUNTO'].to_numpy(dtype=object, copy=True)
+            values[classified_positions] = np.concatenate(classified_labels)
+            df_result['DS_ASSUNTO'] = values
 
         print(f"\nResultado da Classificacao:")
         print(f"   - Classificados: {classified_count}")
         print(f"   - Nao classificados (confianca baixa): {not_classified_count}")
+        print(f"   - Reaproveitados de classificacoes anteriores: {self.reused_count}")
 
         return df_result
 
+    def add_references(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Append newly labeled records to the reference set without retraining.
+        Only the new rows are encoded; reference data, embeddings and the FAISS
+        index are updated in memory and on disk, and a new version is recorded.
+        Rows whose label and reference text are already in the set are skipped,
+        so adding the same file twice does not duplicate references.
+
+        Args:
+            df: DataFrame with DS_ASSUNTO filled and text columns
+
+        Returns:
+            dict: Version entry (version, added_records, total_records, ...) plus skipped_records
+        """
+        df_valid = df[~needs_assunto_mask(df['DS_ASSUNTO'])]
+        texts = np.array(self.text_builder.build_texts(df_valid), dtype=object)
+        keep = np.array(
+            [self.text_builder.validate_text_length(t, min_length=10) for t in texts],
+            dtype=bool
+        )
+
+        new_labels = df_valid['DS_ASSUNTO'].to_numpy()[keep]
+        new_texts = texts[keep]
+        is_new = self.reference_set.new_rows_mask(new_labels, new_texts)
+        skipped = int((~is_new).sum())
+        new_labels = new_labels[is_new]
+        new_texts = new_texts[is_new].tolist()
+        if not new_texts:
+            return {
+                'version': None,
+                'added_records': 0,
+                'skipped_records': skipped,
+                'total_records': len(self.reference_set)
+            }
+
+        new_embeddings = self.embedding_service.generate_embeddings(new_texts).astype(np.float32, copy=False)
+
+        self.reference_set.append(new_labels, new_texts, new_embeddings)
+        if isinstance(self.neighbor_search, ExactNeighborSearch):
+            self.neighbor_search = ExactNeighborSearch(self.reference_set.embeddings)
+        else:
+            self.neighbor_search.add(new_embeddings)
+
+        entry = self.reference_updater.append(
+            self.reference_set,
+            new_embeddings,
+            neighbor_search=self.neighbor_search,
+            model_name=getattr(self.embedding_service, 'model_name', '')
+        )
+        return {**entry, 'skipped_records': skipped}
+
     def get_classification_stats(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
         Get statistics about DS_ASSUNTO distribution.
@@ -217,7 +351,7 @@ class AssuntoClassifierService(IAssuntoClassifier):
         """
         stats = {
             'total_registros': len(df),
-            'total_vazios': df['DS_ASSUNTO'].apply(self.text_builder.needs_classification).sum(),
+            'total_vazios': needs_assunto_mask(df['DS_ASSUNTO']).sum(),
         }
 
         if 'DS_ASSUNTO' in df.columns:
@@ -1,11 +1,16 @@
 """
 Service for generating text embeddings using Sentence Transformers.
 """
-from typing import List
+from typing import Any, Dict, List, Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 from ..interfaces.IEmbeddingService import IEmbeddingService
+from ..infrastructure.ml.ModelRegistry import ModelRegistry
+from ..infrastructure.ml.EmbeddingCache import EmbeddingCache
+from ..infrastructure.ml.OnnxEncoder import DEFAULT_ONNX_DIR
+from ..infrastructure.ml.TokenBudgetBatcher import TokenBudgetBatcher
+from ..infrastructure.ml.EmbeddingProcessPool import EmbeddingProcessPool
+from .TextBuilderService import TextBuilderService
 
 
 class EmbeddingService(IEmbeddingService):
@@ -14,20 +19,72 @@ class EmbeddingService(IEmbeddingService):
     Generates semantic embeddings for text classification.
     """
 
-    def __init__(self, model_name: str = 'neuralmind/bert-base-portuguese-cased'):
+    def __init__(
+        self,
+        model_name: str = 'neuralmind/bert-base-portuguese-cased',
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 500_000,
+        backend: str = 'torch',
+        onnx_dir: str = DEFAULT_ONNX_DIR,
+        token_budget: int = 8192,
+        show_progress_bar: bool = True,
+        num_workers: int = 1,
+        threads_per_worker: int = 2,
+        pool_min_texts: int = 256
+    ):
         """
         Initialize the embedding service with a Sentence Transformer model.
+        The model is obtained from the process-wide ModelRegistry, so services
+        created with the same model_name and backend share a single loaded instance.
 
         Args:
             model_name: Name of the pre-trained model to use.
                        Default: 'neuralmind/bert-base-portuguese-cased' (optimized for Brazilian Portuguese)
+            cache_dir: Directory of the persistent embedding cache (None disables caching)
+            cache_max_entries: Maximum number of cached texts before LRU eviction
+            backend: Inference backend: 'torch' (SentenceTransformer), 'onnx' or
+                     'onnx_int8' (ONNX Runtime export, see scripts/training/export_onnx_model.py)
+            onnx_dir: Base directory of the ONNX exports
+            token_budget: Maximum padded tokens per encoder batch (see TokenBudgetBatcher)
+            show_progress_bar: Show a tqdm bar while encoding (disable in the Streamlit server)
+            num_workers: Encoding processes (1 = encode in this process, 0 = cpu_count // threads_per_worker);
+                         meant for batch scripts, see EmbeddingProcessPool
+            threads_per_worker: Intra-op threads of each encoding process
+            pool_min_texts: Smallest list of texts sent to the process pool
         """
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.backend = backend
+        self.model = ModelRegistry.get_model(model_name, backend=backend, onnx_dir=onnx_dir)
+        self.batcher = TokenBudgetBatcher(token_budget=token_budget)
+        self.show_progress_bar = show_progress_bar
+
+        self.pool: Optional[EmbeddingProcessPool] = None
+        self.pool_min_texts = pool_min_texts
+        if num_workers != 1:
+            self.pool = EmbeddingProcessPool(
+                model_name,
+                self.get_embedding_dimension(),
+                backend=backend,
+                onnx_dir=onnx_dir,
+                num_workers=num_workers,
+                threads_per_worker=threads_per_worker,
+                token_budget=token_budget
+            )
+
+        # Vetores de backends diferentes nao sao identicos: cada backend tem seu proprio cache
+        self.cache: Optional[EmbeddingCache] = None
+        if cache_dir is not None:
+            self.cache = EmbeddingCache.shared(
+                cache_dir,
+                ModelRegistry.registry_key(model_name, backend),
+                self.get_embedding_dimension(),
+                max_entries=cache_max_entries
+            )
 
     def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of texts.
+        When the persistent cache is enabled only texts not seen before are encoded.
 
         Args:
             texts: List of strings to generate embeddings for
@@ -38,16 +95,86 @@ class EmbeddingService(IEmbeddingService):
         if not texts:
             return np.array([])
 
-        embeddings = self.model.encode(
+        if self.cache is None:
+            return self._encode(texts)
+
+        embeddings, missing = self.cache.lookup(texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            unique_texts = list(dict.fromkeys(missing_texts))
+            encoded = self._encode(unique_texts)
+            self.cache.store(unique_texts, encoded)
+
+            position = {text: i for i, text in enumerate(unique_texts)}
+            embeddings[missing] = encoded[[position[t] for t in missing_texts]]
+
+        return embeddings
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts with the Sentence Transformer model (or its ONNX export).
+        Texts are grouped by token length into batches sized by a padded-token
+        budget and the embeddings are returned in the original order.
+        Large lists go to the process pool when one is configured.
+
+        Texts made of several chunks (joined by TextBuilderService.CHUNK_SEPARATOR)
+        are encoded chunk by chunk and their embeddings mean-pooled.
+        """
+        separator = TextBuilderService.CHUNK_SEPARATOR
+        if not any(separator in text for text in texts):
+            return self._encode_texts(texts)
+
+        owners, chunks = [], []
+        for i, text in enumerate(texts):
+            for chunk in text.split(separator):
+                owners.append(i)
+                chunks.append(chunk)
+
+        pooled = np.zeros((len(texts), self.get_embedding_dimension()), dtype=np.float32)
+        np.add.at(pooled, owners, self._encode_texts(chunks))
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.maximum(norms, 1e-12)
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode single-chunk texts (process pool or token-budget batches)."""
+        if self.pool is not None and len(texts) >= self.pool_min_texts:
+            return self.pool.encode(texts)
+
+        lengths = self.batcher.token_lengths(
             texts,
-            show_progress_bar=True,
-            batch_size=32,
-            normalize_embeddings=True,  # Important for cosine similarity
-            convert_to_numpy=True
+            getattr(self.model, 'tokenizer', None),
+            self.model.max_seq_length
         )
+        batches = self.batcher.plan(lengths)
+        if self.show_progress_bar:
+            from tqdm import tqdm
+            batches = tqdm(batches, desc="Batches", unit="batch")
+
+        embeddings = np.empty((len(texts), self.get_embedding_dimension()), dtype=np.float32)
+        for positions in batches:
+            embeddings[positions] = self.model.encode(
+                [texts[i] for i in positions],
+                show_progress_bar=False,
+                batch_size=len(positions),
+                normalize_embeddings=True,  # Important for cosine similarity
+                convert_to_numpy=True
+            )
 
         return embeddings
 
+    def get_tokenizer(self) -> Any:
+        """Tokenizer do modelo (usado pelo TextBuilderService token-aware)."""
+        return self.model.tokenizer
+
+    def get_max_seq_length(self) -> int:
+        """Número máximo de tokens que o modelo processa por texto."""
+        return self.model.max_seq_length
+
+    def close(self) -> None:
+        """Encerra o pool de processos de encoding (se houver)."""
+        if self.pool is not None:
+            self.pool.close()
+
     def get_embedding_dimension(self) -> int:
         """
         Get the dimension of embeddings generated by the model.
@@ -56,3 +183,23 @@ class EmbeddingService(IEmbeddingService):
             int: Dimension of embedding vectors
         """
         return self.model.get_sentence_embedding_dimension()
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """
+        Get load time and memory footprint of the underlying model.
+
+        Returns:
+            dict: Model statistics reported by the ModelRegistry
+        """
+        return ModelRegistry.get_stats(ModelRegistry.registry_key(self.model_name, self.backend))
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counts of the persistent embedding cache.
+
+        Returns:
+            dict: Cache statistics (empty if caching is disabled)
+        """
+        if self.cache is None:
+            return {}
+        return self.cache.get_stats()
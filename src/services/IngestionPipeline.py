@@ -0,0 +1,269 @@
+"""
+Parallel ingestion of the default planilha and uploads.
+"""
+import functools
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from ..interfaces.ICacheService import ICacheService
+from .ExcelReaderService import ExcelReaderService
+from .FuzzyColumnMapper import FuzzyColumnMapper
+
+
+DATE_COLUMNS = ('DT_REGISTRO_ATENDIMENTO', 'DT_ATRIBUICAO', 'DT_CONCLUSAO',
+                'DT_LIMITE', 'DT_LIMITE_CONCLUSAO', 'DT_SAC')
+
+# Incrementar quando leitura, mapeamento ou conversão de datas mudarem (invalida o cache)
+PARSER_VERSION = 1
+
+FileSource = Union[Path, str, BinaryIO]
+
+
+@dataclass
+class IngestedFile:
+    """
+    Resumo de um arquivo lido, mapeado e com datas convertidas.
+    """
+    index: int
+    name: str
+    records: int = 0
+    engine: Optional[str] = None
+    dialect: Optional[str] = None
+    seconds: float = 0.0
+    content_hash: Optional[str] = None
+    cached: bool = False  # DataFrame veio do cache, sem reler o arquivo
+
+
+@dataclass
+class IngestionResult:
+    """
+    Arquivos combinados em um único DataFrame, sem NU_REGISTRO duplicado.
+    """
+    df: pd.DataFrame
+    files: List[IngestedFile] = field(default_factory=list)
+    total_before: int = 0
+    duplicates_removed: int = 0
+
+
+class _NamedBytesIO(io.BytesIO):
+    """Conteúdo de um upload com o nome original (o leitor decide CSV/xlsx pelo nome)."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+class IngestionPipeline:
+    """
+    Reads, maps (FuzzyColumnMapper) and converts the date columns of several
+    files concurrently, one file per worker process, and concatenates the
+    results once at the end, in input order, so drop_duplicates keeps the
+    same record as the sequential loop did.
+
+    Uploads are sent to the workers as bytes and paths are opened by the
+    workers themselves; each worker sends back one DataFrame. A single file,
+    or max_workers=1, runs in the calling process without starting a pool.
+    Workers are started with 'spawn' (same behaviour on Linux and Windows)
+    and only live for one run().
+
+    With a cache, every parsed DataFrame is stored under the SHA-256 of the
+    file content (plus PARSER_VERSION and the reader engine), so a file
+    already seen, under any name, is loaded from the cache (Arrow on disk
+    with SQLiteCacheService) and only new files are parsed.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 0,
+        engine: str = 'fast',
+        cache: Optional[ICacheService] = None,
+        cache_ttl_seconds: int = 30 * 24 * 3600
+    ):
+        """
+        Args:
+            max_workers: Worker processes (0 = one per core, at most one per file)
+            engine: ExcelReaderService engine ('fast' or 'pandas')
+            cache: Cache of parsed files (None = always parse)
+            cache_ttl_seconds: Lifetime of a parsed file in the cache
+        """
+        self.max_workers = max_workers or (os.cpu_count() or 1)
+        self.engine = engine
+        self.cache = cache
+        self.cache_ttl_seconds = cache_ttl_seconds
+
+    def run(
+        self,
+        sources: List[Tuple[str, FileSource]],
+        on_file_done: Optional[Callable[[IngestedFile, int, int], None]] = None,
+        digests: Optional[Sequence[Optional[str]]] = None
+    ) -> IngestionResult:
+        """
+        Ingest every file and combine them.
+
+        Args:
+            sources: (display name, path or uploaded file) in priority order
+            on_file_done: Called in the calling thread as each file finishes,
+                with (file summary, files done, total files)
+            digests: content_hash() of each source, when the caller already has it
+                (None entries are hashed here), so no upload is read twice
+
+        Returns:
+            IngestionResult: Combined DataFrame and per-file summaries
+        """
+        frames: List[Optional[pd.DataFrame]] = [None] * len(sources)
+        files: List[Optional[IngestedFile]] = [None] * len(sources)
+        digests: List[Optional[str]] = list(digests) if digests is not None else [None] * len(sources)
+
+        def collect(summary: IngestedFile, df: pd.DataFrame) -> None:
+            summary.content_hash = digests[summary.index]
+            if not summary.cached:
+                self._store(summary, df)
+            frames[summary.index] = df
+            files[summary.index] = summary
+            if on_file_done is not None:
+                on_file_done(summary, sum(f is not None for f in files), len(sources))
+
+        tasks = []
+        for index, (name, source) in enumerate(sources):
+            if self.cache is not None:
+                if digests[index] is None:
+                    digests[index] = content_hash(source)
+                cached = self._load(index, name, digests[index])
+                if cached is not None:
+                    collect(*cached)
+                    continue
+            tasks.append((index, name, self._payload(source)))
+
+        num_workers = min(self.max_workers, len(tasks))
+        if num_workers <= 1:
+            for index, name, payload in tasks:
+                try:
+                    collect(*_ingest_file(index, name, payload, self.engine))
+                except Exception as e:
+                    raise ValueError(f"{name}: {e}") from e
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, mp_context=get_context('spawn')) as executor:
+                futures = {
+                    executor.submit(_ingest_file, index, name, payload, self.engine): name
+                    for index, name, payload in tasks
+                }
+                for future in as_completed(futures):
+                    try:
+                        collect(*future.result())
+                    except Exception as e:
+                        for pending in futures:
+                            pending.cancel()
+                        raise ValueError(f"{futures[future]}: {e}") from e
+
+        return self._combine(frames, files)
+
+    def _cache_key(self, digest: str) -> str:
+        return f"parsed_file:{digest}:v{PARSER_VERSION}:{self.engine}"
+
+    def _load(self, index: int, name: str, digest: str) -> Optional[Tuple[IngestedFile, pd.DataFrame]]:
+        start = time.perf_counter()
+        key = self._cache_key(digest)
+        info = self.cache.get(f"{key}:info")
+        df = self.cache.get(key) if info is not None else None
+        if df is None:
+            return None
+        summary = IngestedFile(
+            index=index,
+            name=name,
+            records=len(df),
+            engine=info.get('engine'),
+            dialect=info.get('dialect'),
+            seconds=time.perf_counter() - start,
+            cached=True
+        )
+        return summary, df
+
+    def _store(self, summary: IngestedFile, df: pd.DataFrame) -> None:
+        if self.cache is None or summary.content_hash is None:
+            return
+        key = self._cache_key(summary.content_hash)
+        if self.cache.set(key, df, self.cache_ttl_seconds):
+            info = {'engine': summary.engine, 'dialect': summary.dialect}
+            self.cache.set(f"{key}:info", info, self.cache_ttl_seconds)
+
+    @staticmethod
+    def _payload(source: FileSource) -> Union[Path, _NamedBytesIO]:
+        if isinstance(source, (str, Path)):
+            return Path(source)
+        # UploadedFile do Streamlit: envia só nome e conteúdo para o worker
+        return _NamedBytesIO(source.getvalue(), getattr(source, 'name', ''))
+
+    @staticmethod
+    def _combine(frames: List[pd.DataFrame], files: List[IngestedFile]) -> IngestionResult:
+        # concat sempre copia: o DataFrame do cache em memória não é alterado pelo app
+        df = pd.concat(frames, ignore_index=True)
+        total_before = len(df)
+        if 'NU_REGISTRO' in df.columns:
+            df = df.drop_duplicates(subset=['NU_REGISTRO'], keep='first')
+        return IngestionResult(
+            df=df,
+            files=files,
+            total_before=total_before,
+            duplicates_removed=total_before - len(df)
+        )
+
+
+def content_hash(source: FileSource) -> str:
+    """
+    SHA-256 of a file's content.
+
+    Args:
+        source: Path or uploaded file
+
+    Returns:
+        str: Hex digest (files on disk are re-read only when size or mtime change)
+    """
+    if isinstance(source, (str, Path)):
+        stat = Path(source).stat()
+        return _hash_path(str(source), stat.st_size, stat.st_mtime_ns)
+    return hashlib.sha256(source.getvalue()).hexdigest()
+
+
+@functools.lru_cache(maxsize=64)
+def _hash_path(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ingest_file(
+    index: int,
+    name: str,
+    payload: Union[Path, BinaryIO],
+    engine: str
+) -> Tuple[IngestedFile, pd.DataFrame]:
+    """Lê, mapeia colunas e converte datas de um arquivo (roda no worker)."""
+    start = time.perf_counter()
+    reader = ExcelReaderService(engine=engine)
+    raw_df = reader.read_excel(payload)
+
+    df = FuzzyColumnMapper().map_columns(raw_df)
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    summary = IngestedFile(
+        index=index,
+        name=name,
+        records=len(df),
+        engine=reader.last_engine,
+        dialect=reader.last_dialect.describe() if reader.last_dialect else None,
+        seconds=time.perf_counter() - start
+    )
+    return summary, df
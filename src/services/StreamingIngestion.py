@@ -0,0 +1,202 @@
+"""
+Generator pipeline for CSVs larger than memory.
+
+Each stage takes an iterator of DataFrame chunks and yields chunks, so a
+file is read, mapped, date-parsed, deduplicated, classified and exported
+with only a few chunks in memory at a time:
+
+    chunks = stream_csv('historico.csv', chunk_rows=100_000)
+    chunks = classify_stream(chunks, assunto_classifier)
+    write_csv_stream(chunks, 'historico_classificado.csv')
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2: cada bloco infere o proprio formato
+    guess_datetime_format = None
+
+from ..infrastructure.persistence.ChunkedCsvReader import ChunkedCsvReader
+from .FuzzyColumnMapper import FuzzyColumnMapper
+from .IngestionPipeline import DATE_COLUMNS
+
+Chunks = Iterable[pd.DataFrame]
+
+
+def stream_csv(
+    path: Union[str, Path],
+    chunk_rows: int = 100_000,
+    reader: Optional[ChunkedCsvReader] = None,
+    mapper: Optional[FuzzyColumnMapper] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Read, map, date-parse and deduplicate a CSV chunk by chunk.
+
+    Args:
+        path: CSV file
+        chunk_rows: Rows per chunk (ignored when reader is given)
+        reader: Chunked reader (default ChunkedCsvReader(chunk_rows))
+        mapper: Column mapper (default FuzzyColumnMapper())
+
+    Yields:
+        pandas.DataFrame: Chunks ready for classification
+    """
+    reader = reader or ChunkedCsvReader(chunk_rows=chunk_rows)
+    chunks = reader.iter_chunks(path)
+    chunks = map_columns_stream(chunks, mapper)
+    chunks = parse_dates_stream(chunks)
+    return drop_duplicates_stream(chunks)
+
+
+def map_columns_stream(chunks: Chunks, mapper: Optional[FuzzyColumnMapper] = None) -> Iterator[pd.DataFrame]:
+    """
+    Map column names with FuzzyColumnMapper.
+
+    The mapping is computed on the first chunk and applied as a plain rename
+    to the following ones, so every chunk ends up with the same columns.
+
+    Args:
+        chunks: Raw chunks
+        mapper: Column mapper (default FuzzyColumnMapper())
+
+    Yields:
+        pandas.DataFrame: Chunks with the expected column names
+    """
+    mapper = mapper or FuzzyColumnMapper()
+    renames: Optional[Dict[str, str]] = None
+    for chunk in chunks:
+        if renames is None:
+            mapped = mapper.map_columns(chunk)
+            # rename preserva a posição das colunas
+            renames = {
+                original: expected for original, expected in zip(chunk.columns, mapped.columns)
+                if original != expected
+            }
+            yield mapped
+        else:
+            yield chunk.rename(columns=renames)
+
+
+def parse_dates_stream(chunks: Chunks, columns: Sequence[str] = DATE_COLUMNS) -> Iterator[pd.DataFrame]:
+    """
+    Convert date columns with pd.to_datetime(errors='coerce').
+
+    The format of each column is guessed once, from its first value, and
+    reused for every chunk, so all chunks parse the same way.
+
+    Args:
+        chunks: Mapped chunks
+        columns: Date columns converted when present
+
+    Yields:
+        pandas.DataFrame: Chunks with datetime64 date columns
+    """
+    formats: Dict[str, Optional[str]] = {}
+    for chunk in chunks:
+        for col in columns:
+            if col not in chunk.columns:
+                continue
+            if col not in formats:
+                formats[col] = _guess_format(chunk[col])
+                if formats[col] is None and not chunk[col].notna().any():
+                    del formats[col]  # Coluna vazia neste bloco: tenta de novo no próximo
+            chunk[col] = pd.to_datetime(chunk[col], format=formats.get(col), errors='coerce')
+        yield chunk
+
+
+def drop_duplicates_stream(chunks: Chunks, column: str = 'NU_REGISTRO') -> Iterator[pd.DataFrame]:
+    """
+    Drop records whose key was already seen, in this or an earlier chunk
+    (same result as drop_duplicates(subset=[column], keep='first') on the
+    whole file). Only the keys seen so far are kept in memory.
+
+    Args:
+        chunks: Chunks to deduplicate
+        column: Key column (chunks without it pass through)
+
+    Yields:
+        pandas.DataFrame: Chunks without repeated keys (chunks left empty are skipped)
+    """
+    seen = set()
+    seen_missing = False
+    for chunk in chunks:
+        if column not in chunk.columns:
+            yield chunk
+            continue
+
+        keys = chunk[column]
+        missing = keys.isna()
+        keep = ~keys.duplicated(keep='first') & ~keys.isin(seen)
+        if seen_missing:
+            keep &= ~missing
+
+        if missing[keep].any():
+            seen_missing = True
+        seen.update(keys[keep & ~missing].tolist())
+        if keep.all():
+            yield chunk
+        elif keep.any():  # Bloco só com chaves repetidas não é repassado
+            yield chunk[keep]
+
+
+def classify_stream(chunks: Chunks, classifier: Any, progress_callback=None) -> Iterator[pd.DataFrame]:
+    """
+    Classify each chunk with an Assunto/SubAssunto classifier.
+
+    Args:
+        chunks: Chunks to classify
+        classifier: Object with classify_dataframe(df, progress_callback)
+        progress_callback: Called with the number of records classified so far
+
+    Yields:
+        pandas.DataFrame: Classified chunks
+    """
+    done = 0
+    for chunk in chunks:
+        result = classifier.classify_dataframe(chunk)
+        done += len(result)
+        if progress_callback is not None:
+            progress_callback(done)
+        yield result
+
+
+def write_csv_stream(
+    chunks: Chunks,
+    path: Union[str, Path],
+    sep: str = ';',
+    encoding: str = 'utf-8-sig'
+) -> int:
+    """
+    Write chunks to one CSV file (header only once).
+
+    Args:
+        chunks: Chunks to export
+        path: Output file
+        sep: Delimiter
+        encoding: Output encoding (a utf-8-sig BOM is written once)
+
+    Returns:
+        int: Records written
+    """
+    total = 0
+    header = True
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        for chunk in chunks:
+            chunk.to_csv(f, sep=sep, index=False, header=header)
+            header = False
+            total += len(chunk)
+    return total
+
+
+def _guess_format(series: pd.Series) -> Optional[str]:
+    if guess_datetime_format is None or not (
+        pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+    ):
+        return None
+    values = series.dropna()
+    if values.empty:
+        return None
+    return guess_datetime_format(str(values.iloc[0]))
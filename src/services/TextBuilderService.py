@@ -1,16 +1,133 @@
 """
 Service for building text representations from complaint records.
 """
+import numpy as np
 import pandas as pd
-from typing import Any
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 
 class TextBuilderService:
     """
     Service responsible for building text representations from DataFrame rows.
     Combines multiple text columns to create rich context for embeddings.
+
+    By default texts are cut at MAX_CHARS characters (build_text_from_row).
+    Built with a tokenizer (for_model / from_config) the service is
+    token-aware: build_text() fits the fields into the model's max sequence
+    length, splitting the token budget between fields by FIELD_PRIORITIES
+    instead of keeping only the start of the concatenation, and never
+    tokenizes text that would be cut anyway. With max_chunks > 1 long
+    complaints are kept as up to max_chunks chunks joined by
+    CHUNK_SEPARATOR; EmbeddingService encodes each chunk and mean-pools them.
+
+    The configuration (get_config) is stored in the reference bundle
+    manifest, so classifiers build query texts exactly like the training run.
     """
 
+    TEXT_COLUMNS = [
+        'DS_OBSERVACAO',
+        'DS_MOTIVO',
+        'DS_TRATATIVA',
+        'DS_RETORNO',
+        'SUB_ASSUNTO'
+    ]
+
+    MAX_CHARS = 2000
+
+    # Peso de cada campo na divisao do orcamento de tokens
+    FIELD_PRIORITIES = {
+        'DS_OBSERVACAO': 4,
+        'DS_MOTIVO': 3,
+        'DS_TRATATIVA': 2,
+        'DS_RETORNO': 1,
+        'SUB_ASSUNTO': 1
+    }
+
+    CHUNK_SEPARATOR = '\x1f'
+
+    # Caracteres por token acima dos quais o texto nem chega a ser tokenizado
+    MAX_CHARS_PER_TOKEN = 8
+
+    def __init__(
+        self,
+        tokenizer: Any = None,
+        max_tokens: Optional[int] = None,
+        max_chunks: int = 1,
+        field_priorities: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            tokenizer: Fast Hugging Face tokenizer of the embedding model (None = character mode)
+            max_tokens: Model max sequence length, special tokens included
+            max_chunks: Chunks kept per text (1 = single truncated text)
+            field_priorities: Budget weight per column (default: FIELD_PRIORITIES)
+        """
+        if tokenizer is not None:
+            if not getattr(tokenizer, 'is_fast', False):
+                raise ValueError("TextBuilderService token-aware requer um tokenizer rapido (offsets)")
+            if not max_tokens:
+                raise ValueError("max_tokens e obrigatorio com tokenizer")
+
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_chunks = max(1, max_chunks)
+        self.field_priorities = dict(field_priorities or self.FIELD_PRIORITIES)
+        self.chunk_tokens = (
+            max_tokens - tokenizer.num_special_tokens_to_add(pair=False) if tokenizer is not None else None
+        )
+
+    @classmethod
+    def for_model(cls, embedding_service: Any, max_chunks: int = 1) -> 'TextBuilderService':
+        """
+        Token-aware builder for the model of an EmbeddingService.
+
+        Args:
+            embedding_service: Service whose tokenizer and max sequence length are used
+            max_chunks: Chunks kept per text (1 = single truncated text)
+
+        Returns:
+            TextBuilderService: Configured builder
+        """
+        return cls(
+            tokenizer=embedding_service.get_tokenizer(),
+            max_tokens=embedding_service.get_max_seq_length(),
+            max_chunks=max_chunks
+        )
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], embedding_service: Any) -> 'TextBuilderService':
+        """
+        Builder matching a configuration saved by get_config() (e.g. in a bundle manifest).
+
+        Args:
+            config: Saved configuration (None / {} = character mode, older artifacts)
+            embedding_service: Service providing the tokenizer in token mode
+
+        Returns:
+            TextBuilderService: Configured builder
+        """
+        if not config or config.get('mode') != 'tokens':
+            return cls()
+
+        return cls(
+            tokenizer=embedding_service.get_tokenizer(),
+            max_tokens=config['max_tokens'],
+            max_chunks=config.get('max_chunks', 1),
+            field_priorities=config.get('field_priorities')
+        )
+
+    def get_config(self) -> Dict[str, Any]:
+        """Configuração serializável (gravada no manifest do artefato)."""
+        if self.tokenizer is None:
+            return {'mode': 'chars', 'max_chars': self.MAX_CHARS}
+
+        return {
+            'mode': 'tokens',
+            'max_tokens': self.max_tokens,
+            'max_chunks': self.max_chunks,
+            'field_priorities': self.field_priorities
+        }
+
     @staticmethod
     def needs_classification(value: Any) -> bool:
         """
@@ -46,15 +163,7 @@ class TextBuilderService:
         """
         parts = []
 
-        text_columns = [
-            'DS_OBSERVACAO',
-            'DS_MOTIVO',
-            'DS_TRATATIVA',
-            'DS_RETORNO',
-            'SUB_ASSUNTO'
-        ]
-
-        for col in text_columns:
+        for col in TextBuilderService.TEXT_COLUMNS:
             if col in row.index and pd.notna(row[col]):
                 text = str(row[col]).strip()
                 if text and len(text) > 5:  # Only add meaningful text
@@ -62,11 +171,166 @@ class TextBuilderService:
 
         combined = ' '.join(parts).strip()
 
-        if len(combined) > 2000:
-            combined = combined[:2000]
+        if len(combined) > TextBuilderService.MAX_CHARS:
+            combined = combined[:TextBuilderService.MAX_CHARS]
 
         return combined
 
+    def build_text(self, row: pd.Series) -> str:
+        """
+        Build the text of a row with the configured mode
+        (build_text_from_row in character mode).
+
+        Args:
+            row: Row from DataFrame
+
+        Returns:
+            str: Text for embedding generation (chunks joined by CHUNK_SEPARATOR)
+        """
+        if self.tokenizer is None:
+            return self.build_text_from_row(row)
+
+        fields = []
+        for col in self.TEXT_COLUMNS:
+            if col in row.index and pd.notna(row[col]):
+                text = str(row[col]).strip()
+                if text and len(text) > 5:
+                    fields.append((col, text))
+
+        return self._fit_fields(fields)
+
+    def build_texts(self, df: pd.DataFrame, tokenize_chunk: int = 8192) -> List[str]:
+        """
+        Build the texts of every row of a DataFrame with column-wise string
+        operations. Output is identical to calling build_text() on each row.
+
+        Args:
+            df: DataFrame with text columns
+            tokenize_chunk: Field texts per tokenizer call (token mode)
+
+        Returns:
+            list: One text per row, in row order
+        """
+        if len(df) == 0:
+            return []
+
+        columns = [col for col in self.TEXT_COLUMNS if col in df.columns]
+        pieces = {col: self._field_texts(df[col]) for col in columns}
+
+        if self.tokenizer is None:
+            combined = np.full(len(df), '', dtype=object)
+            for col in columns:
+                piece = pieces[col]
+                separator = np.where((combined != '') & (piece != ''), ' ', '')
+                combined = combined + separator + piece
+            return pd.Series(combined, dtype=object).str[:self.MAX_CHARS].tolist()
+
+        # Modo token: todos os campos de todas as linhas tokenizados em poucas chamadas
+        fields_per_row: List[List[Tuple[str, str]]] = [[] for _ in range(len(df))]
+        for col in columns:
+            for row in np.flatnonzero(pieces[col] != ''):
+                fields_per_row[row].append((col, pieces[col][row]))
+
+        budget = self.chunk_tokens * self.max_chunks
+        flat_texts = [text[:budget * self.MAX_CHARS_PER_TOKEN] for fields in fields_per_row for _, text in fields]
+        flat_offsets = []
+        for start in range(0, len(flat_texts), tokenize_chunk):
+            flat_offsets.extend(self._tokenize_offsets(flat_texts[start:start + tokenize_chunk], budget))
+
+        texts = []
+        position = 0
+        for fields in fields_per_row:
+            texts.append(self._fit_fields(fields, flat_offsets[position:position + len(fields)]))
+            position += len(fields)
+        return texts
+
+    @staticmethod
+    def _field_texts(column: pd.Series) -> np.ndarray:
+        """Texto limpo de um campo por linha ('' quando ausente ou com até 5 caracteres)."""
+        text = column.astype(object).where(column.notna()).astype(str).str.strip()
+        keep = column.notna() & (text.str.len() > 5)
+        return np.where(keep.to_numpy(), text.to_numpy(dtype=object), '').astype(object)
+
+    def _tokenize_offsets(self, texts: List[str], budget: int) -> List[List[Tuple[int, int]]]:
+        if not texts:
+            return []
+        return self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=budget,
+            return_offsets_mapping=True
+        )['offset_mapping']
+
+    def _fit_fields(
+        self,
+        fields: List[Tuple[str, str]],
+        offsets: Optional[List[List[Tuple[int, int]]]] = None
+    ) -> str:
+        """Distribui o orçamento de tokens entre os campos e monta o(s) chunk(s)."""
+        if not fields:
+            return ''
+
+        budget = self.chunk_tokens * self.max_chunks
+        texts = [text[:budget * self.MAX_CHARS_PER_TOKEN] for _, text in fields]
+        if offsets is None:
+            offsets = self._tokenize_offsets(texts, budget)
+
+        allocation = self._allocate(
+            [len(field_offsets) for field_offsets in offsets],
+            [self.field_priorities.get(col, 1) for col, _ in fields],
+            budget
+        )
+
+        # Spans (campo, inicio, fim) de cada token mantido, na ordem dos campos
+        spans = [
+            (i, offsets[i][t][0], offsets[i][t][1])
+            for i, n_tokens in enumerate(allocation)
+            for t in range(n_tokens)
+        ]
+
+        chunks = []
+        for start in range(0, len(spans), self.chunk_tokens):
+            chunk_spans = spans[start:start + self.chunk_tokens]
+            parts = []
+            for i in dict.fromkeys(field for field, _, _ in chunk_spans):
+                field_spans = [span for span in chunk_spans if span[0] == i]
+                parts.append(texts[i][field_spans[0][1]:field_spans[-1][2]].strip())
+            chunks.append(' '.join(part for part in parts if part))
+
+        return self.CHUNK_SEPARATOR.join(chunks)
+
+    @staticmethod
+    def _allocate(lengths: Sequence[int], weights: Sequence[int], budget: int) -> List[int]:
+        """
+        Split a token budget between fields proportionally to their weights;
+        fields shorter than their share keep all their tokens and the rest is
+        redistributed among the others.
+        """
+        allocation = [0] * len(lengths)
+        active = [i for i, length in enumerate(lengths) if length > 0]
+        remaining = budget
+
+        while active and remaining > 0:
+            total_weight = sum(weights[i] for i in active)
+            fits = [i for i in active if lengths[i] * total_weight <= remaining * weights[i]]
+            if fits:
+                for i in fits:
+                    allocation[i] = lengths[i]
+                    remaining -= lengths[i]
+                active = [i for i in active if i not in fits]
+                continue
+
+            for i in active:
+                allocation[i] = remaining * weights[i] // total_weight
+            # Sobras do arredondamento vao para os campos de maior peso
+            leftover = remaining - sum(allocation[i] for i in active)
+            for i in sorted(active, key=lambda i: -weights[i])[:leftover]:
+                allocation[i] += 1
+            break
+
+        return allocation
+
     @staticmethod
     def validate_text_length(text: str, min_length: int = 10) -> bool:
         """
@@ -0,0 +1,79 @@
+"""
+Vectorized masks of records that still need classification.
+"""
+from typing import Dict
+
+import pandas as pd
+
+
+ASSUNTO_PLACEHOLDERS = ('', 'OUTROS', 'OUTRO')
+
+
+def empty_mask(series: pd.Series) -> pd.Series:
+    """Linhas vazias (NaN ou só espaços)."""
+    missing = series.isna()
+    if not _is_text(series):
+        return missing
+    return (missing | (series.where(~missing, '').astype(str).str.strip() == '')).astype(bool)
+
+
+def needs_assunto_mask(series: pd.Series) -> pd.Series:
+    """
+    DS_ASSUNTO rows to classify: empty, NaN or exactly 'Outros'/'Outro'
+    (same rule as TextBuilderService.needs_classification, column-wise).
+
+    Args:
+        series: DS_ASSUNTO column
+
+    Returns:
+        pandas.Series: Boolean mask aligned with the column
+    """
+    missing = series.isna()
+    if not _is_text(series):
+        return missing
+
+    # Valores que nao sao texto viram NaN em .str e nao entram na mascara
+    cleaned = series.str.strip().str.upper()
+    return missing | cleaned.isin(ASSUNTO_PLACEHOLDERS)
+
+
+def needs_subassunto_mask(series: pd.Series) -> pd.Series:
+    """
+    SUB_ASSUNTO rows to classify: empty, NaN or containing 'OUTRO' anywhere
+    (e.g. 'OUTROS (DETALHAR...)'), same rule as
+    SubAssuntoClassifierService.needs_classification.
+
+    Args:
+        series: SUB_ASSUNTO column
+
+    Returns:
+        pandas.Series: Boolean mask aligned with the column
+    """
+    missing = series.isna()
+    if not _is_text(series):
+        return missing
+
+    cleaned = series.where(~missing, '').astype(str).str.strip().str.upper()
+    return (missing | (cleaned == '') | cleaned.str.contains('OUTRO', regex=False)).astype(bool)
+
+
+def compute_classification_masks(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    """
+    Masks of every classifiable column present in the DataFrame.
+
+    Args:
+        df: DataFrame with DS_ASSUNTO and/or SUB_ASSUNTO
+
+    Returns:
+        dict: Column name -> boolean mask
+    """
+    masks = {}
+    if 'DS_ASSUNTO' in df.columns:
+        masks['DS_ASSUNTO'] = needs_assunto_mask(df['DS_ASSUNTO'])
+    if 'SUB_ASSUNTO' in df.columns:
+        masks['SUB_ASSUNTO'] = needs_subassunto_mask(df['SUB_ASSUNTO'])
+    return masks
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)